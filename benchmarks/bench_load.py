@@ -0,0 +1,45 @@
+import os
+import sys
+import time
+import argparse
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.getcwd()))
+
+from src.pipelines.load import connect_sql, bulk_load_to_sql, iter_local_chunks
+from benchmarks.generators import make_transformed
+
+# Compares the legacy single-connection to_sql load against the bulk loader on a
+# local SQL stand-in, e.g.
+#   python benchmarks/bench_load.py --rows 1000000 --conn sqlite:///data/bench/bench.db
+#   python benchmarks/bench_load.py --conn postgresql+psycopg2://postgres@localhost/transitx
+
+
+def legacy_load(path:str, table:str, conn_str:str):
+    engine = connect_sql(conn_str, pool_size=1)
+    start = time.perf_counter()
+    df = pd.concat(iter_local_chunks([path]))
+    with engine.begin() as conn:
+        df.to_sql(table, con=conn, if_exists="replace", index=False, chunksize=5000)
+    seconds = time.perf_counter() - start
+    return {"rows": len(df), "seconds": round(seconds, 3), "rows_per_sec": round(len(df) / seconds, 1)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--conn", default="sqlite:///data/bench/bench_load.db")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    csv_path = f"data/bench/transformed_{args.rows}.csv"
+    if not os.path.exists(csv_path):
+        make_transformed(csv_path, args.rows)
+    if args.conn.startswith("sqlite:///"):
+        os.makedirs(os.path.dirname(args.conn[len("sqlite:///"):]) or ".", exist_ok=True)
+
+    legacy = legacy_load(csv_path, "bench_legacy", args.conn)
+    bulk = bulk_load_to_sql("bench_bulk", local_paths=[csv_path], conn_str=args.conn, workers=args.workers)
+
+    print(f"legacy to_sql : {legacy['rows_per_sec']:>12,.0f} rows/s")
+    print(f"bulk loader   : {bulk['rows_per_sec']:>12,.0f} rows/s")
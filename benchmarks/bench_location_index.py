@@ -0,0 +1,106 @@
+import os
+import sys
+import json
+import time
+import random
+import pickle
+import argparse
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.getcwd()))
+
+from src.utils.location_index import LocationIndex, INDEX_PATH
+
+# Lookups per second for the location index. Uses the trained index when
+# models/location_index.pkl exists, otherwise a synthetic set of TTC-style
+# names. Queries mix exact names, abbreviated / re-cased spellings, typos and
+# unknown strings; "cold" clears the memo cache first, "warm" repeats them.
+#   python benchmarks/bench_location_index.py --queries 200000
+
+RESULTS = "benchmarks/results/location_index.jsonl"
+STREETS = ["KING", "QUEEN", "DUNDAS", "BLOOR", "YONGE", "BATHURST", "SPADINA", "DUFFERIN", "KEELE", "JANE",
+           "FINCH", "SHEPPARD", "EGLINTON", "LAWRENCE", "KENNEDY", "WARDEN", "VICTORIA PARK", "PHARMACY",
+           "DON MILLS", "LESLIE", "BAYVIEW", "ST CLAIR", "DANFORTH", "KIPLING", "ISLINGTON", "ROYAL YORK"]
+SUFFIXES = ["STATION", "AVENUE", "STREET", "ROAD", "DRIVE", "BOULEVARD"]
+SHORT = {"STATION": "STN", "AVENUE": "AVE", "STREET": "ST", "ROAD": "RD", "DRIVE": "DR", "BOULEVARD": "BLVD", "AND": "&"}
+
+
+def synthetic_names(rng):
+    names = [f"{s} {suffix}" for s in STREETS for suffix in SUFFIXES]
+    names += [f"{a} AND {b}" for a in STREETS for b in STREETS if a != b]
+    return names * 3 + rng.sample(names, len(names) // 4)
+
+
+def abbreviate(name:str):
+    return " ".join(SHORT.get(tok, tok) for tok in name.split()).title()
+
+
+def typo(name:str, rng):
+    i = rng.randrange(1, max(2, len(name) - 1))
+    return name[:i] + name[i + 1:]
+
+
+def make_queries(labels, n:int, rng):
+    queries = []
+    for _ in range(n):
+        name = rng.choice(labels)
+        kind = rng.random()
+        if kind < 0.4:
+            queries.append(name)
+        elif kind < 0.7:
+            queries.append(abbreviate(name))
+        elif kind < 0.9:
+            queries.append(typo(name, rng))
+        else:
+            queries.append(f"NOWHERE {rng.randrange(10**6)}")
+    return queries
+
+
+def timed(index, queries):
+    start = time.perf_counter()
+    resolved = sum(index.resolve(q) is not None for q in queries)
+    return time.perf_counter() - start, resolved
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Location index lookup throughput")
+    parser.add_argument("--queries", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    if os.path.exists(INDEX_PATH):
+        with open(INDEX_PATH, "rb") as f:
+            index = pickle.load(f)
+        source = INDEX_PATH
+    else:
+        t0 = time.perf_counter()
+        index = LocationIndex(synthetic_names(rng))
+        source = f"synthetic (built in {time.perf_counter() - t0:.2f}s)"
+
+    queries = make_queries(index.labels, args.queries, rng)
+
+    index.resolve.cache_clear()
+    cold_s, resolved = timed(index, queries)
+    warm_s, _ = timed(index, queries)
+    distinct = len(set(queries))
+
+    result = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "source": source,
+        "locations": len(index),
+        "queries": len(queries),
+        "distinct_queries": distinct,
+        "resolved_pct": 100 * resolved / len(queries),
+        "cold_lookups_per_sec": len(queries) / cold_s,
+        "warm_lookups_per_sec": len(queries) / warm_s,
+        "warm_us_per_lookup": 1e6 * warm_s / len(queries),
+    }
+    print(f"Index: {len(index):,} locations from {source}")
+    print(f"{len(queries):,} queries ({distinct:,} distinct), {result['resolved_pct']:.1f}% resolved")
+    print(f"cold: {result['cold_lookups_per_sec']:,.0f} lookups/s | warm: {result['warm_lookups_per_sec']:,.0f} lookups/s "
+          f"({result['warm_us_per_lookup']:.2f} us/lookup)")
+
+    os.makedirs(os.path.dirname(RESULTS), exist_ok=True)
+    with open(RESULTS, "a") as f:
+        f.write(json.dumps(result) + "\n")
@@ -0,0 +1,125 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import threading
+from datetime import datetime
+import requests
+
+# Serving throughput vs. worker count. Starts gunicorn with the production
+# config for each worker count, hammers /predict from client threads for a
+# fixed duration and appends requests/s and latency percentiles to
+# benchmarks/results/serving.jsonl. Weather is pinned through
+# TRANSITX_FIXED_WEATHER and the incident bypasses the lookup cube, so every
+# request runs live inference.
+#   python benchmarks/bench_serving.py --workers 1 2 4 --duration 20
+
+RESULTS = "benchmarks/results/serving.jsonl"
+PAYLOAD = {
+    "date": "2024-05-14",
+    "time": "08:15",
+    "route": "32",
+    "direction": "E",
+    "location": "KENNEDY STATION",
+    "incident": "Mechanical",
+    "min_gap": 10,
+}
+
+
+def wait_ready(url:str, timeout:float=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{url}/health", timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {url} did not become healthy in {timeout}s")
+
+
+def load(url:str, clients:int, duration:float):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    stop = time.perf_counter() + duration
+
+    def _client():
+        nonlocal errors
+        session = requests.Session()
+        local = []
+        while time.perf_counter() < stop:
+            t0 = time.perf_counter()
+            try:
+                ok = session.post(f"{url}/predict", json=PAYLOAD, timeout=10).ok
+            except requests.RequestException:
+                ok = False
+            if ok:
+                local.append(time.perf_counter() - t0)
+            else:
+                with lock:
+                    errors += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=_client) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors, time.perf_counter() - start
+
+
+def bench(workers:int, port:int, clients_per_worker:int, duration:float):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), BIND=f"127.0.0.1:{port}",
+               TRANSITX_FIXED_WEATHER="12.0,0.0", PYTHONPATH=os.getcwd())
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "deployment/gunicorn_conf.py", "deployment.app:app"],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_ready(url)
+        load(url, workers, 2)  # warm-up
+        latencies, errors, seconds = load(url, workers * clients_per_worker, duration)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    latencies.sort()
+    pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else None
+    return {
+        "workers": workers,
+        "clients": workers * clients_per_worker,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / seconds,
+        "p50_ms": pct(0.50),
+        "p99_ms": pct(0.99),
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else None,
+    }
+
+
+if __name__ == "__main__":
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Serving throughput vs. gunicorn worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, max(1, cores // 2), cores}))
+    parser.add_argument("--clients-per-worker", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    run = {"time": datetime.now().isoformat(timespec="seconds"), "cores": cores, "results": []}
+    base = None
+    print(f"{'workers':>8} {'rps':>10} {'scale':>7} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for w in args.workers:
+        r = bench(w, args.port, args.clients_per_worker, args.duration)
+        base = base or r["rps"]
+        r["scaling"] = r["rps"] / base if base else None
+        run["results"].append(r)
+        print(f"{w:>8} {r['rps']:>10.1f} {r['scaling']:>6.2f}x {r['p50_ms'] or 0:>8.1f} {r['p99_ms'] or 0:>8.1f} {r['errors']:>7}")
+
+    os.makedirs(os.path.dirname(RESULTS), exist_ok=True)
+    with open(RESULTS, "a") as f:
+        f.write(json.dumps(run) + "\n")
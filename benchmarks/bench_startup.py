@@ -0,0 +1,73 @@
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+from datetime import datetime
+
+# Import-time benchmark for the project entry points. Each module is imported in a
+# fresh interpreter several times; the median in-process import time
+# and the heaviest imports from `python -X importtime` are appended to
+# benchmarks/results/startup.jsonl so runs can be compared over time.
+#   python benchmarks/bench_startup.py --repeat 5
+
+ENTRY_POINTS = [
+    "main",
+    "src.models.train_regressor",
+    "src.models.train_classifier",
+    "deployment.app",
+]
+RESULTS = "benchmarks/results/startup.jsonl"
+
+
+def time_import(module:str, repeat:int):
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    samples = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env)
+        if out.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{out.stderr.strip()}")
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def heaviest_imports(module:str, top:int=5):
+
+    """Top-level packages by cumulative import time, parsed from -X importtime."""
+
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, env=env)
+    rows = []
+    for line in out.stderr.splitlines():
+        m = re.match(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|(\s*)(\S+)", line)
+        if m and len(m.group(2)) <= 1:
+            rows.append((m.group(3), int(m.group(1)) / 1e6))
+    return sorted(rows, key=lambda r: r[1], reverse=True)[:top]
+
+
+def git_rev():
+    out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+    return out.stdout.strip() or "unknown"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--modules", nargs="*", default=ENTRY_POINTS)
+    args = parser.parse_args()
+
+    record = {"timestamp": datetime.now().isoformat(timespec="seconds"), "git_rev": git_rev(), "python": sys.version.split()[0], "modules": {}}
+
+    for module in args.modules:
+        seconds = time_import(module, args.repeat)
+        heavy = heaviest_imports(module)
+        record["modules"][module] = {"import_seconds": round(seconds, 4), "heaviest": [[n, round(t, 4)] for n, t in heavy]}
+        print(f"{module:<32} {seconds * 1000:>8.1f} ms   " + ", ".join(f"{n} {t * 1000:.0f}ms" for n, t in heavy))
+
+    os.makedirs(os.path.dirname(RESULTS), exist_ok=True)
+    with open(RESULTS, "a") as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"Appended results to {RESULTS}")
@@ -0,0 +1,142 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Synthetic inputs shaped like the real extract outputs:
+#   - TTC bus delay files (one CSV per year, raw column names and spellings)
+#   - Open-Meteo hourly archive CSVs (metadata preamble + hourly rows)
+#   - the merged / transformed CSV that load.py reads
+# Rows are written in CHUNK_ROWS slices, so 50M-row files need no more memory than 1M.
+
+SCALES = {"1m": 1_000_000, "10m": 10_000_000, "50m": 50_000_000}
+CHUNK_ROWS = 1_000_000
+
+STREETS = ["KING", "QUEEN", "DUNDAS", "BLOOR", "YONGE", "BATHURST", "SPADINA", "DUFFERIN", "KEELE", "JANE",
+           "FINCH", "SHEPPARD", "EGLINTON", "LAWRENCE", "KENNEDY", "WARDEN", "VICTORIA PARK", "PHARMACY",
+           "DON MILLS", "LESLIE", "BAYVIEW", "ST CLAIR", "DANFORTH", "KIPLING", "ISLINGTON", "ROYAL YORK",
+           "STEELES", "MCCOWAN", "MARKHAM", "MORNINGSIDE"]
+STATIONS = [f"{s} STATION" for s in ["KENNEDY", "WARDEN", "KIPLING", "FINCH", "JANE", "DON MILLS", "VICTORIA PARK",
+                                     "ISLINGTON", "LAWRENCE WEST", "SCARBOROUGH CENTRE", "YORK MILLS", "WILSON"]]
+SPELLINGS = {"STATION": ["STATION", "STN", "Station"], "AND": ["AND", "&", "AT"], "AVENUE": ["AVENUE", "AVE"]}
+INCIDENTS = ["Mechanical", "Operations - Operator", "Diversion", "Security", "General Delay", "Emergency Services",
+             "Collision - TTC", "Cleaning - Unsanitary", "Investigation", "Utilized Off Route", "Held By", "Vision",
+             "Road Blocked - NON-TTC Collision"]
+INCIDENT_P = np.array([30, 16, 12, 9, 8, 6, 5, 4, 3, 2, 2, 2, 1], dtype=float)
+INCIDENT_P = INCIDENT_P / INCIDENT_P.sum()
+DIRECTIONS = ["N", "S", "E", "W", "NB", "SB", "EB", "WB", "B", None]
+DIRECTION_P = np.array([18, 18, 18, 18, 5, 5, 5, 5, 4, 4], dtype=float)
+DIRECTION_P = DIRECTION_P / DIRECTION_P.sum()
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+# Delays per hour of day: quiet nights, morning and evening peaks
+HOUR_P = np.array([1, .6, .4, .3, .4, 1.5, 4, 7, 7.5, 5, 4, 4, 4.5, 4.5, 5, 6, 7.5, 7.5, 5.5, 4, 3, 2.5, 2, 1.5])
+HOUR_P = HOUR_P / HOUR_P.sum()
+
+
+def location_names():
+    names = STATIONS + [f"{a} AND {b}" for i, a in enumerate(STREETS) for b in STREETS[i + 1:i + 6]]
+    return names + [f"{s} AVENUE" for s in STREETS[:10]]
+
+
+def zipf_p(n:int, a:float=1.1):
+    p = 1.0 / np.arange(1, n + 1) ** a
+    return p / p.sum()
+
+
+def respell(names, rng):
+
+    """Free-text noise: abbreviations and casing, as in the real location column."""
+
+    out = np.array(names, dtype=object)
+    noisy = rng.random(len(out)) < 0.15
+    for i in np.flatnonzero(noisy):
+        name = out[i]
+        for word, variants in SPELLINGS.items():
+            if word in name:
+                name = name.replace(word, variants[rng.integers(len(variants))])
+        out[i] = name.title() if rng.random() < 0.3 else name
+    return out
+
+
+# ----- TTC delay rows ----- #
+def ttc_frame(rows:int, year:int, rng):
+    locations = location_names()
+    days = pd.date_range(f"{year}-01-01", f"{year}-12-31", freq="D")
+    date = days[rng.integers(0, len(days), rows)]
+    hour = rng.choice(24, rows, p=HOUR_P)
+    minute = rng.integers(0, 60, rows)
+    route = np.array([str(r) for r in range(7, 997, 5)])
+    delay = np.clip(rng.lognormal(2.3, 0.9, rows).round(), 0, 999).astype(int)
+    return pd.DataFrame({
+        "Date": date.strftime("%Y-%m-%d"),
+        "Route": route[rng.choice(len(route), rows, p=zipf_p(len(route)))],
+        "Time": [f"{h:02d}:{m:02d}" for h, m in zip(hour, minute)],
+        "Day": np.array(DAYS)[date.dayofweek],
+        "Location": respell(np.array(locations, dtype=object)[rng.choice(len(locations), rows, p=zipf_p(len(locations)))], rng),
+        "Incident": rng.choice(INCIDENTS, rows, p=INCIDENT_P),
+        "Min Delay": delay,
+        "Min Gap": delay + rng.integers(0, 20, rows),
+        "Direction": rng.choice(np.array(DIRECTIONS, dtype=object), rows, p=DIRECTION_P),
+        "Vehicle": rng.integers(1000, 9999, rows),
+    })
+
+
+def write_chunked(path:str, rows:int, make_chunk, seed:int):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    written = 0
+    for i, start in enumerate(range(0, rows, CHUNK_ROWS)):
+        n = min(CHUNK_ROWS, rows - start)
+        make_chunk(n, np.random.default_rng([seed, i])).to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        written += n
+    return written
+
+
+def make_ttc_files(rows:int, years=(2023, 2024), root:str="data/raw", seed:int=42):
+
+    """`rows` delay records split evenly over `years`, written as data/raw/ttc_bus_delay_{year}.csv."""
+
+    paths = []
+    for k, year in enumerate(years):
+        n = rows // len(years) + (1 if k < rows % len(years) else 0)
+        path = os.path.join(root, f"ttc_bus_delay_{year}.csv")
+        write_chunked(path, n, lambda m, rng, y=year: ttc_frame(m, y, rng), seed + year)
+        paths.append(path)
+    return paths
+
+
+# ----- Open-Meteo hourly archive ----- #
+def make_weather_files(years=(2023, 2024), root:str="data/weather", seed:int=42):
+    paths = []
+    for year in years:
+        rng = np.random.default_rng(seed + year)
+        hours = pd.date_range(f"{year}-01-01", f"{year}-12-31 23:00", freq="h")
+        doy, hod = hours.dayofyear.to_numpy(), hours.hour.to_numpy()
+        # Seasonal + daily cycle around Toronto normals, mostly-dry precipitation
+        temp = 8.5 - 13 * np.cos(2 * np.pi * (doy - 20) / 365) - 4 * np.cos(2 * np.pi * (hod - 3) / 24) + rng.normal(0, 3, len(hours))
+        rain = np.where(rng.random(len(hours)) < 0.1, rng.exponential(1.2, len(hours)), 0.0)
+
+        path = os.path.join(root, f"weather_{year}.csv")
+        os.makedirs(root, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("latitude,longitude,elevation,utc_offset_seconds,timezone,timezone_abbreviation\n")
+            f.write("43.70455,-79.4046,175.0,-18000,America/Toronto,GMT-5\n\n")
+            pd.DataFrame({
+                "time": hours.strftime("%Y-%m-%dT%H:%M"),
+                "temperature_2m (°C)": temp.round(1),
+                "precipitation (mm)": rain.round(1),
+            }).to_csv(f, index=False)
+        paths.append(path)
+    return paths
+
+
+# ----- Merged rows as written by transform.py (input of load.py) ----- #
+def transformed_frame(rows:int, rng, years=(2023, 2024)):
+    df = ttc_frame(rows, years[rng.integers(len(years))], rng)
+    df.columns = [c.lower() for c in df.columns]
+    df = df.rename(columns={"min delay": "min_delay", "time": "time_x"})
+    df["temperature_2m (°c)"] = rng.normal(8.5, 8.7, rows).round(1)
+    df["precipitation (mm)"] = rng.exponential(0.13, rows).round(1)
+    return df
+
+
+def make_transformed(path:str, rows:int, seed:int=42):
+    return write_chunked(path, rows, transformed_frame, seed)
@@ -0,0 +1,220 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+from benchmarks.generators import SCALES, make_ttc_files, make_weather_files
+
+# End-to-end pipeline benchmark on synthetic data.
+#
+#   python benchmarks/run_suite.py run --scale 1m            # generate (once) + every stage
+#   python benchmarks/run_suite.py run --scale 10m --stages transform feature_eng
+#   python benchmarks/run_suite.py compare --scale 1m        # last two runs, exit 1 on regressions
+#
+# Each stage runs in a fresh interpreter inside data/bench/suite_<scale>/, with
+# blob storage swapped for a local directory (TRANSITX_LOCAL_STORAGE), MLflow
+# writing to a local file store and SQL going to sqlite, so no cloud access is
+# needed. Wall/CPU time, rows/s and the stage's own peak RSS are appended to
+# benchmarks/results/suite.jsonl, one line per stage.
+
+RESULTS = os.path.join(ROOT, "benchmarks/results/suite.jsonl")
+STAGES = ["extract", "transform", "validate", "feature_eng", "load", "train", "predict"]
+SCALE_ROWS = {"tiny": 50_000, **SCALES}
+YEARS = (2023, 2024)
+
+
+# ----- Stage bodies (run inside the child interpreter, cwd = workdir) ----- #
+def stage_extract(args):
+    from src.pipelines import extract
+    paths = extract.transit_paths() + extract.weather_paths()
+    for path in paths:
+        extract.upload_to_blob(path, os.path.basename(path))
+    return None
+
+
+def stage_transform(args):
+    from src.pipelines import extract, transform
+    return len(transform.run(extract.transit_paths(), extract.weather_paths()))
+
+
+def stage_validate(args):
+    from src.pipelines import validate
+    return len(validate.run())
+
+
+def stage_feature_eng(args):
+    from src.pipelines import feature_eng
+    return len(feature_eng.run())
+
+
+def stage_load(args):
+    from src.pipelines import load, transform
+    stats = load.bulk_load_to_sql("bench_suite", local_paths=[transform.PROCESSED_LOCAL],
+                                  conn_str=f"sqlite:///{os.path.abspath('suite.db')}")
+    return stats["rows"]
+
+
+def stage_train(args):
+    from src.models.train_joint import train_joint
+    from src.utils.model_utils import save_model, load_xy
+    reg_model, cls_model, _ = train_joint(rounds=args.rounds)
+    save_model(reg_model, "xgb_regressor.pkl")
+    save_model(cls_model, "xgb_classifier.pkl")
+    return len(load_xy()[0])
+
+
+def stage_predict(args):
+    from src.models.predict import stream_predictions
+    rows, _ = stream_predictions(upload=True)
+    return rows
+
+
+def run_stage(args):
+    from src.utils.telemetry import track
+    body = globals()[f"stage_{args.stage}"]
+    with track("bench", args.stage) as rec:
+        rows = body(args)
+    rows = rows if rows is not None else rec.get("rows_out")
+    result = {k: rec.get(k) for k in ["status", "wall_seconds", "peak_rss_mb", "bytes_read", "bytes_written"]}
+    # One stage per interpreter, so process-wide CPU (incl. native worker threads) belongs to this stage alone
+    result["cpu_seconds"] = rec.get("process_cpu_seconds")
+    result["rows"] = rows
+    print("RESULT " + json.dumps(result))
+
+
+# ----- Orchestration (parent interpreter) ----- #
+def git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def generate(workdir:str, rows:int):
+    start = time.perf_counter()
+    make_ttc_files(rows, YEARS, root=os.path.join(workdir, "data/raw"))
+    make_weather_files(YEARS, root=os.path.join(workdir, "data/weather"))
+    return time.perf_counter() - start
+
+
+def spawn(stage:str, workdir:str, args, suite_run:str):
+    env = dict(os.environ,
+               PYTHONPATH=ROOT,
+               TRANSITX_LOCAL_STORAGE=os.path.join(workdir, "storage"),
+               TRANSITX_RUN_ID=suite_run,
+               MLFLOW_TRACKING_URI=f"file:{os.path.join(workdir, 'mlruns')}")
+    cmd = [sys.executable, os.path.abspath(__file__), "stage", stage, "--rounds", str(args.rounds)]
+    out = subprocess.run(cmd, cwd=workdir, env=env, capture_output=True, text=True)
+    lines = [l for l in out.stdout.splitlines() if l.startswith("RESULT ")]
+    if out.returncode != 0 or not lines:
+        return {"status": "error", "error": out.stderr.strip().splitlines()[-5:]}
+    return json.loads(lines[-1][len("RESULT "):])
+
+
+def run_suite(args):
+    rows = SCALE_ROWS[args.scale]
+    workdir = os.path.abspath(args.workdir or os.path.join(ROOT, f"data/bench/suite_{args.scale}"))
+    os.makedirs(workdir, exist_ok=True)
+    suite_run = f"{datetime.now():%Y%m%dT%H%M%S}-{args.scale}"
+    meta = {"suite_run": suite_run, "time": datetime.now().isoformat(timespec="seconds"), "git_rev": git_rev(),
+            "label": args.label, "scale": args.scale, "rows_generated": rows, "cpus": os.cpu_count()}
+
+    records = []
+    # Generated inputs are reused across runs of the same scale
+    marker = os.path.join(workdir, ".generated")
+    generated = open(marker).read().strip() if os.path.exists(marker) else None
+    if args.regenerate or generated != str(rows):
+        seconds = generate(workdir, rows)
+        with open(marker, "w") as f:
+            f.write(str(rows))
+        records.append({**meta, "stage": "generate", "status": "ok", "wall_seconds": round(seconds, 3), "rows": rows})
+
+    print(f"{'stage':<12} {'status':<7} {'wall s':>9} {'cpu s':>9} {'peak MB':>9} {'rows/s':>12}")
+    for stage in args.stages:
+        result = spawn(stage, workdir, args, suite_run)
+        wall = result.get("wall_seconds")
+        if result.get("rows") and wall:
+            result["rows_per_sec"] = round(result["rows"] / wall, 1)
+        records.append({**meta, "stage": stage, **result})
+        print(f"{stage:<12} {result['status']:<7} {wall or 0:>9.2f} {result.get('cpu_seconds') or 0:>9.2f} "
+              f"{result.get('peak_rss_mb') or 0:>9.1f} {result.get('rows_per_sec') or 0:>12,.0f}")
+        if result["status"] != "ok":
+            print("\n".join(result.get("error", [])))
+            if not args.keep_going:
+                break
+
+    os.makedirs(os.path.dirname(RESULTS), exist_ok=True)
+    with open(RESULTS, "a") as f:
+        for r in records:
+            f.write(json.dumps(r) + "\n")
+    return records
+
+
+# ----- Regression check between two suite runs ----- #
+def compare(args):
+    with open(RESULTS) as f:
+        records = [json.loads(l) for l in f if l.strip()]
+    records = [r for r in records if r["scale"] == args.scale and r["stage"] != "generate"]
+    runs = list(dict.fromkeys(r["suite_run"] for r in records))
+    if len(runs) < 2:
+        print(f"Need two {args.scale} suite runs to compare, found {len(runs)}")
+        return 0
+    old_run, new_run = (args.runs or runs[-2:])
+    old = {r["stage"]: r for r in records if r["suite_run"] == old_run}
+    new = {r["stage"]: r for r in records if r["suite_run"] == new_run}
+
+    flagged = 0
+    print(f"{old_run} ({old[next(iter(old))].get('git_rev')}) -> {new_run} ({new[next(iter(new))].get('git_rev')})")
+    print(f"{'stage':<12} {'old s':>9} {'new s':>9} {'old MB':>9} {'new MB':>9}  flag")
+    for stage in [s for s in STAGES if s in old and s in new]:
+        o, n = old[stage], new[stage]
+        flags = []
+        if (o.get("wall_seconds") and n.get("wall_seconds") and n["wall_seconds"] > o["wall_seconds"] * (1 + args.threshold)
+                and n["wall_seconds"] - o["wall_seconds"] > args.min_seconds):
+            flags.append("SLOWER")
+        if o.get("peak_rss_mb") and n.get("peak_rss_mb") and n["peak_rss_mb"] > o["peak_rss_mb"] * (1 + args.threshold):
+            flags.append("MORE_MEMORY")
+        if n.get("status") != "ok":
+            flags.append("FAILED")
+        flagged += bool(flags)
+        print(f"{stage:<12} {o.get('wall_seconds') or 0:>9.2f} {n.get('wall_seconds') or 0:>9.2f} "
+              f"{o.get('peak_rss_mb') or 0:>9.1f} {n.get('peak_rss_mb') or 0:>9.1f}  {' '.join(flags)}")
+    return 1 if flagged else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TransitX pipeline benchmark suite")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="generate synthetic data and time every stage")
+    p_run.add_argument("--scale", choices=list(SCALE_ROWS), default="1m")
+    p_run.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    p_run.add_argument("--workdir", default=None)
+    p_run.add_argument("--rounds", type=int, default=200, help="boosting rounds for the train stage")
+    p_run.add_argument("--label", default=None, help="free-text tag stored with the results")
+    p_run.add_argument("--regenerate", action="store_true")
+    p_run.add_argument("--keep-going", action="store_true", help="run later stages after a failure")
+
+    p_stage = sub.add_parser("stage", help=argparse.SUPPRESS)
+    p_stage.add_argument("stage", choices=STAGES)
+    p_stage.add_argument("--rounds", type=int, default=200)
+
+    p_cmp = sub.add_parser("compare", help="compare the last two runs of a scale")
+    p_cmp.add_argument("--scale", choices=list(SCALE_ROWS), default="1m")
+    p_cmp.add_argument("--runs", nargs=2, metavar=("OLD", "NEW"))
+    p_cmp.add_argument("--threshold", type=float, default=0.2)
+    p_cmp.add_argument("--min-seconds", type=float, default=0.5)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run_suite(args)
+    elif args.command == "stage":
+        run_stage(args)
+    else:
+        sys.exit(compare(args))
@@ -1,10 +1,17 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, field_validator
-from datetime import datetime
-import uvicorn, os
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from typing import List, Optional
+from functools import lru_cache
+import uvicorn, os, time, json, asyncio, codecs, threading
+import numpy as np
 import pandas as pd
 import pickle
 import requests
+from src.utils.lookup_cube import LookupCube, CUBE_PATH, DEFAULT_INCIDENT, model_version
+from src.utils.location_index import load_index, INDEX_PATH
 
 
 # ------ Initializing the FASTAPI ------- #
@@ -28,7 +35,11 @@ def root():
 def health():
     return {
         "status": "ok",
-        "time": datetime.now().isoformat()
+        "time": datetime.now().isoformat(),
+        "pid": os.getpid(),
+        "model_version": ARTIFACTS.get("version"),
+        "models_loaded_at": ARTIFACTS.get("loaded_at"),
+        "uptime_seconds": round(time.time() - STARTED_AT, 1)
     }
 
 VALID_INCIDENTS = {
@@ -48,6 +59,36 @@ VALID_INCIDENTS = {
     "None"  # for predictions where no incident is expected
 }
 
+def validate_route(value:str):
+    if not value.isdigit():
+        raise HTTPException(
+            status_code=400,
+            detail="Route must be numeric (e.g., '32', '91', '505')."
+        )
+    return value
+
+def validate_incident(value:str):
+    if value not in VALID_INCIDENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid incident '{value}'. Choose from: {', '.join(VALID_INCIDENTS)}."
+        )
+    return value
+
+def normalize_direction(value:str):
+    value = value.strip().capitalize()
+    if value in {"N", "S", "E", "W"}:
+        return value
+    if value.lower() in {"north", "northbound"}:
+        return "N"
+    if value.lower() in {"south", "southbound"}:
+        return "S"
+    if value.lower() in {"east", "eastbound"}:
+        return "E"
+    if value.lower() in {"west", "westbound"}:
+        return "W"
+    raise HTTPException(status_code=400, detail=f"Invalid direction '{value}'. Use N/S/E/W.")
+
 # -- Input Schema -- #
 class TransitInput(BaseModel):
     date: str = Field(..., description="Date in YYYY-MM-DD format")
@@ -82,36 +123,38 @@ class TransitInput(BaseModel):
 
     @field_validator("route")
     def validate_route(cls, value):
-        if not value.isdigit():
-            raise HTTPException(
-                status_code=400,
-                detail="Route must be numeric (e.g., '32', '91', '505')."
-            )
-        return value
+        return validate_route(value)
 
     @field_validator("direction", mode='before')
     def normalize_direction(cls, value):
-        value = value.strip().capitalize()
-        if value in {"N", "S", "E", "W"}:
-            return value
-        if value.lower() in {"north", "northbound"}:
-            return "N"
-        if value.lower() in {"south", "southbound"}:
-            return "S"
-        if value.lower() in {"east", "eastbound"}:
-            return "E"
-        if value.lower() in {"west", "westbound"}:
-            return "W"
-        raise HTTPException(status_code=400, detail=f"Invalid direction '{value}'. Use N/S/E/W.")
+        return normalize_direction(value)
 
     @field_validator("incident")
     def validate_incident(cls, value):
-        if value not in VALID_INCIDENTS:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid incident '{value}'. Choose from: {', '.join(VALID_INCIDENTS)}."
-            )
-        return value
+        return validate_incident(value)
+
+
+# -- Route forecast Schema -- #
+class RouteForecastInput(BaseModel):
+    route: str = Field(..., json_schema_extra="32", description="Bus route number (numeric only)")
+    direction: str = Field(..., json_schema_extra="E", description="Direction (N/S/E/W or full name)")
+    locations: List[str] = Field(..., min_length=1, max_length=100, description="Stops or stations along the route")
+    start: Optional[str] = Field(default=None, description="First hour as YYYY-MM-DDTHH:MM (Toronto time), defaults to the current hour")
+    hours: int = Field(default=12, ge=1, le=48, description="Forecast horizon in hours")
+    incident: str = Field(default="None", description="Incident type or 'None'")
+    min_gap: int = Field(default=10, ge=0, description="Gap between buses (in minutes)")
+
+    @field_validator("route")
+    def validate_route(cls, value):
+        return validate_route(value)
+
+    @field_validator("direction", mode='before')
+    def normalize_direction(cls, value):
+        return normalize_direction(value)
+
+    @field_validator("incident")
+    def validate_incident(cls, value):
+        return validate_incident(value)
 
 
 # ----- Load the models ----- #
@@ -120,6 +163,49 @@ def load_pkl_file(file_path):
         model = pickle.load(f)
     return model
 
+# Loaded once at import. Under gunicorn --preload that happens in the master,
+# so every forked worker shares these pages copy-on-write.
+ARTIFACTS = {}
+STARTED_AT = time.time()
+
+# Besides the models, a new location index or lookup cube also triggers a reload
+WATCHED_FILES = [INDEX_PATH, CUBE_PATH]
+
+def artifact_fingerprint():
+    files = [(p, os.path.getmtime(p), os.path.getsize(p)) for p in WATCHED_FILES if os.path.exists(p)]
+    return model_version(), files
+
+def reload_artifacts():
+    fingerprint = artifact_fingerprint()
+    ARTIFACTS.update(
+        reg_model=load_pkl_file("models/xgb_regressor.pkl"),
+        cls_model=load_pkl_file("models/xgb_classifier.pkl"),
+        encoders=load_pkl_file("models/encoders.pkl"),
+        location_index=load_index(INDEX_PATH) if os.path.exists(INDEX_PATH) else None,
+        version=fingerprint[0],
+        fingerprint=fingerprint,
+        loaded_at=datetime.now().isoformat(timespec="seconds"),
+    )
+    # Unseen labels share one "Unknown" code per encoder, appended here once rather than per request
+    for le in ARTIFACTS["encoders"].values():
+        if "Unknown" not in set(le.classes_):
+            le.classes_ = np.append(le.classes_, "Unknown")
+    # label -> code per encoder, for vectorized encoding
+    ARTIFACTS["codes"] = {col: {str(c): i for i, c in enumerate(le.classes_)} for col, le in ARTIFACTS["encoders"].items()}
+    # Load the cube now as well, so under --preload the workers share it with the master
+    _CUBE.clear()
+    get_lookup_cube()
+    return ARTIFACTS["version"]
+
+def refresh_artifacts():
+
+    """Reload only if the models, location index or cube changed since the last load; returns True when it did."""
+
+    if ARTIFACTS.get("fingerprint") == artifact_fingerprint():
+        return False
+    reload_artifacts()
+    return True
+
 # ---- Extract date and time features ---- #
 def time_features(date_str:str, time_str:str):
     dt = datetime.fromisoformat(f"{date_str}T{time_str}")
@@ -131,48 +217,79 @@ def time_features(date_str:str, time_str:str):
 
     return dt, hour, month, dayofweek, rush_hour, is_weekend
 
-# ---- fetch weather data ----- #
-def fetch_weathe_data(dt:datetime):
-    now = datetime.now()
-    is_past = dt.date() < now.date()
-
-    if is_past:
-        base_url = "https://archive-api.open-meteo.com/v1/archive"
-        params = {
-            "latitude": 43.7,
-            "longitude": -79.4,
-            "start_date": dt.date(),
-            "end_date": dt.date(),
-            "hourly": "temperature_2m,precipitation",
-            "timezone": "America/Toronto",
-            "format": "json"
-        }
-    else:
-        base_url = "https://api.open-meteo.com/v1/forecast"
-        params = {
-             "latitude": 43.7,
-            "longitude": -79.4,
-            "hourly": "temperature_2m,precipitation",
-            "timezone": "America/Toronto",
-            "forecast_days": 7,
-    }
-    
+# Open-Meteo is queried with timezone=America/Toronto, so its hours are Toronto wall-clock time
+TORONTO = ZoneInfo("America/Toronto")
+
+def toronto_now():
+    return datetime.now(TORONTO).replace(tzinfo=None)
+
+# ----- Hourly forecast, fetched once per FORECAST_TTL for every caller ----- #
+FORECAST_TTL = int(os.getenv("FORECAST_TTL_SECONDS", "900"))
+
+@lru_cache(maxsize=2)
+def _hourly_forecast(bucket:int):
+    res = requests.get("https://api.open-meteo.com/v1/forecast", params={
+        "latitude": 43.7,
+        "longitude": -79.4,
+        "hourly": "temperature_2m,precipitation",
+        "timezone": "America/Toronto",
+        "forecast_days": 7,
+    }, timeout=10)
+    res.raise_for_status()
+    hourly = res.json()["hourly"]
+    return (pd.to_datetime(hourly["time"]).values,
+            np.asarray(hourly["temperature_2m"], dtype=float),
+            np.asarray(hourly["precipitation"], dtype=float))
+
+def forecast_weather(times:np.ndarray):
+
+    """Temperature and precipitation arrays for each requested hour, from one cached forecast."""
+
+    fixed = os.getenv("TRANSITX_FIXED_WEATHER")
+    if fixed:
+        temp, rain = (float(v) for v in fixed.split(","))
+        return np.full(len(times), temp), np.full(len(times), rain)
     try:
-        res = requests.get(base_url, params=params, timeout=10)
-        res.raise_for_status()
-        data = res.json()
-        hour_idx = dt.hour
-
-        temp = data["hourly"]["temperature_2m"][hour_idx]
-        rain = data["hourly"]["precipitation"][hour_idx]
-
-        return temp, rain
+        f_times, f_temp, f_rain = _hourly_forecast(int(time.time() // FORECAST_TTL))
     except Exception as e:
-        raise HTTPException(
-            status_code=503,
-            detail=f"Could not fetch weather data for {dt.date()} as open-meteo api can predict till 16 days from today: {str(e)}"
-        )
-        return 10.0, 0.0
+        raise HTTPException(status_code=503, detail=f"Could not fetch the hourly forecast: {e}")
+    idx = np.searchsorted(f_times, times)
+    if (idx >= len(f_times)).any() or (f_times[np.minimum(idx, len(f_times) - 1)] != times).any():
+        raise HTTPException(status_code=400, detail="Requested hours fall outside the 7-day forecast window.")
+    return f_temp[idx], f_rain[idx]
+
+# ----- Past days: one archive call per day, kept for every caller ----- #
+@lru_cache(maxsize=64)
+def _archive_day(day:str):
+    res = requests.get("https://archive-api.open-meteo.com/v1/archive", params={
+        "latitude": 43.7,
+        "longitude": -79.4,
+        "start_date": day,
+        "end_date": day,
+        "hourly": "temperature_2m,precipitation",
+        "timezone": "America/Toronto",
+        "format": "json"
+    }, timeout=10)
+    res.raise_for_status()
+    hourly = res.json()["hourly"]
+    return hourly["temperature_2m"], hourly["precipitation"]
+
+def cached_weather(dt:datetime):
+
+    """Weather for one hour: the cached archive day for past dates, the shared forecast otherwise."""
+
+    fixed = os.getenv("TRANSITX_FIXED_WEATHER")
+    if fixed:
+        temp, rain = (float(v) for v in fixed.split(","))
+        return temp, rain
+    if dt.date() < toronto_now().date():
+        try:
+            temps, rains = _archive_day(dt.date().isoformat())
+        except Exception as e:
+            raise HTTPException(status_code=503, detail=f"Could not fetch weather data for {dt.date()}: {e}")
+        return temps[dt.hour], rains[dt.hour]
+    temp, rain = forecast_weather(np.array([np.datetime64(dt.replace(minute=0), "ns")]))
+    return float(temp[0]), float(rain[0])
 
 # ----- Weather Categories ----- #
 def categorize_weather(temp, rain):
@@ -196,22 +313,28 @@ def categorize_weather(temp, rain):
 
     return temp_bin, rain_bin
 
+# ---- Free-text locations -> the spelling the encoder was fitted on ----- #
+def canonical_locations(values):
+    index = ARTIFACTS.get("location_index")
+    return index.canonicalize(values) if index is not None else list(values)
+
 # ---- Encode categorical input ----- #
+def encode_array(col:str, values):
+
+    """Encode one column through ARTIFACTS["codes"]: unseen labels map to the "Unknown" code."""
+
+    codes = ARTIFACTS["codes"][col]
+    unknown = codes["Unknown"]
+    values = np.asarray(values).astype(str)
+    if col == "location":
+        values = canonical_locations(values)
+    return pd.Series(values).map(codes).fillna(unknown).astype(int).to_numpy()
+
 def encode_cat_input(df: pd.DataFrame, encoders: dict):
     df_copy = df.copy()
-    for col, le in encoders.items():
+    for col in encoders:
         if col in df_copy.columns:
-            df_copy[col] = df_copy[col].astype(str)
-            
-            known_classes = set(le.classes_)
-            df_copy[col] = df_copy[col].apply(lambda x: x if x in known_classes else "Unknown")
-            
-            # If "Unknown" wasn’t in the original encoder, add it dynamically
-            if "Unknown" not in known_classes:
-                import numpy as np
-                le.classes_ = np.append(le.classes_, "Unknown")
-            
-            df_copy[col] = le.transform(df_copy[col])
+            df_copy[col] = encode_array(col, df_copy[col])
     return df_copy
 
 #------ Prepare the data for predictions ------- #
@@ -228,7 +351,8 @@ def prepare_data(input_data:TransitInput):
     time_str = input_data.time
 
     dt, hour, month, dayofweek, rush_hour, is_weekend = time_features(date_str, time_str)
-    temp, precipitation = fetch_weathe_data(dt)
+    # Shared caches, so a cube hit does not wait on Open-Meteo once they are warm
+    temp, precipitation = cached_weather(dt)
     temp_bin, rain_intensity = categorize_weather(temp, precipitation)
 
     df = pd.DataFrame([{
@@ -249,14 +373,55 @@ def prepare_data(input_data:TransitInput):
         
     }])
 
-    encoder_file_path = "models/encoders.pkl"
-    encoder = load_pkl_file(encoder_file_path)
-    
-    encoded_df = encode_cat_input(df, encoder)
+    encoded_df = encode_cat_input(df, ARTIFACTS["encoders"])
 
     return encoded_df, date_str
 
 
+# ----- Precomputed lookup cube ----- #
+_CUBE = {}
+_cube_lock = threading.Lock()
+
+def get_lookup_cube():
+
+    """
+    The cube, if present and built for the loaded models. The result is kept
+    per (file mtime, model version), so a cube written after startup or a
+    model reload is picked up on the next request; a missing file is never
+    remembered.
+    """
+
+    try:
+        mtime = os.path.getmtime(CUBE_PATH)
+    except OSError:
+        return None
+    key = (mtime, ARTIFACTS.get("version"))
+    cached = _CUBE.get("entry")
+    if cached is None or cached[0] != key:
+        with _cube_lock:
+            cached = _CUBE.get("entry")
+            if cached is None or cached[0] != key:
+                cube = LookupCube(CUBE_PATH)
+                if cube.version != key[1]:
+                    print(f"Ignoring {CUBE_PATH}: built for model {cube.version}, not the deployed models")
+                    cube = None
+                cached = _CUBE["entry"] = (key, cube)
+    return cached[1]
+
+def lookup_prediction(input_df:pd.DataFrame, input_data:TransitInput):
+
+    """Cube hit for default incident/min_gap requests in the cube's month, else None (live inference)."""
+
+    cube = get_lookup_cube()
+    if cube is None or input_data.incident != DEFAULT_INCIDENT or input_data.min_gap != cube.min_gap:
+        return None
+    row = input_df.iloc[0]
+    if int(row["month"]) != cube.month:
+        return None
+    return cube.get({col: int(row[col]) for col in
+                     ["route", "direction", "location", "hour", "is_weekend", "temp_bin", "rain_intensity"]})
+
+
 # ----- Summary helper -----#
 def generate_summary(temp_bin_name, rain_intensity_name, delay_minutes, is_delayed):
     # Describe weather
@@ -281,15 +446,17 @@ def predict(input_data:TransitInput):
 
     input_df, date_str = prepare_data(input_data)
 
-    reg_model_path = "models/xgb_regressor.pkl"
-
-    reg_model = load_pkl_file(reg_model_path)
-
-    # Make predictions
-    delay_minutes = round(float(reg_model.predict(input_df)[0]))
+    cached = lookup_prediction(input_df, input_data)
+    if cached is not None:
+        delay_minutes = round(cached[0])
+        prediction_source = "lookup"
+    else:
+        # Make predictions
+        delay_minutes = round(float(ARTIFACTS["reg_model"].predict(input_df)[0]))
+        prediction_source = "model"
     is_delayed = delay_minutes > 3
 
-    encoder = load_pkl_file("models/encoders.pkl")
+    encoder = ARTIFACTS["encoders"]
     temp_bin_encoder = encoder.get("temp_bin")
     rain_encoder = encoder.get("rain_intensity")
 
@@ -319,12 +486,266 @@ def predict(input_data:TransitInput):
         "precipitation_mm": float(input_df["precipitation"].iloc[0]),
         "Weather_condition": temp_bin_name,
         "rain_condition": rain_intensity_name,
-        "summary":summary_text
+        "summary":summary_text,
+        "prediction_source": prediction_source
     }
 
     return response
 
-if __name__ =="__main__":
+def categorize_weather_array(temp:np.ndarray, rain:np.ndarray):
+    temp_bin = np.select([temp <= 0, temp <= 10, temp <= 20], ["Freezing", "Cold", "Mild"], "Warm")
+    rain_bin = np.select([rain <= 0.1, rain <= 2, rain <= 5], ["None", "Light", "Moderate"], "Heavy")
+    return temp_bin, rain_bin
+
+FEATURE_COLUMNS = ["route", "dayofweek", "location", "incident", "min_gap", "direction", "temperature",
+                   "precipitation", "hour", "month", "rush_hour", "is_weekend", "temp_bin", "rain_intensity"]
+
+def route_grid(input_data:RouteForecastInput, times:pd.DatetimeIndex, temp:np.ndarray, rain:np.ndarray):
+
+    """Hours x locations feature frame, hour-major, encoded the same way as /predict."""
+
+    n_hours, n_locs = len(times), len(input_data.locations)
+    h = np.repeat(np.arange(n_hours), n_locs)
+    loc = np.tile(np.arange(n_locs), n_hours)
+
+    temp_bin, rain_bin = categorize_weather_array(temp, rain)
+    day_names = times.day_name()
+    hour = times.hour.to_numpy()
+
+    grid = pd.DataFrame({
+        "route": encode_array("route", [input_data.route])[0],
+        "dayofweek": encode_array("dayofweek", day_names)[h],
+        "location": encode_array("location", input_data.locations)[loc],
+        "incident": encode_array("incident", [input_data.incident])[0],
+        "min_gap": input_data.min_gap,
+        "direction": encode_array("direction", [input_data.direction])[0],
+        "temperature": temp[h],
+        "precipitation": rain[h],
+        "hour": hour[h],
+        "month": times.month.to_numpy()[h],
+        "rush_hour": np.isin(hour, [7,8,9,16,17,18]).astype(int)[h],
+        "is_weekend": day_names.str.lower().isin(["saturday", "sunday"]).astype(int)[h],
+        "temp_bin": encode_array("temp_bin", temp_bin)[h],
+        "rain_intensity": encode_array("rain_intensity", rain_bin)[h],
+    }, columns=FEATURE_COLUMNS)
+    return grid
+
+
+@app.post("/forecast/route")
+def forecast_route(input_data:RouteForecastInput):
+    if input_data.start:
+        try:
+            start = datetime.fromisoformat(input_data.start)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid start. Use YYYY-MM-DDTHH:MM (e.g., 2024-05-12T09:00).")
+    else:
+        start = toronto_now()
+    start = start.replace(minute=0, second=0, microsecond=0)
+    times = pd.date_range(start, periods=input_data.hours, freq="h")
+
+    temp, rain = forecast_weather(times.values)
+    grid = route_grid(input_data, times, temp, rain)
+
+    # One call per model for the whole horizon
+    shape = (len(times), len(input_data.locations))
+    delay = ARTIFACTS["reg_model"].predict(grid).reshape(shape)
+    prob = ARTIFACTS["cls_model"].predict_proba(grid)[:, 1].reshape(shape)
+
+    return {
+        "route": input_data.route,
+        "direction": input_data.direction,
+        "incident": input_data.incident,
+        "locations": input_data.locations,
+        "hours": [t.strftime("%Y-%m-%dT%H:%M") for t in times],
+        "temperature_C": np.round(temp, 1).tolist(),
+        "precipitation_mm": np.round(rain, 2).tolist(),
+        "delay_minutes": np.clip(np.round(delay), 0, None).astype(int).tolist(),
+        "delay_probability": np.round(prob, 3).tolist(),
+        "model_version": ARTIFACTS["version"],
+    }
+
 
+# ----- Streaming scoring: micro-batches behind a bounded queue ----- #
+STREAM_BATCH = int(os.getenv("STREAM_BATCH", "256"))
+STREAM_MAX_WAIT = float(os.getenv("STREAM_MAX_WAIT_MS", "10")) / 1000
+STREAM_QUEUE = int(os.getenv("STREAM_QUEUE", "2048"))
+_END = object()
+
+def score_records(records:list):
+
+    """
+    Validate and score one micro-batch in arrival order. Bad records get an
+    `error` entry in place; the rest go through the regressor and classifier
+    in a single call each.
+    """
+
+    results, rows, valid = [None] * len(records), [], []
+    for i, rec in enumerate(records):
+        try:
+            if isinstance(rec, Exception):
+                raise rec
+            item = TransitInput(**rec)
+            dt, hour, month, dayofweek, rush_hour, is_weekend = time_features(item.date, item.time)
+            temp, rain = cached_weather(dt)
+            temp_bin, rain_bin = categorize_weather(temp, rain)
+        except HTTPException as e:
+            results[i] = {"error": e.detail}
+            continue
+        except Exception as e:
+            results[i] = {"error": str(e)}
+            continue
+        rows.append({
+            "route": item.route, "dayofweek": dayofweek, "location": item.location, "incident": item.incident,
+            "min_gap": item.min_gap, "direction": item.direction, "temperature": temp, "precipitation": rain,
+            "hour": hour, "month": month, "rush_hour": rush_hour, "is_weekend": is_weekend,
+            "temp_bin": temp_bin, "rain_intensity": rain_bin,
+        })
+        valid.append((i, item))
+
+    if rows:
+        batch = pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+        for col in ARTIFACTS["codes"]:
+            if col in batch.columns:
+                batch[col] = encode_array(col, batch[col])
+        delay = np.round(ARTIFACTS["reg_model"].predict(batch)).astype(int)
+        prob = ARTIFACTS["cls_model"].predict_proba(batch)[:, 1]
+        for (i, item), d, p in zip(valid, delay, prob):
+            results[i] = {
+                "datetime": f"{item.date} {item.time}",
+                "route": item.route,
+                "direction": item.direction,
+                "location": item.location,
+                "predicted_delay_minutes": int(d),
+                "is_delayed": bool(d > 3),
+                "delay_probability": round(float(p), 3),
+            }
+
+    for seq, res in enumerate(results):
+        res.setdefault("seq", seq)
+    return results
+
+async def score_stream(records):
+
+    """
+    Score an async iterator of records, yielding results in input order.
+    The reader fills a bounded queue and blocks when it is full, which stops
+    reading from the client (backpressure); the scorer drains up to
+    STREAM_BATCH records or waits STREAM_MAX_WAIT for stragglers, then
+    scores the batch in a worker thread.
+    """
+
+    queue = asyncio.Queue(maxsize=STREAM_QUEUE)
+
+    async def _read():
+        try:
+            async for rec in records:
+                await queue.put(rec)
+        finally:
+            await queue.put(_END)
+
+    reader = asyncio.create_task(_read())
+    seq, done = 0, False
+    try:
+        while not done:
+            item = await queue.get()
+            if item is _END:
+                break
+            batch = [item]
+            deadline = asyncio.get_running_loop().time() + STREAM_MAX_WAIT
+            while len(batch) < STREAM_BATCH:
+                timeout = deadline - asyncio.get_running_loop().time()
+                try:
+                    item = queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(queue.get(), timeout)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                if item is _END:
+                    done = True
+                    break
+                batch.append(item)
+            for res in await asyncio.to_thread(score_records, batch):
+                res["seq"] += seq
+                yield res
+            seq += len(batch)
+    finally:
+        reader.cancel()
+
+class DuplexStreamingResponse(StreamingResponse):
+
+    """
+    StreamingResponse that leaves `receive` to the endpoint. Under ASGI < 2.4
+    (uvicorn reports 2.3) Starlette's version listens for a disconnect on
+    `receive` while streaming, which swallows every body chunk that arrives
+    after the first result. Here request.stream() sees the disconnect instead.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+def parse_record(line:str):
+    try:
+        rec = json.loads(line)
+    except ValueError as e:
+        return ValueError(f"Invalid JSON: {e}")
+    return rec if isinstance(rec, dict) else ValueError("Each record must be a JSON object")
+
+
+@app.post("/predict/stream")
+async def predict_stream(request:Request):
+
+    """NDJSON in, NDJSON out: one TransitInput per line, one result per line, same order."""
+
+    async def _records():
+        buffer, decoder = "", codecs.getincrementaldecoder("utf-8")()
+        async for chunk in request.stream():
+            buffer += decoder.decode(chunk)
+            *lines, buffer = buffer.split("\n")
+            for line in lines:
+                if line.strip():
+                    yield parse_record(line)
+        if buffer.strip():
+            yield parse_record(buffer)
+
+    async def _results():
+        async for res in score_stream(_records()):
+            yield json.dumps(res) + "\n"
+
+    return DuplexStreamingResponse(_results(), media_type="application/x-ndjson")
+
+
+@app.websocket("/ws/predict")
+async def predict_ws(websocket:WebSocket):
+
+    """Each message is one TransitInput object or a JSON array of them; results come back one message each."""
+
+    await websocket.accept()
+
+    async def _records():
+        try:
+            while True:
+                message = await websocket.receive_text()
+                try:
+                    payload = json.loads(message)
+                except ValueError as e:
+                    yield ValueError(f"Invalid JSON: {e}")
+                    continue
+                for rec in payload if isinstance(payload, list) else [payload]:
+                    yield rec if isinstance(rec, dict) else ValueError("Each record must be a JSON object")
+        except WebSocketDisconnect:
+            return
+
+    # The stream ends when the client disconnects
+    try:
+        async for res in score_stream(_records()):
+            await websocket.send_text(json.dumps(res))
+    except WebSocketDisconnect:
+        pass
+
+
+reload_artifacts()
+
+if __name__ =="__main__":
+    # Single process for local use; production runs gunicorn -c deployment/gunicorn_conf.py
+    uvicorn.run(app, host="127.0.0.1", port=8000)
 
-    uvicorn.run("deployment.app:app", host="127.0.0.1", port=8000, reload=True)
@@ -0,0 +1,94 @@
+import gc
+import os
+import time
+import signal
+import threading
+
+# Production serving: gunicorn -c deployment/gunicorn_conf.py deployment.app:app
+#
+# The app (models, encoders, lookup cube) is imported once in the master and the
+# workers are forked from it, so they share those pages copy-on-write. A watcher
+# thread in the master only polls the mtimes of MODEL_FILES; when they change it
+# replaces the workers one at a time by signalling the arbiter (TTIN spawns a fresh
+# one, TTOU retires the oldest), so capacity never drops during a rollout. Nothing
+# is unpickled in that thread: the arbiter reloads the artifacts in pre_fork, on its
+# own main loop right before forking, and a worker that still sees stale files
+# loads them itself in post_fork.
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+accesslog = "-" if os.getenv("ACCESS_LOG") else None
+
+MODEL_FILES = ["models/xgb_regressor.pkl", "models/xgb_classifier.pkl", "models/encoders.pkl",
+               "models/location_index.pkl", "models/lookup_cube.npz"]
+WATCH_SECONDS = float(os.getenv("MODEL_WATCH_SECONDS", "10"))
+ROLL_STEP_SECONDS = float(os.getenv("ROLL_STEP_SECONDS", "5"))
+
+
+def _mtimes():
+    return {p: os.path.getmtime(p) for p in MODEL_FILES if os.path.exists(p)}
+
+
+def _freeze():
+    # Move everything allocated so far out of the GC's reach: collections in the
+    # workers would otherwise touch (and un-share) the preloaded objects.
+    gc.collect()
+    gc.freeze()
+
+
+def _rolling_restart(server, count:int):
+    master = os.getpid()
+    for _ in range(count):
+        os.kill(master, signal.SIGTTIN)
+        time.sleep(ROLL_STEP_SECONDS)
+        os.kill(master, signal.SIGTTOU)
+        time.sleep(ROLL_STEP_SECONDS)
+
+
+def _watch_models(server):
+    # Runs beside the arbiter loop, so it only stats files and sends signals
+    seen = _mtimes()
+    while True:
+        time.sleep(WATCH_SECONDS)
+        if _mtimes() == seen:
+            continue
+        # Let a copy in progress finish before the workers are rolled
+        time.sleep(WATCH_SECONDS)
+        seen = _mtimes()
+        server.log.info(f"Model files changed, rolling {server.num_workers} workers")
+        _rolling_restart(server, server.num_workers)
+
+
+def when_ready(server):
+    _freeze()
+    threading.Thread(target=_watch_models, args=(server,), name="model-watcher", daemon=True).start()
+    server.log.info(f"Serving with {server.num_workers} preloaded workers")
+
+
+def pre_fork(server, worker):
+    # Arbiter main loop, no worker forked yet: load changed files here so the new
+    # worker (and every later one) shares them copy-on-write
+    from deployment import app as api
+    try:
+        if not api.refresh_artifacts():
+            return
+    except Exception as e:
+        server.log.error(f"Model reload failed, forking with the loaded models: {e}")
+        return
+    _freeze()
+    server.log.info(f"Master loaded models {api.ARTIFACTS['version']}")
+
+
+def post_fork(server, worker):
+    # Files replaced between pre_fork and the fork are picked up by the worker itself
+    from deployment import app as api
+    try:
+        if api.refresh_artifacts():
+            server.log.info(f"Worker {worker.pid} loaded newer models than the master")
+    except Exception as e:
+        server.log.error(f"Worker {worker.pid} kept the master's models, reload failed: {e}")
@@ -1,43 +1,89 @@
-import subprocess
 import sys
 import os
+import argparse
 from datetime import datetime
-from src.utils.logger import get_logger
 
 sys.path.append(os.path.abspath(os.getcwd()))
-os.environ["PYTHONPATH"] = os.path.abspath(os.getcwd())
+
+from src.utils.logger import get_logger
+from src.utils.dag import Stage, run_dag
+from src.utils.telemetry import track, RUN_ID
+from src.pipelines import extract, transform, validate, feature_eng, load
 
 
 logger = get_logger("Main Data Pipeline")
 
-def run_stage(script_path:str):
-    logger.info(f"Started Executing {script_path}...")
+UTILS = ["src/utils/blob_client.py", "src/utils/logger.py"]
 
-    start_time =datetime.now()
 
-    result = subprocess.run([sys.executable, script_path])
-    duration = (datetime.now() - start_time).total_seconds()
+# ----- Stage wiring ----- #
+# Each stage runs in this interpreter; results flow to dependants in memory and
+# every stage also leaves its output in the local data/ cache, which is what a
+# skipped stage's dependants read instead.
+def build_stages():
+    return [
+        Stage(
+            name="extract_transit",
+            func=lambda: extract.run_transit(),
+            code=["src/pipelines/extract.py"],
+            outputs=extract.transit_paths(),
+            source=extract.transit_version,
+        ),
+        Stage(
+            name="extract_weather",
+            func=lambda: extract.run_weather(),
+            code=["src/pipelines/extract.py"],
+            outputs=extract.weather_paths(),
+            source=extract.weather_version,
+        ),
+        Stage(
+            name="transform",
+            func=lambda extract_transit, extract_weather: transform.run(extract_transit, extract_weather),
+            deps=["extract_transit", "extract_weather"],
+            code=["src/pipelines/transform.py"] + UTILS,
+            inputs=extract.transit_paths() + extract.weather_paths(),
+            outputs=[transform.PROCESSED_LOCAL],
+        ),
+        Stage(
+            name="validate",
+            func=lambda transform: validate.run(transform),
+            deps=["transform"],
+            code=["src/pipelines/validate.py"] + UTILS,
+            inputs=[transform.PROCESSED_LOCAL],
+            outputs=[validate.QUARANTINE_LOCAL, validate.REPORT_LOCAL],
+        ),
+        Stage(
+            name="feature_eng",
+            func=lambda validate: feature_eng.run(validate),
+            deps=["validate"],
+            code=["src/pipelines/feature_eng.py", "src/pipelines/validate.py", "src/utils/location_index.py"] + UTILS,
+            inputs=[transform.PROCESSED_LOCAL, validate.QUARANTINE_LOCAL],
+            outputs=[feature_eng.FEATURES_LOCAL, feature_eng.PARTITIONS_DIR, feature_eng.MATRIX_LOCAL,
+                     feature_eng.MATRIX_META, "models/encoders.pkl", "models/location_index.pkl"],
+        ),
+        Stage(
+            name="load",
+            func=lambda validate: load.run(validate),
+            deps=["validate"],
+            code=["src/pipelines/load.py", "src/pipelines/validate.py", "src/utils/firewall_helper.py"] + UTILS,
+            inputs=[transform.PROCESSED_LOCAL, validate.QUARANTINE_LOCAL],
+        ),
+    ]
 
-    if result.returncode != 0:
-        logger.error(f"Stage failed : {script_path}, Duration: {duration:.1f}s")
-        raise RuntimeError(f"Stage failed: {script_path}")
-    else:
-        logger.info(f"Completed : {script_path}, Duration:{duration:.2f}s")
-    
 
 if __name__ == "__main__":
-    logger.info(f"TransitX Data Pipeline Start | {datetime.now():%Y-%m-%d %H:%M:%S}")
+    parser = argparse.ArgumentParser(description="TransitX data pipeline")
+    parser.add_argument("--force", action="store_true", help="re-run every stage, ignoring the stage cache")
+    parser.add_argument("--workers", type=int, default=4, help="max stages running at once")
+    args = parser.parse_args()
 
-    stages = [
-        "src/pipelines/extract.py",
-        "src/pipelines/transform.py",
-        "src/pipelines/feature_eng.py",
-        "src/pipelines/load.py"
-    ]
+    logger.info(f"TransitX Data Pipeline Start | {datetime.now():%Y-%m-%d %H:%M:%S} | run {RUN_ID}")
 
     try:
-        for stage in stages:
-            run_stage(stage)
+        with track("pipeline"):
+            timings = run_dag(build_stages(), logger, max_workers=args.workers, force=args.force)
+        for name, t in timings.items():
+            logger.info(f"{name:<16} {t['status']:<7} {t['seconds']:>8.2f}s")
     except Exception as e:
         logger.error(f"Pipeline Failed: {e}")
         sys.exit(1)
@@ -0,0 +1,132 @@
+import os
+import time
+import pickle
+import argparse
+from datetime import datetime
+import numpy as np
+from src.utils.model_utils import load_data, upload_to_blob, iteration_range
+from src.utils.lazy import lazy_import
+from src.utils.lookup_cube import (CUBE_PATH, TEMP_BIN_VALUES, RAIN_BIN_VALUES, DAY_TYPES, DEFAULT_INCIDENT,
+                                   DEFAULT_MIN_GAP, model_version, pack_keys, save_cube)
+
+pd = lazy_import("pandas")
+
+TOP_K = int(os.getenv("LOOKUP_TOP_K", "2000"))
+BATCH_ROWS = int(os.getenv("LOOKUP_BATCH_ROWS", "500000"))
+RUSH_HOURS = [7, 8, 9, 16, 17, 18]
+
+
+def load_pkl(path:str):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+# ----- Most requested route x direction x location combinations ----- #
+def top_combinations(k:int=TOP_K):
+    df = load_data()
+    counts = df.groupby(["route", "direction", "location"]).size().nlargest(k)
+    return counts.index.to_frame(index=False).astype("int64")
+
+
+def known(encoder, labels):
+    classes = set(encoder.classes_)
+    return [label for label in labels if label in classes]
+
+
+# ----- Cartesian grid in model feature space ----- #
+def build_grid(combos, encoders:dict, month:int):
+
+    """
+    Every combination x 24 hours x day type x temp bin x rain bin, already
+    label-encoded. Day types use one representative day, weather bins a
+    representative temperature / precipitation, incident is "None" and
+    min_gap the API default, which are the conditions the API serves from the cube.
+    Returns None when the incident encoder never saw DEFAULT_INCIDENT.
+    """
+
+    if not known(encoders["incident"], [DEFAULT_INCIDENT]):
+        return None
+
+    temp_bins = known(encoders["temp_bin"], TEMP_BIN_VALUES)
+    rain_bins = known(encoders["rain_intensity"], RAIN_BIN_VALUES)
+    day_types = [d for d in DAY_TYPES if known(encoders["dayofweek"], [DAY_TYPES[d]])]
+
+    temp_codes = encoders["temp_bin"].transform(temp_bins)
+    rain_codes = encoders["rain_intensity"].transform(rain_bins)
+    day_codes = encoders["dayofweek"].transform([DAY_TYPES[d] for d in day_types])
+    incident = encoders["incident"].transform([DEFAULT_INCIDENT])[0]
+
+    c, hour, d, t, r = np.indices((len(combos), 24, len(day_types), len(temp_bins), len(rain_bins))).reshape(5, -1)
+    weekend = np.asarray(day_types)[d]
+
+    return pd.DataFrame({
+        "route": combos["route"].to_numpy()[c],
+        "dayofweek": day_codes[d],
+        "location": combos["location"].to_numpy()[c],
+        "incident": np.full(len(c), incident),
+        "min_gap": np.full(len(c), DEFAULT_MIN_GAP),
+        "direction": combos["direction"].to_numpy()[c],
+        "temperature": np.array([TEMP_BIN_VALUES[b] for b in temp_bins])[t],
+        "precipitation": np.array([RAIN_BIN_VALUES[b] for b in rain_bins])[r],
+        "hour": hour,
+        "month": np.full(len(c), month),
+        "rush_hour": np.isin(hour, RUSH_HOURS).astype(int),
+        "is_weekend": weekend,
+        "temp_bin": temp_codes[t],
+        "rain_intensity": rain_codes[r],
+    })
+
+
+# ----- Score the grid in batches with both models ----- #
+def score_grid(grid, reg_model, cls_model, batch_rows:int=BATCH_ROWS):
+    reg, cls = reg_model.get_booster(), cls_model.get_booster()
+    # Same trees as the live model's predict(), so lookup and model answers agree
+    reg_range, cls_range = iteration_range(reg), iteration_range(cls)
+    features = reg.feature_names or list(grid.columns)
+    delay = np.empty(len(grid), dtype=np.float32)
+    prob = np.empty(len(grid), dtype=np.float32)
+    for start in range(0, len(grid), batch_rows):
+        X = grid.iloc[start:start + batch_rows][features].to_numpy(dtype=np.float32)
+        delay[start:start + len(X)] = reg.inplace_predict(X, iteration_range=reg_range)
+        prob[start:start + len(X)] = cls.inplace_predict(X, iteration_range=cls_range)
+    return delay, prob
+
+
+def build_lookup(month:int, top_k:int=TOP_K, path:str=CUBE_PATH):
+    start = time.perf_counter()
+    encoders = load_pkl("models/encoders.pkl")
+    reg_model = load_pkl("models/xgb_regressor.pkl")
+    cls_model = load_pkl("models/xgb_classifier.pkl")
+
+    combos = top_combinations(top_k)
+    grid = build_grid(combos, encoders, month)
+    if grid is None:
+        print(f"Skipping the lookup cube: the training data has no {DEFAULT_INCIDENT!r} incidents, "
+              f"so the cube's default requests cannot be encoded")
+        return None
+    delay, prob = score_grid(grid, reg_model, cls_model)
+
+    keys = pack_keys({
+        "route": grid["route"], "direction": grid["direction"], "location": grid["location"],
+        "hour": grid["hour"], "is_weekend": grid["is_weekend"],
+        "temp_bin": grid["temp_bin"], "rain_intensity": grid["rain_intensity"],
+    })
+    version = model_version()
+    save_cube(path, keys, delay, prob, version, month)
+
+    seconds = time.perf_counter() - start
+    print(f"Lookup cube: {len(combos):,} combinations, {len(grid):,} rows for month {month}, "
+          f"model {version}, {os.path.getsize(path) / 1e6:.1f} MB in {seconds:.1f}s ({len(grid) / seconds:,.0f} rows/s)")
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute predictions for the most common API queries")
+    parser.add_argument("--month", type=int, default=datetime.now().month, help="month the cube is built for (1-12)")
+    parser.add_argument("--top-k", type=int, default=TOP_K, help="route x direction x location combinations to cover")
+    parser.add_argument("--upload", action="store_true", help="also upload the cube to the models container")
+    args = parser.parse_args()
+
+    path = build_lookup(args.month, args.top_k)
+    if args.upload and path:
+        upload_to_blob(path, os.path.basename(path))
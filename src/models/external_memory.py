@@ -0,0 +1,163 @@
+import os
+import time
+import shutil
+import argparse
+import numpy as np
+import xgboost as xgb
+from xgboost import XGBRegressor, XGBClassifier
+from src.utils.model_utils import list_partitions, partition_path, compact_dtypes, save_model, mlflow_starter, booster_to_sklearn
+from src.utils.lazy import lazy_import
+from src.models.train_joint import REG_PARAMS, CLS_PARAMS, TARGETS
+from src.models.incremental import record_full_fit
+
+pd = lazy_import("pandas")
+mlflow = lazy_import("mlflow")
+
+# Out-of-core training: XGBoost pulls batches of at most BATCH_ROWS rows from the
+# partition files and keeps the quantized pages in an on-disk cache, so peak
+# memory depends on the batch size, not on how many years of history exist.
+BATCH_ROWS = int(os.getenv("EXTMEM_BATCH_ROWS", "200000"))
+CACHE_DIR = os.getenv("EXTMEM_CACHE_DIR", "data/.cache/xgb_extmem")
+
+SPECS = {
+    "regressor": {"target": "min_delay", "params": REG_PARAMS, "cls": XGBRegressor, "file": "xgb_regressor.pkl", "experiment": "transitx-regressor"},
+    "classifier": {"target": "is_delayed", "params": CLS_PARAMS, "cls": XGBClassifier, "file": "xgb_classifier.pkl", "experiment": "transitx-classfier"},
+}
+
+
+def iter_batches(paths, batch_rows:int=BATCH_ROWS):
+    for path in paths:
+        for chunk in pd.read_csv(path, chunksize=batch_rows):
+            yield compact_dtypes(chunk)
+
+
+# ----- Batch iterator over partition files ----- #
+class PartitionIter(xgb.DataIter):
+
+    """Feeds one CSV chunk at a time to XGBoost; reset() restarts from the first partition."""
+
+    def __init__(self, paths, target:str, cache_prefix:str, batch_rows:int=BATCH_ROWS):
+        self._paths = paths
+        self._target = target
+        self._batch_rows = batch_rows
+        self._batches = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._batches is None:
+            self._batches = iter_batches(self._paths, self._batch_rows)
+        batch = next(self._batches, None)
+        if batch is None:
+            return False
+        input_data(data=batch.drop(columns=TARGETS), label=batch[self._target])
+        return True
+
+    def reset(self):
+        self._batches = None
+
+
+# ----- Streaming evaluation, one holdout partition at a time ----- #
+def evaluate_partition(model, path:str, kind:str, target:str):
+    totals = {"n": 0, "abs": 0.0, "sq": 0.0, "y": 0.0, "y2": 0.0, "tp": 0, "fp": 0, "fn": 0, "correct": 0}
+    for batch in iter_batches([path]):
+        y = batch[target].to_numpy(dtype=np.float64)
+        pred = model.predict(batch.drop(columns=TARGETS)).astype(np.float64)
+        totals["n"] += len(y)
+        if kind == "regressor":
+            totals["abs"] += np.abs(y - pred).sum()
+            totals["sq"] += ((y - pred) ** 2).sum()
+            totals["y"] += y.sum()
+            totals["y2"] += (y ** 2).sum()
+        else:
+            totals["tp"] += int(((pred == 1) & (y == 1)).sum())
+            totals["fp"] += int(((pred == 1) & (y == 0)).sum())
+            totals["fn"] += int(((pred == 0) & (y == 1)).sum())
+            totals["correct"] += int((pred == y).sum())
+    return totals
+
+
+def summarize(totals:dict, kind:str):
+    n = max(totals["n"], 1)
+    if kind == "regressor":
+        ss_tot = totals["y2"] - totals["y"] ** 2 / n
+        return {"mae": totals["abs"] / n, "mse": totals["sq"] / n, "r2": 1 - totals["sq"] / ss_tot if ss_tot else 0.0}
+    precision_recall = 2 * totals["tp"] + totals["fp"] + totals["fn"]
+    return {"Accuracy": totals["correct"] / n, "F1 Score": 2 * totals["tp"] / precision_recall if precision_recall else 0.0}
+
+
+# ----- Train one model out of core ----- #
+def train_external(kind:str, holdout:int=2, rounds:int=500, max_bin:int=256, batch_rows:int=BATCH_ROWS):
+
+    """
+    Train on every partition except the latest `holdout` ones, which are used
+    for early stopping and evaluation (per partition and overall), then
+    retrain on all partitions for the rounds early stopping picked. The
+    returned model has seen every partition, as record_full_fit assumes.
+    """
+
+    spec = SPECS[kind]
+    partitions = list_partitions()
+    if len(partitions) <= holdout:
+        raise ValueError(f"Need more than {holdout} partitions for an out-of-core run, found {len(partitions)}")
+    train_parts, hold_parts = partitions[:-holdout], partitions[-holdout:]
+
+    cache = os.path.join(CACHE_DIR, kind)
+    shutil.rmtree(cache, ignore_errors=True)
+    os.makedirs(cache, exist_ok=True)
+
+    start = time.perf_counter()
+    train_it = PartitionIter([partition_path(p) for p in train_parts], spec["target"], os.path.join(cache, "train"), batch_rows)
+    dtrain = xgb.ExtMemQuantileDMatrix(train_it, max_bin=max_bin)
+    val_it = PartitionIter([partition_path(p) for p in hold_parts], spec["target"], os.path.join(cache, "val"), batch_rows)
+    dval = xgb.ExtMemQuantileDMatrix(val_it, max_bin=max_bin, ref=dtrain)
+    matrix_seconds = time.perf_counter() - start
+
+    params = {**spec["params"], "max_bin": max_bin}
+    booster = xgb.train(params, dtrain, num_boost_round=rounds, evals=[(dval, "val")],
+                        early_stopping_rounds=20, verbose_eval=False)
+    train_seconds = time.perf_counter() - start
+    print(f"Out-of-core {kind}: {len(train_parts)} train / {len(hold_parts)} holdout partitions, "
+          f"matrices {matrix_seconds:.1f}s, total {train_seconds:.1f}s, best iteration {booster.best_iteration}")
+
+    model = booster_to_sklearn(booster, spec["cls"], spec["params"])
+    final_rounds = booster.best_iteration + 1
+
+    with mlflow_starter(spec["experiment"]):
+        mlflow.log_params({**spec["params"], "mode": "external_memory", "max_bin": max_bin, "batch_rows": batch_rows,
+                           "train_partitions": f"{train_parts[0]}..{train_parts[-1]}", "holdout_partitions": ",".join(hold_parts)})
+        overall = None
+        for part in hold_parts:
+            totals = evaluate_partition(model, partition_path(part), kind, spec["target"])
+            for k, v in summarize(totals, kind).items():
+                mlflow.log_metric(f"{k}_{part}", v)
+            overall = totals if overall is None else {k: overall[k] + totals[k] for k in overall}
+        metrics = summarize(overall, kind)
+        print(f"Holdout metrics: " + ", ".join(f"{k}={v:.3f}" for k, v in metrics.items()))
+        mlflow.log_metrics({**metrics, "train_seconds": train_seconds, "matrix_seconds": matrix_seconds})
+
+    # Final pass over every partition, reusing the training cuts
+    all_it = PartitionIter([partition_path(p) for p in partitions], spec["target"], os.path.join(cache, "all"), batch_rows)
+    dall = xgb.ExtMemQuantileDMatrix(all_it, max_bin=max_bin, ref=dtrain)
+    final = xgb.train(params, dall, num_boost_round=final_rounds, verbose_eval=False)
+    train_seconds = time.perf_counter() - start
+    print(f"Refit on all {len(partitions)} partitions for {final_rounds} rounds, total {train_seconds:.1f}s")
+
+    return booster_to_sklearn(final, spec["cls"], spec["params"]), train_seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train on partitioned feature files with XGBoost external memory")
+    parser.add_argument("--model", choices=["regressor", "classifier", "both"], default="both")
+    parser.add_argument("--holdout", type=int, default=2, help="latest N partitions held out for validation")
+    parser.add_argument("--rounds", type=int, default=500)
+    parser.add_argument("--max-bin", type=int, default=256)
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    args = parser.parse_args()
+
+    kinds = ["regressor", "classifier"] if args.model == "both" else [args.model]
+    for kind in kinds:
+        model, seconds = train_external(kind, args.holdout, args.rounds, args.max_bin, args.batch_rows)
+        save_model(model, SPECS[kind]["file"])
+        record_full_fit(kind, seconds, model)
+
+    print("Out-of-core training Complete !) ")
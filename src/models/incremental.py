@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import pickle
+import hashlib
+from datetime import datetime
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import mean_absolute_error, f1_score
+from src.utils.model_utils import list_partitions, load_partitions, save_model, mlflow_starter, PARTITIONS_DIR
+from src.utils.lazy import lazy_import
+
+pd = lazy_import("pandas")
+mlflow = lazy_import("mlflow")
+
+# Which partitions each saved model has seen, how long its last full fit took,
+# the params it was trained with and the encoder vocabularies it was trained on
+TRAIN_STATE = "models/train_state.json"
+ENCODERS_PATH = "models/encoders.pkl"
+# Runtime-only settings that should not be carried into a warm start
+SKIP_PARAMS = {"n_estimators", "early_stopping_rounds", "callbacks", "missing", "n_jobs", "nthread", "verbosity"}
+
+TARGETS = ["min_delay", "is_delayed"]
+KINDS = {
+    "regressor": {
+        "target": "min_delay",
+        "file": "xgb_regressor.pkl",
+        "experiment": "transitx-regressor",
+        # guardrail loss, lower is better
+        "loss": lambda y, p: mean_absolute_error(y, p),
+    },
+    "classifier": {
+        "target": "is_delayed",
+        "file": "xgb_classifier.pkl",
+        "experiment": "transitx-classfier",
+        "loss": lambda y, p: 1 - f1_score(y, p),
+    },
+}
+
+
+# ----- Training state ----- #
+def read_state():
+    if not os.path.exists(TRAIN_STATE):
+        return {}
+    with open(TRAIN_STATE) as f:
+        return json.load(f)
+
+
+def write_state(kind:str, **fields):
+    state = read_state()
+    state.setdefault(kind, {}).update(fields, updated_at=datetime.now().isoformat(timespec="seconds"))
+    os.makedirs(os.path.dirname(TRAIN_STATE), exist_ok=True)
+    with open(TRAIN_STATE, "w") as f:
+        json.dump(state, f, indent=2)
+
+
+# ----- Encoder vocabularies ----- #
+def encoder_signature(path:str=ENCODERS_PATH):
+
+    """{column: {"n": classes, "sha": hash of the ordered classes}} for the saved encoders."""
+
+    if not os.path.exists(path):
+        return {}
+    with open(path, "rb") as f:
+        encoders = pickle.load(f)
+    return {col: {"n": len(le.classes_), "sha": classes_hash(le.classes_)} for col, le in encoders.items()}
+
+
+def classes_hash(classes):
+    return hashlib.sha256("\x1f".join(map(str, classes)).encode()).hexdigest()
+
+
+def encoders_remapped(trained:dict, path:str=ENCODERS_PATH):
+
+    """
+    Columns whose codes changed since the model was trained: the encoder
+    classes the model saw must still be the leading classes, in order.
+    Appended classes are fine; anything else needs a full retrain.
+    """
+
+    if not os.path.exists(path):
+        return sorted(trained)
+    with open(path, "rb") as f:
+        encoders = pickle.load(f)
+    return sorted(col for col, sig in trained.items()
+                  if col not in encoders or classes_hash(encoders[col].classes_[:sig["n"]]) != sig["sha"])
+
+
+def training_params(model):
+
+    """JSON-safe booster params of a fitted sklearn wrapper, for warm starts."""
+
+    return {k: v for k, v in model.get_params().items()
+            if k not in SKIP_PARAMS and v is not None and isinstance(v, (str, int, float, bool))}
+
+
+def record_full_fit(kind:str, seconds:float, model=None):
+
+    """
+    Called by the trainers after a from-scratch fit, and records every
+    partition as trained. Trainers that hold data out for early stopping or
+    evaluation must refit on all of it before calling this (they all do).
+    """
+
+    partitions = list_partitions() if os.path.isdir(PARTITIONS_DIR) else []
+    fields = {"params": training_params(model)} if model is not None else {}
+    write_state(kind, partitions=partitions, full_fit_seconds=round(seconds, 3), last_mode="full",
+                encoders=encoder_signature(), **fields)
+
+
+# ----- Full retrain through the regular trainer ----- #
+def full_retrain(kind:str):
+    from src.utils.model_utils import load_xy
+    from src.models import train_regressor, train_classifier
+
+    spec = KINDS[kind]
+    features, targets = load_xy()
+
+    start = time.perf_counter()
+    if kind == "regressor":
+        model = train_regressor.train_reg_model(spec["target"], features, targets)
+    else:
+        model = train_classifier.train_classifier_model(spec["target"], features, targets)
+    seconds = time.perf_counter() - start
+
+    save_model(model, spec["file"])
+    record_full_fit(kind, seconds, model)
+    return model
+
+
+# ----- Warm start: keep boosting the saved model on new partitions ----- #
+def incremental_train(kind:str, new_rounds:int=100, window:int=None, tolerance:float=0.05):
+
+    """
+    Continue boosting the saved `kind` model on partitions it has not seen yet
+    (or, with `window`, on the most recent `window` partitions).
+
+    The guardrail compares the old and updated model on a holdout made of 20%
+    of the new rows plus 20% of the latest already-trained partition; if the
+    updated loss is more than `tolerance` (relative) worse, the update is
+    discarded and a full retrain runs instead. Returns the model in use.
+    """
+
+    spec = KINDS[kind]
+    state = read_state().get(kind, {})
+    model_path = f"models/{spec['file']}"
+
+    if not os.path.exists(model_path) or not state.get("partitions"):
+        print(f"No previous {kind} or training state, running a full retrain")
+        return full_retrain(kind)
+
+    # Trees split on label codes; if any existing code moved, boosting on would mix two numberings
+    remapped = encoders_remapped(state.get("encoders")) if state.get("encoders") else ["<not recorded>"]
+    if remapped:
+        print(f"Encoder codes changed since the last fit ({', '.join(remapped)}), running a full retrain")
+        return full_retrain(kind)
+
+    with open(model_path, "rb") as f:
+        prev_model = pickle.load(f)
+
+    available = list_partitions()
+    trained = [p for p in available if p in set(state["partitions"])]
+    new = [p for p in available if p not in set(state["partitions"])]
+    if window:
+        new = available[-window:]
+    if not new:
+        print(f"{kind} is up to date with {len(available)} partitions")
+        return prev_model
+
+    start = time.perf_counter()
+    df_new = load_partitions(new, compact=True)
+    X_new, y_new = df_new.drop(columns=TARGETS), df_new[spec["target"]]
+    X_fit, X_hold, y_fit, y_hold = train_test_split(X_new, y_new, test_size=0.2, random_state=42)
+
+    # Mix in recent history so the guardrail also catches forgetting
+    recent = [p for p in trained if p not in new][-1:]
+    if recent:
+        df_old = load_partitions(recent, compact=True).sample(frac=0.2, random_state=42)
+        X_hold = pd.concat([X_hold, df_old.drop(columns=TARGETS)])
+        y_hold = pd.concat([y_hold, df_old[spec["target"]]])
+
+    # Wrapped native boosters report default params, the recorded training params win
+    params = {**prev_model.get_params(), **state.get("params", {}), "n_estimators": new_rounds, "early_stopping_rounds": None}
+    model = prev_model.__class__(**params)
+    model.fit(X_fit, y_fit, xgb_model=prev_model.get_booster(), verbose=False)
+    seconds = time.perf_counter() - start
+
+    loss_before = spec["loss"](y_hold, prev_model.predict(X_hold))
+    loss_after = spec["loss"](y_hold, model.predict(X_hold))
+    full_seconds = state.get("full_fit_seconds")
+    speedup = full_seconds / seconds if full_seconds and seconds else None
+
+    print(f"Incremental {kind}: {len(new)} partition(s), {len(X_fit):,} rows, {seconds:.1f}s "
+          f"(last full fit {full_seconds}s), holdout loss {loss_before:.4f} -> {loss_after:.4f}")
+
+    with mlflow_starter(spec["experiment"]):
+        mlflow.log_params({"mode": "incremental", "new_partitions": ",".join(new), "new_rounds": new_rounds, "window": window})
+        metrics = {"incremental_seconds": seconds, "holdout_loss_before": loss_before, "holdout_loss_after": loss_after}
+        if speedup:
+            metrics.update(full_fit_seconds=full_seconds, speedup_vs_full=speedup)
+        mlflow.log_metrics(metrics)
+
+    if loss_after > loss_before * (1 + tolerance):
+        print(f"Holdout loss got worse by more than {tolerance:.0%}, falling back to a full retrain")
+        return full_retrain(kind)
+
+    save_model(model, spec["file"])
+    write_state(kind, partitions=sorted(set(state["partitions"]) | set(new)), last_mode="incremental",
+                last_incremental_seconds=round(seconds, 3), encoders=encoder_signature(),
+                params=state.get("params") or training_params(prev_model))
+    return model
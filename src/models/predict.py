@@ -1,11 +1,36 @@
+from __future__ import annotations
+
 import os
+import time
+import shutil
 import pickle
+import argparse
+from typing import TYPE_CHECKING
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
 from dotenv import load_dotenv
-import pandas as pd
-from azure.storage.blob import BlobServiceClient
+from src.utils.blob_client import get_container
+from src.utils.lazy import lazy_import
+from src.utils.model_utils import list_partitions, partition_path, matrix_available, open_feature_matrix, iteration_range, PARTITIONS_DIR
+from src.utils.telemetry import track, annotate
+
+if TYPE_CHECKING:
+    import pandas as pd
+else:
+    pd = lazy_import("pandas")
 
 load_dotenv()
 
+INPUT_FILE = "data/model_input/transit_features.csv"
+REG_MODEL_PATH = "models/xgb_regressor.pkl"
+CLASS_MODEL_PATH = "models/xgb_classifier.pkl"
+OUTPUT_DIR = "data/predictions"
+TARGETS = ["min_delay", "is_delayed"]
+
+# Streaming mode: each worker process holds both boosters and scores
+# CHUNK_ROWS rows at a time, so memory is bounded by workers x chunk size.
+CHUNK_ROWS = int(os.getenv("PREDICT_CHUNK_ROWS", "250000"))
+PREDICT_WORKERS = int(os.getenv("PREDICT_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+
 
 # ----- Load the Model ----- #
 def load_model(model_path:str):
@@ -26,29 +51,157 @@ def generate_predictions(df:pd.DataFrame, model, model_name:str):
 
 # ----- Upload to Blob ----- #
 def upload_to_blob(path:str, blob_name:str):
-    conn_str = os.getenv("AZ_STORAGE_CONNECTION_STRING")
-    svc = BlobServiceClient.from_connection_string(conn_str)
-    container = svc.get_container_client(os.getenv("PREDICTIONS", "predictions"))
+    container = get_container(os.getenv("PREDICTIONS", "predictions"))
 
     with open(path, "rb") as f:
         container.upload_blob(name=blob_name, data=f, overwrite=True)
         print(f"Uploaded predictions -> Azure Blob: {container}/{blob_name}")
 
-if __name__=="__main__":
-    print("Starting Batch Predictions......")
-
-    input_file = "data/model_input/transit_features.csv"
 
-    df_original = pd.read_csv(input_file)
-
-    reg_model_path = "models/xgb_regressor.pkl"
-    class_model_path = "models/xgb_classifier.pkl"
-
-    reg_model = load_model(reg_model_path)
-    class_model = load_model(class_model_path)
+# ----- Streaming scorer (runs inside the worker processes) ----- #
+_models = {}
+_ranges = {}
+_matrix = {}
+
+def _init_worker(reg_path:str, class_path:str, nthread:int, use_matrix:bool=False):
+    for name, path in (("reg", reg_path), ("cls", class_path)):
+        with open(path, "rb") as f:
+            booster = pickle.load(f).get_booster()
+        booster.set_param({"nthread": nthread})
+        _models[name] = booster
+        # inplace_predict uses every tree unless told where early stopping ended
+        _ranges[name] = iteration_range(booster)
+    if use_matrix:
+        # Every worker maps the same file, the OS page cache holds one copy
+        _matrix["data"], _matrix["meta"] = open_feature_matrix(mode="r")
+
+
+def matrix_features(rows:tuple):
+
+    """Rows [start, stop) of the memory map as a DataFrame plus the feature slice as a float32 view."""
+
+    start, stop = rows
+    data, meta = _matrix["data"], _matrix["meta"]
+    block = data[start:stop]
+    features = _models["reg"].feature_names or meta["features"]
+    if features == meta["features"]:
+        X = block[:, :len(features)]
+    else:
+        X = block[:, [meta["columns"].index(f) for f in features]]
+    return pd.DataFrame(block, columns=meta["columns"], copy=False), X
+
+
+def score_chunk(chunk:pd.DataFrame, X=None):
+
+    """Score both models on one shared float32 feature array and append the prediction columns."""
+
+    import numpy as np
+
+    if X is None:
+        features = _models["reg"].feature_names or [c for c in chunk.columns if c not in TARGETS]
+        X = np.ascontiguousarray(chunk[features].to_numpy(dtype=np.float32))
+    chunk["pred_delay_minutes"] = _models["reg"].inplace_predict(X, iteration_range=_ranges["reg"]).round()
+    chunk["pred_is_delayed"] = (_models["cls"].inplace_predict(X, iteration_range=_ranges["cls"]) > 0.5).astype("int8")
+    return chunk
+
+
+def score_part(part:str, out_path:str, rows:tuple=None, source:str=None, chunk:pd.DataFrame=None):
+
+    """
+    Score one part into `out_path` (Parquet). A part is a row range of the
+    memory-mapped feature matrix, a feature partition file read here in
+    CHUNK_ROWS slices, or a chunk handed over by the parent.
+    """
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if rows is not None:
+        pieces = (matrix_features((a, min(a + CHUNK_ROWS, rows[1]))) for a in range(rows[0], rows[1], CHUNK_ROWS))
+    else:
+        pieces = ((c, None) for c in (pd.read_csv(source, chunksize=CHUNK_ROWS) if source else [chunk]))
+    writer, scored = None, 0
+    try:
+        for piece, X in pieces:
+            table = pa.Table.from_pandas(score_chunk(piece, X), preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(out_path, table.schema, compression="snappy")
+            writer.write_table(table)
+            scored += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return part, out_path, scored
+
+
+def iter_parts(input_file:str=INPUT_FILE, use_matrix:bool=False):
+    if use_matrix:
+        _, meta = open_feature_matrix()
+        for key, rows in meta["partitions"].items():
+            yield key, {"rows": tuple(rows)}
+    elif os.path.isdir(PARTITIONS_DIR) and list_partitions():
+        for key in list_partitions():
+            yield key, {"source": partition_path(key)}
+    else:
+        for i, chunk in enumerate(pd.read_csv(input_file, chunksize=CHUNK_ROWS)):
+            yield f"{i:05d}", {"chunk": chunk}
+
+
+def stream_predictions(input_file:str=INPUT_FILE, workers:int=PREDICT_WORKERS, upload:bool=True):
+
+    """
+    Score every feature part across a process pool and write one Parquet file
+    per part under data/predictions/transit_predictions/. When feature_eng.py
+    left a memory-mapped matrix, workers get row ranges and map it directly.
+    Each finished part is uploaded while later parts are still being scored.
+    At most 2*workers parts are in flight. Returns (rows, seconds).
+    """
+
+    out_dir = os.path.join(OUTPUT_DIR, "transit_predictions")
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir, exist_ok=True)
+
+    nthread = max(1, (os.cpu_count() or 1) // workers)
+    use_matrix = input_file == INPUT_FILE and matrix_available()
+    start = time.perf_counter()
+    rows = 0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(REG_MODEL_PATH, CLASS_MODEL_PATH, nthread, use_matrix)) as pool, \
+         ThreadPoolExecutor(max_workers=2) as uploader:
+        pending, uploads = set(), []
+
+        def _collect(done):
+            nonlocal rows
+            for f in done:
+                part, path, n = f.result()
+                rows += n
+                print(f"Scored part {part}: {n:,} rows ({rows / (time.perf_counter() - start):,.0f} rows/s so far)")
+                if upload:
+                    uploads.append(uploader.submit(upload_to_blob, path, f"transit_predictions/part-{part}.parquet"))
+
+        for part, kwargs in iter_parts(input_file, use_matrix):
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                _collect(done)
+            pending.add(pool.submit(score_part, part, os.path.join(out_dir, f"part-{part}.parquet"), **kwargs))
+        _collect(pending)
+
+        for f in uploads:
+            f.result()
+
+    return rows, time.perf_counter() - start
+
+
+# ----- Whole-file scoring (original path) ----- #
+def full_predictions():
+    df_original = pd.read_csv(INPUT_FILE)
+
+    reg_model = load_model(REG_MODEL_PATH)
+    class_model = load_model(CLASS_MODEL_PATH)
 
     df_model_input = df_original.copy()
-    for col in ["min_delay", "is_delayed"]:
+    for col in TARGETS:
         if col in df_model_input.columns:
             df_model_input.drop(columns=[col], inplace=True)
 
@@ -60,16 +213,29 @@ if __name__=="__main__":
     df_original["pred_delay_minutes"] = pred_delay_minutes
     df_original["pred_is_delayed"]= pred_is_delayed
 
-    os.makedirs("data/predictions", exist_ok=True)
-    output_path = "data/predictions/transit_predictions.csv"
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    output_path = os.path.join(OUTPUT_DIR, "transit_predictions.csv")
     df_original.to_csv(output_path, index=False)
 
     upload_to_blob(output_path, "transit_predictions.csv")
 
-    print("Batch predictions completed Successfully.")
-
-    
 
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="Batch-score the feature table with both models")
+    parser.add_argument("--mode", choices=["stream", "full"], default="stream",
+                        help="stream: chunked, multi-process, Parquet parts; full: whole CSV in memory")
+    parser.add_argument("--workers", type=int, default=PREDICT_WORKERS)
+    parser.add_argument("--no-upload", action="store_true")
+    args = parser.parse_args()
 
+    print("Starting Batch Predictions......")
 
+    if args.mode == "full":
+        full_predictions()
+    else:
+        with track("predict"):
+            rows, seconds = stream_predictions(workers=args.workers, upload=not args.no_upload)
+            annotate(rows_out=rows)
+        print(f"Scored {rows:,} rows in {seconds:.1f}s ({rows / max(seconds, 1e-9):,.0f} rows/s) with {args.workers} workers")
 
+    print("Batch predictions completed Successfully.")
@@ -1,38 +1,20 @@
 import os
-import pandas as pd
-from sklearn.model_selection import train_test_split, RandomizedSearchCV
+import time
+import argparse
 from sklearn.metrics import accuracy_score, f1_score, confusion_matrix
 from xgboost import XGBClassifier
 import pickle
-import mlflow
-import mlflow.sklearn
-from src.utils.model_utils import load_data, upload_to_blob, mlflow_starter
+from src.utils.model_utils import load_xy, split_rows, refit, upload_to_blob, mlflow_starter
+from src.utils.lazy import lazy_import
+from src.models.tuning import tune_xgb, BUDGET_SECONDS
+from src.models.incremental import incremental_train, record_full_fit
 
-# ---- Hyperparameter Tuning ----- #
-def tune_model(X_train, y_train):
-    param_dist = {
-        "n_estimators": [200, 300, 500],
-        "max_depth": [4,6,8,10],
-        "learning_rate": [0.01,0.05, 0.1],
-        "subsample":[0.7, 0.9, 1.0],
-        "colsample_bytree":[0.7,1.0],
-        "gamma":[0,2,5]
-    }
-    model = XGBClassifier(eval_metric = "logloss", random_state=42)
-
-    search = RandomizedSearchCV(
-        model,
-        n_iter=20,
-        param_distributions=param_dist,
-        cv=3,
-        verbose=2,
-        n_jobs=1, 
-        random_state=42)
-    
-    search.fit(X_train, y_train)
-    print("Best parameters: ", search.best_params_)
+mlflow = lazy_import("mlflow")
 
-    return search.best_estimator_
+# ---- Hyperparameter Tuning ----- #
+def tune_model(X_train, y_train, budget_seconds=BUDGET_SECONDS):
+    return tune_xgb(XGBClassifier, X_train, y_train, scoring="accuracy",
+                    base_params={"eval_metric": "logloss"}, budget_seconds=budget_seconds)
 
 # --- Prediction and Evaluation of metrics --- #
 def predict_eval_metrics(model, X_test, y_test):
@@ -49,9 +31,9 @@ def predict_eval_metrics(model, X_test, y_test):
     
 
 # ----- Train the Model ----- #
-def train_classifier_model(target, features, df):
+def train_classifier_model(target, features, targets):
 
-    X_train, X_test, y_train, y_test = train_test_split(features, df[target], test_size=0.2, random_state=42)
+    X_train, X_test, y_train, y_test = split_rows(features, targets[target], test_size=0.2)
 
     with mlflow_starter("transitx-classfier"):
         print("\n Training XGBoost Classifier (Delayed vs On-Time)\n")
@@ -63,25 +45,41 @@ def train_classifier_model(target, features, df):
         mlflow.log_metric("Accuracy", accuracy)
         mlflow.log_metric("F1 Score", f1)
 
+        # The holdout is the latest months: score on it, then train the saved model on every row
+        final_model = refit(best_model, features, targets[target])
+        mlflow.log_param("refit_rows", len(features))
+        return final_model
 
-        return best_model
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the XGBoost classifier")
+    parser.add_argument("--incremental", action="store_true", help="keep boosting the saved model on new feature partitions")
+    parser.add_argument("--window", type=int, default=None, help="with --incremental, boost on the latest N partitions")
+    parser.add_argument("--rounds", type=int, default=100, help="with --incremental, boosting rounds to add")
+    return parser.parse_args()
 
-if __name__ == "__main__":
-    df = load_data()
 
-    target = "is_delayed"
-    features = df.drop(columns=["min_delay", target])
+if __name__ == "__main__":
+    args = parse_args()
+    if args.incremental:
+        incremental_train("classifier", new_rounds=args.rounds, window=args.window)
+        print("Classfier incremental training Complete !) ")
+    else:
+        features, targets = load_xy()
 
-    assert all(features.dtypes != "object"), "Non-numeric columns found — check feature_eng.py"
+        target = "is_delayed"
+        assert all(features.dtypes != "object"), "Non-numeric columns found — check feature_eng.py"
 
-    best_model = train_classifier_model(target, features, df)
-    os.makedirs("models", exist_ok=True)
-    save_path = "models/xgb_classifier.pkl"
+        start = time.perf_counter()
+        best_model = train_classifier_model(target, features, targets)
+        fit_seconds = time.perf_counter() - start
+        os.makedirs("models", exist_ok=True)
+        save_path = "models/xgb_classifier.pkl"
 
-    with open(save_path, "wb") as f:
-        pickle.dump(best_model, f)
+        with open(save_path, "wb") as f:
+            pickle.dump(best_model, f)
 
-    upload_to_blob(save_path, "xgb_classifier.pkl")
+        upload_to_blob(save_path, "xgb_classifier.pkl")
+        record_full_fit("classifier", fit_seconds, best_model)
 
-    print("Classfier training Complete !) ")
\ No newline at end of file
+        print("Classfier training Complete !) ")
\ No newline at end of file
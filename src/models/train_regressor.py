@@ -1,38 +1,20 @@
 import os
-import pandas as pd
-from sklearn.model_selection import train_test_split, RandomizedSearchCV
+import time
+import argparse
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from xgboost import XGBRegressor
 import pickle
-import mlflow
-from src.utils.model_utils import load_data, upload_to_blob, mlflow_starter
+from src.utils.model_utils import load_xy, split_rows, refit, upload_to_blob, mlflow_starter
+from src.utils.lazy import lazy_import
+from src.models.tuning import tune_xgb, BUDGET_SECONDS
+from src.models.incremental import incremental_train, record_full_fit
 
-# ---- Hyperparameter Tuning ----- #
-def tune_model(X_train, y_train):
-    param_dist = {
-        "n_estimators": [200, 300, 500],
-        "max_depth": [4,6,8,10],
-        "learning_rate": [0.01,0.05, 0.1],
-        "subsample":[0.7, 0.9, 1.0],
-        "colsample_bytree":[0.7,1.0],
-        "gamma":[0,2,5]
-    }
-    model = XGBRegressor(random_state=42)
-
-    search = RandomizedSearchCV(
-        model,
-        n_iter=20,
-        param_distributions=param_dist,
-        scoring="neg_mean_absolute_error",
-        cv=3,
-        verbose=2,
-        n_jobs=1, 
-        random_state=42)
-    
-    search.fit(X_train, y_train)
-    print("Best parameters: ", search.best_params_)
+mlflow = lazy_import("mlflow")
 
-    return search.best_estimator_
+# ---- Hyperparameter Tuning ----- #
+def tune_model(X_train, y_train, budget_seconds=BUDGET_SECONDS):
+    return tune_xgb(XGBRegressor, X_train, y_train, scoring="neg_mean_absolute_error",
+                    base_params={"eval_metric": "mae"}, budget_seconds=budget_seconds)
 
 # --- Prediction and Evaluation of metrics --- #
 def predict_eval_metrics(model, X_test, y_test):
@@ -49,9 +31,9 @@ def predict_eval_metrics(model, X_test, y_test):
     
 
 # ----- Train the Model ----- #
-def train_reg_model(target, features, df):
+def train_reg_model(target, features, targets):
 
-    X_train, X_test, y_train, y_test = train_test_split(features, df[target], test_size=0.2, random_state=42)
+    X_train, X_test, y_train, y_test = split_rows(features, targets[target], test_size=0.2)
 
     with mlflow_starter("transitx-regressor"):
         print("\n Training XGBoost Regressor (Predicting Delay Minutes)\n")
@@ -64,24 +46,41 @@ def train_reg_model(target, features, df):
         mlflow.log_metric("mse", mse)
         mlflow.log_metric("r2", r2)
 
-        return best_model
+        # The holdout is the latest months: score on it, then train the saved model on every row
+        final_model = refit(best_model, features, targets[target])
+        mlflow.log_param("refit_rows", len(features))
+        return final_model
 
 
-if __name__ == "__main__":
-    df = load_data()
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the XGBoost regressor")
+    parser.add_argument("--incremental", action="store_true", help="keep boosting the saved model on new feature partitions")
+    parser.add_argument("--window", type=int, default=None, help="with --incremental, boost on the latest N partitions")
+    parser.add_argument("--rounds", type=int, default=100, help="with --incremental, boosting rounds to add")
+    return parser.parse_args()
+
 
-    target = "min_delay"
-    features = df.drop(columns=[target, "is_delayed"])
+if __name__ == "__main__":
+    args = parse_args()
+    if args.incremental:
+        incremental_train("regressor", new_rounds=args.rounds, window=args.window)
+        print("Regressor incremental training Complete !) ")
+    else:
+        features, targets = load_xy()
 
-    assert all(features.dtypes != "object"), "Non-numeric columns found — check feature_eng.py"
+        target = "min_delay"
+        assert all(features.dtypes != "object"), "Non-numeric columns found — check feature_eng.py"
 
-    best_model = train_reg_model(target, features, df)
+        start = time.perf_counter()
+        best_model = train_reg_model(target, features, targets)
+        fit_seconds = time.perf_counter() - start
 
-    os.makedirs("models", exist_ok=True)
-    save_path = "models/xgb_regressor.pkl"
-    with open (save_path, "wb") as f:
-        pickle.dump(best_model, f)
+        os.makedirs("models", exist_ok=True)
+        save_path = "models/xgb_regressor.pkl"
+        with open (save_path, "wb") as f:
+            pickle.dump(best_model, f)
 
-    upload_to_blob(save_path, "xgb_regressor.pkl")
+        upload_to_blob(save_path, "xgb_regressor.pkl")
+        record_full_fit("regressor", fit_seconds, best_model)
 
-    print("Regressor training Complete !) ")
\ No newline at end of file
+        print("Regressor training Complete !) ")
\ No newline at end of file
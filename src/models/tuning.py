@@ -0,0 +1,117 @@
+import os
+import time
+from sklearn.model_selection import ParameterSampler
+from sklearn.metrics import get_scorer
+from src.utils.lazy import lazy_import
+from src.utils.model_utils import split_rows
+
+mlflow = lazy_import("mlflow")
+
+# n_estimators is not sampled: it is the resource that successive halving hands out
+PARAM_DIST = {
+    "max_depth": [4, 6, 8, 10],
+    "learning_rate": [0.01, 0.05, 0.1],
+    "subsample": [0.7, 0.9, 1.0],
+    "colsample_bytree": [0.7, 1.0],
+    "gamma": [0, 2, 5],
+}
+
+N_CANDIDATES = int(os.getenv("TUNE_CANDIDATES", "20"))
+BUDGET_SECONDS = float(os.getenv("TUNE_BUDGET_SECONDS", "0")) or None
+
+
+def rung_rounds(min_rounds:int, max_rounds:int, eta:int):
+
+    """
+    Rounds per rung, growing by `eta` and ending at `max_rounds`. A rung within
+    one eta-factor of the cap is dropped: 50, 150, 450, 500 becomes 50, 150,
+    500, since a 450-round rung would cost nearly a full fit and select almost
+    nothing the final rung doesn't. The first rung is always kept.
+    """
+
+    rounds, r = [], min_rounds
+    while r < max_rounds:
+        if not rounds or r * eta <= max_rounds:
+            rounds.append(r)
+        r *= eta
+    return rounds + [max_rounds]
+
+
+# ---- Successive-halving search shared by both trainers ----- #
+def tune_xgb(estimator_cls, X_train, y_train, scoring:str, base_params:dict=None, param_dist:dict=PARAM_DIST,
+             n_candidates:int=N_CANDIDATES, eta:int=3, min_rounds:int=50, max_rounds:int=500,
+             early_stopping_rounds:int=20, budget_seconds:float=BUDGET_SECONDS, val_size:float=0.2,
+             random_state:int=42):
+
+    """
+    Tune an XGBoost sklearn estimator with successive halving over boosting rounds.
+
+    All candidates start with `min_rounds` trees; after each rung only the best
+    1/eta survive and get eta times more rounds, up to `max_rounds`. A survivor
+    keeps boosting from its previous rung's booster instead of refitting. Every fit
+    uses tree_method="hist" on all cores and early-stops on a held-out
+    validation fold (the last `val_size` of the rows, sliced without copying). Search stops early once `budget_seconds` is spent. Each
+    trial is logged as a nested MLflow run. The winner is refit on all of
+    X_train with its early-stopped number of rounds.
+    """
+
+    base_params = {"tree_method": "hist", "n_jobs": os.cpu_count() or -1, "random_state": random_state, **(base_params or {})}
+    scorer = get_scorer(scoring)
+    X_fit, X_val, y_fit, y_val = split_rows(X_train, y_train, test_size=val_size)
+
+    candidates = list(ParameterSampler(param_dist, n_iter=n_candidates, random_state=random_state))
+    survivors = list(range(len(candidates)))
+    results, boosters = {}, {}
+    trials = 0
+    start = time.perf_counter()
+    out_of_budget = False
+
+    for rung, rounds in enumerate(rung_rounds(min_rounds, max_rounds, eta)):
+        scores = {}
+        for idx in survivors:
+            if budget_seconds and results and time.perf_counter() - start > budget_seconds:
+                out_of_budget = True
+                break
+
+            params = candidates[idx]
+            prev = boosters.get(idx)
+            done = prev.num_boosted_rounds() if prev is not None else 0
+            model = estimator_cls(**base_params, **params, n_estimators=rounds - done, early_stopping_rounds=early_stopping_rounds)
+            t0 = time.perf_counter()
+            model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False, xgb_model=prev)
+            fit_seconds = time.perf_counter() - t0
+            trials += 1
+            score = scorer(model, X_val, y_val)
+            best_iteration = int(getattr(model, "best_iteration", rounds - 1))
+
+            scores[idx] = score
+            results[idx] = {"rung": rung, "score": score, "best_iteration": best_iteration}
+            boosters[idx] = model.get_booster()
+
+            with mlflow.start_run(run_name=f"trial-{idx}-rung-{rung}", nested=True):
+                mlflow.log_params({**params, "rounds": rounds})
+                mlflow.log_metrics({"score": score, "fit_seconds": fit_seconds, "best_iteration": best_iteration, "rung": rung})
+
+            print(f"[rung {rung}] trial {idx} rounds={rounds} score={score:.4f} fit={fit_seconds:.1f}s")
+
+        if out_of_budget or not scores:
+            print(f"Tuning budget of {budget_seconds}s spent during rung {rung}")
+            break
+
+        keep = max(1, len(scores) // eta)
+        survivors = sorted(scores, key=scores.get, reverse=True)[:keep]
+        boosters = {i: boosters[i] for i in survivors}
+
+    # Winner: best score among trials that reached the highest rung
+    top_rung = max(r["rung"] for r in results.values())
+    best_idx = max((i for i, r in results.items() if r["rung"] == top_rung), key=lambda i: results[i]["score"])
+    best_params = candidates[best_idx]
+    best_rounds = results[best_idx]["best_iteration"] + 1
+
+    print("Best parameters: ", {**best_params, "n_estimators": best_rounds})
+    mlflow.log_params({f"best_{k}": v for k, v in best_params.items()})
+    mlflow.log_metrics({"tuning_seconds": time.perf_counter() - start, "tuning_trials": trials, "best_val_score": results[best_idx]["score"]})
+
+    best_model = estimator_cls(**base_params, **best_params, n_estimators=best_rounds)
+    best_model.fit(X_train, y_train, verbose=False)
+    return best_model
@@ -1,20 +1,23 @@
 import os
+import time
 import requests
 from dotenv import load_dotenv
-from azure.storage.blob import BlobServiceClient
-import pandas as pd
 from datetime import datetime
+from src.utils.blob_client import get_container
+from src.utils.lazy import lazy_import
+
+pd = lazy_import("pandas")
 
 # ----- Load environment variables ----- #
 load_dotenv()
 
 
 # ----- Azure Connection ----- #
-CON_STR = os.getenv("AZ_STORAGE_CONNECTION_STRING")
 RAW_CONTAINER= os.getenv("DATA_CONTAINER_RAW", "raw")
 
-svc = BlobServiceClient.from_connection_string(CON_STR)
-container = svc.get_container_client(RAW_CONTAINER)
+TTC_PACKAGE_URL = "https://ckan0.cf.opendata.inter.prod-toronto.ca/api/3/action/package_show?id=ttc-bus-delay-data"
+# Open-Meteo has no last-modified metadata, so the current year's archive is re-pulled once per TTL
+EXTRACT_TTL = int(os.getenv("EXTRACT_TTL_SECONDS", "86400"))
 
 
 # ----- Upload to Azure Blob ----- #
@@ -23,7 +26,7 @@ def upload_to_blob(local_path: str, blob_name: str):
     """Upload local file to Azure Blob Storage"""
 
     with open(local_path, "rb") as f:
-        container.upload_blob(name=blob_name, data=f, overwrite=True)
+        get_container(RAW_CONTAINER).upload_blob(name=blob_name, data=f, overwrite=True)
     print(f"Uploaded {blob_name} -> container '{RAW_CONTAINER}'")
 
 
@@ -41,18 +44,20 @@ def download_file(url: str, local_path: str):
     print(f"Saved to {local_path}")
 
 
+# ----- TTC dataset metadata from Toronto Open Data ----- #
+def ttc_resources():
+    r = requests.get(TTC_PACKAGE_URL, timeout=30)
+    r.raise_for_status()
+    return r.json()["result"]["resources"]
+
+
 # ----- Get the URLs for the transit delay data for each year ----- #
 def get_ttc_resource_url(year: int) -> str:
 
     """Query the Toronto Open Data API to get the TTC Dataset URL for the given year."""
 
-    api_url = "https://ckan0.cf.opendata.inter.prod-toronto.ca/api/3/action/package_show?id=ttc-bus-delay-data"
-    r = requests.get(api_url)
-    r.raise_for_status()
-    data = r.json()
-
     # Search all resources for one that match our year
-    for resource in data["result"]["resources"]:
+    for resource in ttc_resources():
         fmt = resource["format"].lower()
         if str(year) in resource["name"] and fmt in ["csv", "xlsx"]:
             print(f"Found dataset for {year} : {resource['url']}")
@@ -81,6 +86,7 @@ def fetch_transit_data(year: int):
 
     upload_to_blob(csv_path, f"ttc_bus_delay_{year}.csv")
     print(f"Completed processing for {year}")
+    return csv_path
 
 
 # ------ Extract the Weather Data ------ #
@@ -98,12 +104,64 @@ def fetch_weather_data(year: int):
     local_path = f"data/weather/weather_{year}.csv"
     download_file(url, local_path)
     upload_to_blob(local_path, f"weather_{year}.csv")
+    return local_path
+
+
+# ----- Pipeline stages ----- #
+YEARS = [2023, 2024]
+
+
+def ttl_bucket(ttl:int=EXTRACT_TTL):
+    return int(time.time() // ttl)
+
+
+# ----- Source versions (hashed into the stage cache key by main.py) ----- #
+def transit_version(years=YEARS):
+
+    """Last-modified stamps of the TTC resources for `years`; a TTL bucket when the portal is unreachable."""
+
+    try:
+        resources = ttc_resources()
+    except requests.RequestException as e:
+        print(f"Could not read TTC metadata ({e}), falling back to the {EXTRACT_TTL}s TTL")
+        return {"ttl_bucket": ttl_bucket()}
+    return {r["name"]: r.get("last_modified") or r.get("created")
+            for r in resources if any(str(year) in r["name"] for year in years)}
+
+
+def weather_version(years=YEARS):
+
+    """
+    A year of the archive is final a week into the next year (Open-Meteo lags
+    a few days); until then it changes daily, so it expires every EXTRACT_TTL seconds.
+    """
+
+    now = datetime.now()
+    return {str(year): "final" if now >= datetime(year + 1, 1, 8) else ttl_bucket() for year in years}
+
+def transit_paths(years=YEARS):
+    return [f"data/raw/ttc_bus_delay_{year}.csv" for year in years]
+
+def weather_paths(years=YEARS):
+    return [f"data/weather/weather_{year}.csv" for year in years]
+
+def run_transit(years=YEARS):
+
+    """Extract every TTC year, returns the local CSV paths (also uploaded to `raw`)."""
+
+    return [fetch_transit_data(year) for year in years]
+
+def run_weather(years=YEARS):
+
+    """Extract every weather year, returns the local CSV paths (also uploaded to `raw`)."""
+
+    return [fetch_weather_data(year) for year in years]
 
 
 # ----- Entry Point ----- #
 if __name__ == "__main__":
     print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Starting extraction......")
-    for year in [2023, 2024]:
+    for year in YEARS:
         fetch_transit_data(year)
         fetch_weather_data(year)
         print(f"{year} Data extracted sucessfully")
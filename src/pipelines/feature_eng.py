@@ -1,25 +1,41 @@
+from __future__ import annotations
+
 import os
-import pandas as pd
+import json
 import pickle
-from azure.storage.blob import BlobServiceClient
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
-from sklearn.preprocessing import LabelEncoder
+from src.utils.blob_client import get_container
+from src.utils.lazy import lazy_import
+from src.utils.telemetry import track, annotate, file_bytes
+from src.utils.location_index import LocationIndex, INDEX_PATH, save_index, load_index
+from src.pipelines import validate
+
+if TYPE_CHECKING:
+    import pandas as pd
+else:
+    pd = lazy_import("pandas")
 
 
 load_dotenv()
 
 # ----- Azure Setup ----- #
-CONN_STR = os.getenv("AZ_STORAGE_CONNECTION_STRING")
 PROC_CONTAINER = os.getenv("DATA_CONTAINER_PROCESSED", "processed")
 MODEL_CONTAINER = os.getenv("DATA_CONTAINER_MODEL_INPUT", "model-input")
 
-svc = BlobServiceClient.from_connection_string(CONN_STR)
-proc_cont = svc.get_container_client(PROC_CONTAINER)
-model_cont = svc.get_container_client(MODEL_CONTAINER)
+# ----- Local outputs ----- #
+PROCESSED_NAME = "transit_transformed_data_2023_2024.csv"
+PROCESSED_LOCAL = f"data/processed/{PROCESSED_NAME}"
+FEATURES_LOCAL = "data/model_input/transit_features.csv"
+PARTITIONS_DIR = "data/model_input/partitions"
+PARTITION_COL = "partition_month"
+MATRIX_LOCAL = "data/model_input/transit_features.npy"
+MATRIX_META = "data/model_input/transit_features.json"
+TARGETS = ["min_delay", "is_delayed"]
 
 # ----- Read the Processed Data ----- #
 def read_proc_blob(blob_name:str):
-    blob = proc_cont.download_blob(blob_name)
+    blob = get_container(PROC_CONTAINER).download_blob(blob_name)
 
     df = pd.read_csv(blob)
     print(f"Loaded the processed data from {blob_name}, shape = {df.shape}")
@@ -29,18 +45,50 @@ def read_proc_blob(blob_name:str):
 # ----- Upload the Data After Feature Eng. ----- #
 def upload_to_model_blob(blob_name:str, local_path:str):
     with open(local_path, "rb") as f:
-        model_cont.upload_blob(name=blob_name, data=f, overwrite=True)
+        get_container(MODEL_CONTAINER).upload_blob(name=blob_name, data=f, overwrite=True)
     print(f"Uploaded {blob_name} to container {MODEL_CONTAINER}")
 
 # ----- Saving the encoders for inference ------ #
+ENCODERS_PATH = "models/encoders.pkl"
+
 def save_encoders(encoders:dict):
     os.makedirs("models", exist_ok=True)
-    with open("models/encoders.pkl", "wb") as f:
+    with open(ENCODERS_PATH, "wb") as f:
         pickle.dump(encoders, f)
 
 
+def load_encoders():
+    if not os.path.exists(ENCODERS_PATH):
+        return {}
+    with open(ENCODERS_PATH, "rb") as f:
+        return pickle.load(f)
+
+
+# ----- Append-only label encoding ------ #
+def extend_encoder(previous, values:pd.Series):
+
+    """
+    LabelEncoder whose classes are `previous`'s, in the same order, followed
+    by the unseen values (sorted). Existing codes never move, so warm-started
+    models and the API keep meaning the same thing by each code.
+    """
+
+    import numpy as np
+    from sklearn.preprocessing import LabelEncoder
+
+    known = list(previous.classes_) if previous is not None else []
+    seen = set(known)
+    le = LabelEncoder()
+    le.classes_ = np.array(known + sorted(v for v in values.unique() if v not in seen), dtype=object)
+    return le
+
+
+def encode(le, values:pd.Series):
+    return values.map({c: i for i, c in enumerate(le.classes_)}).astype("int64")
+
+
 # ------ Feature Engineering ------ #
-def feature_eng(df:pd.DataFrame):
+def feature_eng(df:pd.DataFrame, keep_partition:bool=False):
     print("Starting Feature Engineering....")
 
     # Clean Column names
@@ -80,19 +128,35 @@ def feature_eng(df:pd.DataFrame):
     # Cap Outliers
     df['min_delay'] = df['min_delay'].clip(0, 300)
 
+    # One canonical spelling per location ("KENNEDY STN" -> "KENNEDY STATION"), shared with the API
+    # Names from earlier builds keep their label (delete models/location_index.pkl to start over)
+    previous = load_index() if os.path.exists(INDEX_PATH) else None
+    location_index = LocationIndex(df["location"], previous=previous)
+    os.makedirs("models", exist_ok=True)
+    save_index(location_index)
+    n_spellings = df["location"].nunique()
+    df["location"] = location_index.canonicalize(df["location"])
+    print(f"Location index: {n_spellings} spellings -> {len(location_index)} canonical locations")
+
     # Encoding the categorical Variables
     cat_cols = ["route", "incident", "dayofweek", "location", "direction", "temp_bin", "rain_intensity"]
     encoders= {}
     
+    # Extends models/encoders.pkl rather than refitting (delete it to renumber from scratch)
+    previous = load_encoders()
     for col in cat_cols:
-        le = LabelEncoder()
-        df[col] = df[col].astype(str)
-        df[col] = le.fit_transform(df[col])
+        values = df[col].astype(str).fillna("nan")  # pandas >= 3 keeps missing values missing through astype(str)
+        le = extend_encoder(previous.get(col), values)
+        df[col] = encode(le, values)
         encoders[col] = le
     save_encoders(encoders)
 
 
     df["is_delayed"] = (df["min_delay"] > 5).astype(int)
+
+    # Year/month key for the partitioned feature files (not a model feature)
+    if keep_partition:
+        df[PARTITION_COL] = df["date"].dt.strftime("%Y-%m").fillna("unknown")
     
     #Dropping Unnecessary
     df.drop(columns=["time_x", "time_y", "date", "vehicle"], errors='ignore', inplace=True)
@@ -100,21 +164,107 @@ def feature_eng(df:pd.DataFrame):
     print(f"Feature Engineering Complete ")
     return df
 
-if __name__ == "__main__":
-    print("Starting Feature Engineering Pipeline ....")
 
-    df = read_proc_blob("transit_transformed_data_2023_2024.csv")
+# ----- One feature file per year/month, for incremental and out-of-core training ----- #
+def write_partitions(df:pd.DataFrame, partition_keys:pd.Series, root:str=PARTITIONS_DIR):
+    os.makedirs(root, exist_ok=True)
+    for old in os.listdir(root):
+        if old.startswith("part-") and old.endswith(".csv"):
+            os.remove(os.path.join(root, old))
+
+    paths = []
+    for key, part in df.groupby(partition_keys, sort=True):
+        path = os.path.join(root, f"part-{key}.csv")
+        part.to_csv(path, index=False)
+        paths.append(path)
+    print(f"Saved {len(paths)} feature partitions under {root}")
+    return paths
+
+
+# ----- Fixed-dtype matrix that training and scoring memory-map ----- #
+def write_feature_matrix(df:pd.DataFrame, partition_keys:pd.Series, path:str=MATRIX_LOCAL, meta_path:str=MATRIX_META):
+
+    """
+    Write the features as one float32 .npy matrix: rows grouped by partition
+    month, feature columns first and targets last, so X and y are plain
+    slices of the memory map. The JSON sidecar records the column order and
+    each partition's row range.
+    """
+
+    import numpy as np
+
+    features = [c for c in df.columns if c not in TARGETS]
+    targets = [t for t in TARGETS if t in df.columns]
+    columns = features + targets
+
+    tmp = path + ".tmp"
+    matrix = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(len(df), len(columns)))
+    groups = df.groupby(partition_keys, sort=True).indices
+    ranges, start = {}, 0
+    for key in sorted(groups):
+        stop = start + len(groups[key])
+        matrix[start:stop] = df.iloc[groups[key]][columns].to_numpy(dtype=np.float32)
+        ranges[key] = [start, stop]
+        start = stop
+    matrix.flush()
+    del matrix
+    os.replace(tmp, path)
 
-    df_feat_eng = feature_eng(df)
+    meta = {"columns": columns, "features": features, "targets": targets, "dtype": "float32",
+            "shape": [len(df), len(columns)], "partitions": ranges}
+    with open(meta_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    print(f"Saved the {len(df):,} x {len(columns)} float32 feature matrix to {path}")
+    return [path, meta_path]
 
-    os.makedirs("data/model_input", exist_ok=True)
-    local_path = "data/model_input/transit_features.csv"
 
-    df_feat_eng.to_csv(local_path, index=False)
-    print(f"Saved {local_path} locally.")
+# ----- Pipeline stage ----- #
+def run(df:pd.DataFrame=None):
 
-    upload_to_model_blob("transit_features.csv", local_path)
+    """
+    Build and publish the model features. `df` is the in-memory validate
+    output, else the transform output is read from the local copy or blob and
+    the rows quarantined by validate.py are dropped.
+    """
 
+    with track("feature_eng", "read"):
+        if df is None:
+            source = None
+            if os.path.exists(PROCESSED_LOCAL):
+                df = pd.read_csv(PROCESSED_LOCAL)
+                annotate(bytes_read=file_bytes([PROCESSED_LOCAL]))
+                print(f"Loaded the processed data from {PROCESSED_LOCAL}, shape = {df.shape}")
+                source = PROCESSED_LOCAL
+            else:
+                df = read_proc_blob(PROCESSED_NAME)
+            df = validate.clean(df, source)
+        else:
+            # feature_eng renames/drops in place, keep the caller's frame intact
+            df = df.copy()
+        annotate(rows_out=len(df))
+
+    with track("feature_eng", "features"):
+        rows_in = len(df)
+        df_feat_eng = feature_eng(df, keep_partition=True)
+        partition_keys = df_feat_eng.pop(PARTITION_COL)
+        annotate(rows_in=rows_in, rows_out=len(df_feat_eng))
+
+    with track("feature_eng", "write"):
+        os.makedirs(os.path.dirname(FEATURES_LOCAL), exist_ok=True)
+        df_feat_eng.to_csv(FEATURES_LOCAL, index=False)
+        print(f"Saved {FEATURES_LOCAL} locally.")
+
+        part_paths = write_partitions(df_feat_eng, partition_keys)
+        part_paths += write_feature_matrix(df_feat_eng, partition_keys)
+
+        upload_to_model_blob("transit_features.csv", FEATURES_LOCAL)
+        annotate(rows_in=len(df_feat_eng), bytes_written=file_bytes([FEATURES_LOCAL] + part_paths))
+    return df_feat_eng
+
+
+if __name__ == "__main__":
+    print("Starting Feature Engineering Pipeline ....")
+    run()
     print("Feature Engineering Completed Successfully :) ")
 
 
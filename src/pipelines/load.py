@@ -1,32 +1,105 @@
+from __future__ import annotations
+
 import os
-import pandas as pd 
+import time
+import uuid
+import hashlib
+import argparse
+import tempfile
+import threading
+from datetime import datetime
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
-from azure.storage.blob import BlobServiceClient
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from src.utils.firewall_helper import ensure_firewall_access
+from src.utils.blob_client import get_container
+from src.utils.lazy import lazy_import
+from src.utils.telemetry import track, annotate
 from io import StringIO
 
+pd = lazy_import("pandas")
+sa = lazy_import("sqlalchemy")
+
 
 load_dotenv()
 
-def connect_sql():
-    conn_str = os.getenv("AZ_SQL_CONNECTION_STRING")
+BULK_CHUNK_ROWS = int(os.getenv("SQL_BULK_CHUNK_ROWS", "50000"))
+BULK_WORKERS = int(os.getenv("SQL_BULK_WORKERS", "4"))
+
+# Pin text columns so every chunk maps to the same SQL types (route is "32" in one chunk, "RAD" in another)
+CSV_DTYPES = {"route": str, "direction": str, "location": str, "incident": str, "day": str}
+
+# Incremental loads replace whole year/month partitions tracked in a small state table
+PARTITION_COL = "partition_month"
+STATE_TABLE = "transitx_load_state"
+INDEX_COLS = ["date", "route", PARTITION_COL]
+
+
+# Bounded types so the index columns are indexable on Azure SQL (no NVARCHAR(max))
+def sql_dtypes():
+    return {"date": sa.DateTime(), "route": sa.String(32), PARTITION_COL: sa.String(7)}
+
+
+# One engine per connection string for the life of the process
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def connect_sql(conn_str:str=None, pool_size:int=BULK_WORKERS):
+
+    """
+    Pooled engine, built on first use and reused by every later load in the
+    process. `conn_str` overrides AZ_SQL_CONNECTION_STRING (e.g. sqlite:///bench.db).
+    """
+
+    conn_str = conn_str or os.getenv("AZ_SQL_CONNECTION_STRING")
     if not conn_str:
         raise ValueError("AZ_SQL_CONNECTION_STRING is missing in .env")
-    engine= create_engine(conn_str)
-    print("Connected to Azure SQL Database.")
+
+    key = (conn_str, pool_size)
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = create_engine(conn_str, pool_size)
+        return _engines[key]
+
+
+def create_engine(conn_str:str, pool_size:int):
+    # pre-ping swaps out connections Azure SQL dropped while the pool sat idle
+    kwargs = {"pool_pre_ping": True}
+    if conn_str.startswith("mssql+pyodbc"):
+        # pyodbc sends each executemany batch as one parameter array instead of row by row
+        kwargs["fast_executemany"] = True
+    if conn_str.startswith("sqlite"):
+        kwargs["connect_args"] = {"timeout": 60}
+    else:
+        kwargs["pool_size"] = pool_size
+        kwargs["max_overflow"] = 0
+        kwargs["pool_recycle"] = 1800
+
+    engine= sa.create_engine(conn_str, **kwargs)
+    if engine.dialect.name == "mssql":
+        preflight(engine)
+    print(f"Connected to {engine.dialect.name} database.")
     return engine
 
 
+def preflight(engine):
+
+    """Cached firewall check, then one test connection; a refused connection re-checks the rule once, ignoring the cache."""
+
+    ensure_firewall_access()
+    try:
+        with engine.connect() as conn:
+            conn.execute(sa.text("SELECT 1"))
+    except sa.exc.DBAPIError:
+        ensure_firewall_access(force=True)
+        with engine.connect() as conn:
+            conn.execute(sa.text("SELECT 1"))
+
+
 # -------- Download from Blob -------- #
 def download_from_blob(blob_name:str, container_name="processed"):
 
-    conn_str = os.getenv("AZ_STORAGE_CONNECTION_STRING")
-    if not conn_str:
-        raise ValueError("AZ_STORAGE_CONNECTION_STRING missing in .env")
-    
-    svc = BlobServiceClient.from_connection_string(conn_str)
-    container = svc.get_container_client(container_name)
+    container = get_container(container_name)
     blob = container.download_blob(blob_name)
 
     csv_str = blob.readall().decode("utf-8")
@@ -34,11 +107,80 @@ def download_from_blob(blob_name:str, container_name="processed"):
     return pd.read_csv(StringIO(csv_str))
 
 
+# -------- Stream partitions from Blob / local disk -------- #
+def list_partitions(prefix:str, container_name="processed"):
+
+    """Blob names under `prefix`, so a partitioned dataset (one CSV per year/month) loads as one table."""
+
+    container = get_container(container_name)
+    return sorted(b.name for b in container.list_blobs(name_starts_with=prefix) if b.name.endswith(".csv"))
+
+
+def iter_blob_chunks(blob_names, container_name="processed", chunksize:int=BULK_CHUNK_ROWS):
+
+    """Yield DataFrame chunks straight off the blob download stream, never holding a whole file in memory."""
+
+    container = get_container(container_name)
+
+    for name in blob_names:
+        stream = container.download_blob(name)
+        for chunk in pd.read_csv(stream, chunksize=chunksize, dtype=CSV_DTYPES):
+            yield chunk
+
+
+def iter_local_chunks(paths, chunksize:int=BULK_CHUNK_ROWS):
+
+    """Local-file stand-in for iter_blob_chunks, used for benchmarks and offline runs."""
+
+    for path in paths:
+        annotate(bytes_read=os.path.getsize(path))
+        for chunk in pd.read_csv(path, chunksize=chunksize, dtype=CSV_DTYPES):
+            yield chunk
+
+
+# ----- Parallel chunked writer ------ #
+def write_chunks(chunks, table_name:str, engine, if_exists="replace", workers:int=BULK_WORKERS, dtype=None):
+
+    """
+    Write an iterable of DataFrames into `table_name`.
+    The first chunk creates (or replaces) the table, the rest are appended by
+    `workers` threads, each on its own pooled connection. At most 2*workers
+    chunks are in flight so memory stays bounded by the chunk size.
+    Returns (rows, seconds).
+    """
+
+    if engine.dialect.name == "sqlite":
+        # sqlite allows a single writer, extra threads would only wait on the file lock
+        workers = 1
+
+    def _write(chunk, mode):
+        with engine.begin() as conn:
+            chunk.to_sql(table_name, con=conn, if_exists=mode, index=False, dtype=dtype)
+        return len(chunk)
+
+    start = time.perf_counter()
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        return 0, 0.0
+
+    rows = _write(first, if_exists)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for chunk in chunks:
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                rows += sum(f.result() for f in done)
+            pending.add(pool.submit(_write, chunk, "append"))
+        rows += sum(f.result() for f in pending)
+
+    return rows, time.perf_counter() - start
+
 
 # ----- Load the CSV file from Blob to Azure SQL ------ #
 def load_to_sql(blob_name:str, table_name:str):
 
-    ensure_firewall_access()
     df= download_from_blob(blob_name)
 
     engine = connect_sql()
@@ -50,15 +192,301 @@ def load_to_sql(blob_name:str, table_name:str):
     print("Data successfully loaded to Azure SQL.")
 
 
+def iter_frame_chunks(df:pd.DataFrame, chunksize:int=BULK_CHUNK_ROWS):
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize].copy()
 
 
-if __name__ == "__main__":
+def skip_rows(chunks, rows):
+
+    """Drop rows by position in the stream (pandas numbers chunk rows continuously across one file)."""
+
+    rows = pd.Index(rows)
+    for chunk in chunks:
+        yield chunk[~chunk.index.isin(rows)]
+
+
+def source_chunks(blob_names=None, prefix:str=None, local_paths=None, chunksize:int=BULK_CHUNK_ROWS, frame=None):
+
+    """Chunk iterator over an in-memory frame, local CSVs, explicit blobs or every blob under `prefix`."""
+
+    if frame is not None:
+        return iter_frame_chunks(frame, chunksize)
+    if local_paths:
+        return iter_local_chunks(local_paths, chunksize)
+
+    if prefix:
+        blob_names = list_partitions(prefix)
+    return iter_blob_chunks(blob_names, chunksize=chunksize)
 
-    blob_name = "transit_transformed_data_2023_2024.csv"
 
-    load_to_sql(blob_name, table_name="transit_delay_weather")
+# ----- Bulk load: stream partitions into a pooled engine ------ #
+def bulk_load_to_sql(table_name:str, blob_names=None, prefix:str=None, local_paths=None,
+                     conn_str:str=None, chunksize:int=BULK_CHUNK_ROWS, workers:int=BULK_WORKERS):
 
+    """
+    Replace `table_name` with the given partitions using batched, parallel inserts.
+    Sources: explicit blob names, every blob under `prefix`, or local CSV paths
+    (with a sqlite/postgres `conn_str` this needs no Azure access at all).
+    Returns a stats dict with rows, seconds and rows_per_sec.
+    """
 
-        
+    chunks = source_chunks(blob_names, prefix, local_paths, chunksize)
+    engine = connect_sql(conn_str, pool_size=workers)
+    with track("load", "bulk_write"):
+        rows, seconds = write_chunks(chunks, table_name, engine, if_exists="replace", workers=workers)
+        annotate(rows_in=rows, rows_out=rows)
+
+    stats = {
+        "table": table_name,
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds, 1) if seconds else 0.0,
+    }
+    print(f"Bulk loaded {rows:,} rows into {table_name} in {seconds:.1f}s ({stats['rows_per_sec']:,.0f} rows/s)")
+    return stats
+
+
+# ----- Partition helpers for incremental loads ------ #
+def canonical(chunk:pd.DataFrame):
+
+    """
+    Cast a chunk to the schema the hashes are taken over, whatever its source:
+    CSV_DTYPES columns as strings (missing stays missing) and `date` parsed to
+    datetime64[ns]. An in-memory frame and the same rows read back from CSV
+    then hash identically.
+    """
+
+    for col in CSV_DTYPES:
+        if col in chunk.columns:
+            chunk[col] = chunk[col].astype("string")
+    chunk["date"] = pd.to_datetime(chunk["date"], errors="coerce").astype("datetime64[ns]")
+    return chunk
+
+
+def with_partition(chunk:pd.DataFrame):
+    chunk = canonical(chunk)
+    chunk[PARTITION_COL] = chunk["date"].dt.strftime("%Y-%m").fillna("unknown")
+    return chunk
+
+
+def row_hashes(df:pd.DataFrame):
+    return pd.util.hash_pandas_object(df, index=False).values.tobytes()
+
+
+def partition_hash(df:pd.DataFrame):
+    return hashlib.sha256(row_hashes(df)).hexdigest()
+
+
+def spool_partitions(chunks, root:str):
+
+    """
+    Split streamed chunks by year/month of `date`, hashing each partition as
+    its rows go past and spilling every piece to a Parquet file under `root`.
+    Memory stays bounded by the chunk size; the hash equals partition_hash of
+    the whole partition. Returns {partition: {"hash", "rows", "files"}}.
+    """
+
+    hashers, parts = {}, {}
+    for chunk in chunks:
+        for key, piece in with_partition(chunk).groupby(PARTITION_COL, sort=False):
+            part = parts.setdefault(key, {"rows": 0, "files": []})
+            hashers.setdefault(key, hashlib.sha256()).update(row_hashes(piece))
+            path = os.path.join(root, f"{key}-{len(part['files']):05d}.parquet")
+            piece.to_parquet(path, index=False)
+            part["rows"] += len(piece)
+            part["files"].append(path)
+
+    for key, part in parts.items():
+        part["hash"] = hashers[key].hexdigest()
+    return parts
+
+
+def iter_spooled(parts:dict):
+    for key in sorted(parts):
+        for path in parts[key]["files"]:
+            yield pd.read_parquet(path)
+
+
+def state_table(metadata:sa.MetaData):
+    return sa.Table(
+        STATE_TABLE, metadata,
+        sa.Column("table_name", sa.String(128), primary_key=True),
+        sa.Column("partition_key", sa.String(16), primary_key=True),
+        sa.Column("content_hash", sa.String(64), nullable=False),
+        sa.Column("row_count", sa.Integer, nullable=False),
+        sa.Column("loaded_at", sa.DateTime, nullable=False),
+    )
+
+
+def read_load_state(engine, table_name:str):
+
+    """{partition: content_hash} already merged into `table_name`."""
+
+    state = state_table(sa.MetaData())
+    state.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        rows = conn.execute(sa.select(state.c.partition_key, state.c.content_hash).where(state.c.table_name == table_name))
+        return {r.partition_key: r.content_hash for r in rows}
+
+
+def ensure_indexes(engine, table_name:str):
+    table = sa.Table(table_name, sa.MetaData(), autoload_with=engine)
+    existing = {ix["name"] for ix in sa.inspect(engine).get_indexes(table_name)}
+
+    for col in INDEX_COLS:
+        name = f"ix_{table_name}_{col}"
+        if col in table.c and name not in existing:
+            sa.Index(name, table.c[col]).create(engine)
+            print(f"Created index {name}")
+
+
+# ----- Merge staged partitions into the target table ------ #
+def merge_partitions(engine, table_name:str, staging_name:str, changed:dict, removed:list):
+
+    """
+    Swap the staged partitions into `table_name` in a single transaction:
+    delete the changed and the removed partitions from the target, insert the
+    changed ones from staging and update the load state. Readers never see a
+    half-loaded or empty table. `staging_name` is None when nothing changed;
+    the caller drops the staging table.
+    """
+
+    metadata = sa.MetaData()
+    state = state_table(metadata)
+    staging = sa.Table(staging_name, metadata, autoload_with=engine) if staging_name else None
+    keys = sorted(changed) + sorted(removed)
+
+    with engine.begin() as conn:
+        target_cols = {c["name"] for c in sa.inspect(conn).get_columns(table_name)} if sa.inspect(conn).has_table(table_name) else set()
+
+        if staging is not None and PARTITION_COL not in target_cols:
+            # First incremental run (or a table from a full replace): rebuild it with the partition column
+            if target_cols:
+                print(f"{table_name} has no {PARTITION_COL} column, rebuilding it from staging")
+                sa.Table(table_name, sa.MetaData(), autoload_with=conn).drop(conn)
+            pd.read_parquet(changed[min(changed)]["files"][0]).head(0).to_sql(table_name, con=conn, index=False, dtype=sql_dtypes())
+            target_cols = {PARTITION_COL}
+
+        if PARTITION_COL in target_cols:
+            target = sa.Table(table_name, sa.MetaData(), autoload_with=conn)
+            conn.execute(sa.delete(target).where(target.c[PARTITION_COL].in_(keys)))
+            if staging is not None:
+                cols = [c.name for c in staging.columns if c.name in target.c]
+                conn.execute(sa.insert(target).from_select(cols, sa.select(*[staging.c[c] for c in cols])))
+
+        conn.execute(sa.delete(state).where(state.c.table_name == table_name, state.c.partition_key.in_(keys)))
+        if changed:
+            now = datetime.now()
+            conn.execute(sa.insert(state), [
+                {"table_name": table_name, "partition_key": p, "content_hash": part["hash"], "row_count": part["rows"], "loaded_at": now}
+                for p, part in sorted(changed.items())
+            ])
+
+
+# ----- Incremental load: only new / changed year-month partitions ------ #
+def incremental_load_to_sql(table_name:str, blob_names=None, prefix:str=None, local_paths=None,
+                            conn_str:str=None, chunksize:int=BULK_CHUNK_ROWS, workers:int=BULK_WORKERS,
+                            frame=None, exclude_rows=None):
+
+    """
+    Mirror the source into `table_name` partition by partition. Each
+    year/month partition is hashed while it streams in and compared with the
+    load state table; only new or changed ones go through the staging table,
+    and partitions no longer in the source are deleted. Re-running with the
+    same input writes nothing. `frame` loads an in-memory DataFrame instead;
+    `exclude_rows` are source row positions to leave out (single local file).
+    """
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="transitx_load_") as spool_dir:
+        with track("load", "partition"):
+            chunks = source_chunks(blob_names, prefix, local_paths, chunksize, frame)
+            if exclude_rows is not None and len(exclude_rows):
+                chunks = skip_rows(chunks, exclude_rows)
+            parts = spool_partitions(chunks, spool_dir)
+            annotate(rows_out=sum(p["rows"] for p in parts.values()))
+
+        engine = connect_sql(conn_str, pool_size=workers)
+        loaded = read_load_state(engine, table_name)
+        changed = {p: part for p, part in sorted(parts.items()) if loaded.get(p) != part["hash"]}
+        removed = sorted(set(loaded) - set(parts))
+
+        rows, staging_name = 0, None
+        if changed or removed:
+            print(f"{len(changed)} of {len(parts)} partitions new or changed: {', '.join(changed) or '-'}")
+            if removed:
+                print(f"{len(removed)} partitions no longer in the source: {', '.join(removed)}")
+            try:
+                if changed:
+                    # Unique per run so concurrent loads of one table never share (or replace) a staging table
+                    staging_name = f"{table_name}__staging_{uuid.uuid4().hex[:8]}"
+                    with track("load", "write_staging"):
+                        rows, _ = write_chunks(iter_spooled(changed), staging_name, engine, if_exists="replace", workers=workers, dtype=sql_dtypes())
+                        annotate(rows_in=rows, rows_out=rows)
+                with track("load", "merge"):
+                    merge_partitions(engine, table_name, staging_name, changed, removed)
+                    if changed:
+                        ensure_indexes(engine, table_name)
+                    annotate(rows_out=rows)
+            finally:
+                if staging_name:
+                    sa.Table(staging_name, sa.MetaData()).drop(engine, checkfirst=True)
+        else:
+            print(f"{table_name} is up to date ({len(parts)} partitions unchanged)")
+
+    seconds = time.perf_counter() - start
+    stats = {
+        "table": table_name,
+        "partitions": len(parts),
+        "changed_partitions": sorted(changed),
+        "removed_partitions": removed,
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds, 1) if seconds else 0.0,
+    }
+    print(f"Incremental load wrote {rows:,} rows into {table_name} in {seconds:.1f}s")
+    return stats
+
+
+# ----- Pipeline stage ----- #
+PROCESSED_NAME = "transit_transformed_data_2023_2024.csv"
+PROCESSED_LOCAL = f"data/processed/{PROCESSED_NAME}"
+
+def run(df:pd.DataFrame=None, table_name:str="transit_delay_weather"):
+
+    """
+    Incrementally load the validated transform output. `df` is the in-memory
+    validate result; otherwise the local copy is streamed minus the rows
+    validate.py quarantined, or the blob copy is validated and loaded.
+    """
+
+    from src.pipelines import validate
+
+    if df is not None:
+        return incremental_load_to_sql(table_name, frame=df)
+    if os.path.exists(PROCESSED_LOCAL):
+        return incremental_load_to_sql(table_name, local_paths=[PROCESSED_LOCAL],
+                                       exclude_rows=validate.quarantined_rows(PROCESSED_LOCAL))
+    return incremental_load_to_sql(table_name, frame=validate.clean(download_from_blob(PROCESSED_NAME)))
+
+
+if __name__ == "__main__":
 
+    parser = argparse.ArgumentParser(description="Load processed TransitX data into SQL")
+    parser.add_argument("--mode", choices=["replace", "bulk", "incremental"], default="incremental")
+    parser.add_argument("--blob", default=PROCESSED_NAME)
+    parser.add_argument("--prefix", default=None, help="load every CSV partition under this blob prefix")
+    parser.add_argument("--local", nargs="*", default=None, help="local CSV files instead of blob storage")
+    parser.add_argument("--conn", default=None, help="override AZ_SQL_CONNECTION_STRING (e.g. sqlite:///data/transitx.db)")
+    parser.add_argument("--table", default="transit_delay_weather")
+    args = parser.parse_args()
 
+    if args.mode == "replace":
+        load_to_sql(args.blob, table_name=args.table)
+    elif args.mode == "bulk":
+        bulk_load_to_sql(args.table, blob_names=[args.blob], prefix=args.prefix,
+                         local_paths=args.local, conn_str=args.conn)
+    else:
+        incremental_load_to_sql(args.table, blob_names=[args.blob], prefix=args.prefix,
+                                local_paths=args.local, conn_str=args.conn)
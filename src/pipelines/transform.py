@@ -1,24 +1,40 @@
 import os
-import pandas as pd
-from azure.storage.blob import BlobServiceClient
 from io import StringIO
 from dotenv import load_dotenv
+from src.utils.blob_client import get_container
+from src.utils.lazy import lazy_import
+from src.utils.telemetry import track, annotate, file_bytes
+
+pd = lazy_import("pandas")
 
 load_dotenv()
 
 # ----- Azure Connections ----- #
-CONN_STR = os.getenv("AZ_STORAGE_CONNECTION_STRING")
 RAW = os.getenv("DATA_CONTAINER_RAW", "raw")
 PROC = os.getenv("DATA_CONTAINER_PROCESSED", "processed")
-svc = BlobServiceClient.from_connection_string(CONN_STR)
-raw_container = svc.get_container_client(RAW)
-proc_container = svc.get_container_client(PROC)
+
+
+PROCESSED_NAME = "transit_transformed_data_2023_2024.csv"
+PROCESSED_LOCAL = f"data/processed/{PROCESSED_NAME}"
 
 
 # ----- Downloading the File from the Blob ----- #
 def read_blob_csv(name):
-    blob = raw_container.download_blob(name)
-    content = blob.readall().decode("utf-8")
+    blob = get_container(RAW).download_blob(name)
+    raw = blob.readall()
+    annotate(bytes_read=len(raw))
+    return parse_csv_text(raw.decode("utf-8"), name)
+
+
+# ----- Reading a local copy written by extract.py ----- #
+def read_local_csv(path):
+    with open(path, encoding="utf-8") as f:
+        content = f.read()
+    annotate(bytes_read=os.path.getsize(path))
+    return parse_csv_text(content, os.path.basename(path))
+
+
+def parse_csv_text(content, name):
     lines = content.splitlines()
 
     if any("latitude" in line.lower() for line in lines[:10]) and any(
@@ -41,7 +57,7 @@ def read_blob_csv(name):
 def upload_df_blob(df, name):
     out = StringIO()
     df.to_csv(out, index=False)
-    proc_container.upload_blob(name=name, data= out.getvalue(), overwrite=True)
+    get_container(PROC).upload_blob(name=name, data= out.getvalue(), overwrite=True)
     print("Uploaded the processed file to the blob")
 
 # ----- Transforming the dataframes ------ #
@@ -70,21 +86,49 @@ def transformer(dfs, kind="delay"):
         print("Unknown kind: {kind} -  no specific rules applied")
 
     return dataframe
-    
 
-if __name__ == "__main__":
-    print("Starting Transformatons...")
 
-    delay_dfs = [read_blob_csv(f"ttc_bus_delay_{yr}.csv") for yr in ["2023", "2024"]]
-    delay = transformer(delay_dfs, kind = "delay")
-    
-    weather_dfs = [read_blob_csv(f"weather_{yr}.csv") for yr in ["2023", "2024"]]
-    weather = transformer(weather_dfs, kind = "weather")
+# ----- Read inputs from the local extract cache, falling back to the blob ----- #
+def read_inputs(paths, blob_names):
+    if paths is None:
+        paths = [os.path.join("data/raw" if n.startswith("ttc") else "data/weather", n) for n in blob_names]
+    if all(os.path.exists(p) for p in paths):
+        return [read_local_csv(p) for p in paths]
+    return [read_blob_csv(n) for n in blob_names]
+
+
+# ----- Pipeline stage ----- #
+def run(delay_paths=None, weather_paths=None, years=("2023", "2024")):
+
+    """Clean, merge and publish the delay + weather data. Returns the merged frame (also saved to PROCESSED_LOCAL)."""
+
+    with track("transform", "delay"):
+        delay_dfs = read_inputs(delay_paths, [f"ttc_bus_delay_{yr}.csv" for yr in years])
+        delay = transformer(delay_dfs, kind = "delay")
+        annotate(rows_in=sum(len(d) for d in delay_dfs), rows_out=len(delay))
 
-    right_key = "time" if "time" in weather.columns else "timestamp"
+    with track("transform", "weather"):
+        weather_dfs = read_inputs(weather_paths, [f"weather_{yr}.csv" for yr in years])
+        weather = transformer(weather_dfs, kind = "weather")
+        annotate(rows_in=sum(len(d) for d in weather_dfs), rows_out=len(weather))
 
-    merged_df = pd.merge(delay, weather, left_on="date", right_on=right_key, how="left")
+    with track("transform", "merge"):
+        right_key = "time" if "time" in weather.columns else "timestamp"
+        merged_df = pd.merge(delay, weather, left_on="date", right_on=right_key, how="left")
+        annotate(rows_in=len(delay), rows_out=len(merged_df))
 
-    print("Merged shape: {merged_df.shape}")
-    upload_df_blob(merged_df, "transit_transformed_data_2023_2024.csv")
+    print(f"Merged shape: {merged_df.shape}")
+    with track("transform", "write"):
+        os.makedirs(os.path.dirname(PROCESSED_LOCAL), exist_ok=True)
+        merged_df.to_csv(PROCESSED_LOCAL, index=False)
+        with open(PROCESSED_LOCAL, "rb") as f:
+            get_container(PROC).upload_blob(name=PROCESSED_NAME, data=f, overwrite=True)
+        annotate(rows_in=len(merged_df), bytes_written=file_bytes([PROCESSED_LOCAL]))
+    print("Uploaded the processed file to the blob")
+    return merged_df
+
+
+if __name__ == "__main__":
+    print("Starting Transformatons...")
+    run()
     print("Transformation Complete ;)")
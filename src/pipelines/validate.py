@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+import os
+import re
+import json
+from typing import TYPE_CHECKING
+from dotenv import load_dotenv
+from src.utils.blob_client import get_container
+from src.utils.lazy import lazy_import
+from src.utils.telemetry import track, annotate, file_bytes, RUN_ID
+from src.utils.dag import file_digest
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+else:
+    np = lazy_import("numpy")
+    pd = lazy_import("pandas")
+
+
+load_dotenv()
+
+# ----- Azure Setup ----- #
+PROC_CONTAINER = os.getenv("DATA_CONTAINER_PROCESSED", "processed")
+QUARANTINE_CONTAINER = os.getenv("DATA_CONTAINER_QUARANTINE", "quarantine")
+
+# ----- Local inputs / outputs ----- #
+PROCESSED_NAME = "transit_transformed_data_2023_2024.csv"
+PROCESSED_LOCAL = f"data/processed/{PROCESSED_NAME}"
+QUARANTINE_LOCAL = "data/quarantine/transit_quarantine.csv"
+REPORT_LOCAL = "data/quarantine/validation_report.json"
+
+# Above this share of quarantined rows the batch itself is broken, fail instead
+MAX_BAD_RATE = float(os.getenv("VALIDATION_MAX_BAD_RATE", "0.5"))
+# Unknown category values are reported; set to 1 to quarantine them as well
+STRICT_VOCAB = os.getenv("VALIDATION_STRICT_VOCAB", "0") == "1"
+
+# ----- Rules (column names as written by transform.py) ----- #
+REQUIRED = ["date", "route", "min_delay"]
+NOT_NULL = ["date", "route", "min_delay", "time_x"]
+# label: (column, min, max), inclusive
+NUMERIC = {
+    "min_delay": ("min_delay", 0, 1440),
+    "min_gap": ("min gap", 0, 1440),
+    "temperature": ("temperature_2m (°c)", -50, 50),
+    "precipitation": ("precipitation (mm)", 0, 200),
+}
+# Share of missing values per partition above which the partition is flagged
+NULL_LIMITS = {
+    "location": 0.05,
+    "incident": 0.05,
+    "direction": 0.2,
+    "min gap": 0.05,
+    "temperature_2m (°c)": 0.1,
+    "precipitation (mm)": 0.1,
+}
+VOCABULARIES = {
+    "incident": {"Cleaning - Unsanitary", "Collision - TTC", "Diversion", "Emergency Services", "General Delay",
+                 "Held By", "Investigation", "Mechanical", "Operations - Operator", "Road Blocked - NON-TTC Collision",
+                 "Security", "Utilized Off Route", "Vision"},
+    "direction": {"N", "S", "E", "W", "NB", "SB", "EB", "WB", "B", "BW"},
+    "day": {"Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"},
+}
+TIME_RE = re.compile(r"([01]?\d|2[0-3]):[0-5]\d(:[0-5]\d)?")
+
+
+# ----- Per-value checks ----- #
+def by_value(values:pd.Series, check):
+
+    """
+    Run `check` once per distinct value and broadcast the result back to the
+    rows. Routes, times and categories have a few thousand distinct values at
+    most, so this costs one factorize instead of a Python call per row.
+    Missing values pass; NOT_NULL / NULL_LIMITS deal with them.
+    """
+
+    codes, uniques = pd.factorize(values)
+    ok = np.fromiter((bool(check(v)) for v in uniques), dtype=bool, count=len(uniques))
+    return np.append(ok, True)[codes], (codes, uniques, ok)
+
+
+def valid_route(value):
+    value = str(value).strip()
+    return value.removesuffix(".0").isdigit()
+
+
+def valid_time(value):
+    return TIME_RE.fullmatch(str(value).strip()) is not None
+
+
+def check_vocabulary(values:pd.Series, vocab:set):
+    known, (codes, uniques, ok) = by_value(values, lambda v: str(v).strip() in vocab)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    unknown = {str(v): int(c) for v, c, k in zip(uniques, counts, ok) if not k}
+    return ~known, dict(sorted(unknown.items(), key=lambda kv: -kv[1])[:10])
+
+
+# ----- One vectorized pass over the batch ----- #
+def validate_frame(df:pd.DataFrame):
+
+    """
+    Check schema, dtypes, ranges, null rates and vocabularies. Returns
+    (bad row mask, per-row reason codes, rule names, report);
+    bit i of a reason code is set when rule i failed for that row.
+    """
+
+    missing = [c for c in REQUIRED if c not in df.columns]
+    if missing:
+        raise KeyError(f"Transformed data is missing required columns: {missing}")
+
+    n = len(df)
+    failures, warnings, report = {}, {}, {"unknown_values": {}}
+
+    dates = df["date"] if pd.api.types.is_datetime64_any_dtype(df["date"]) else pd.to_datetime(df["date"], errors="coerce")
+    failures["bad_date"] = (dates.isna() & df["date"].notna()).to_numpy()
+
+    for col in NOT_NULL:
+        if col in df.columns:
+            failures[f"missing_{col}"] = df[col].isna().to_numpy()
+
+    failures["bad_route"] = ~by_value(df["route"], valid_route)[0]
+    if "time_x" in df.columns:
+        failures["bad_time"] = ~by_value(df["time_x"], valid_time)[0]
+
+    for label, (col, lo, hi) in NUMERIC.items():
+        if col not in df.columns:
+            continue
+        raw = df[col]
+        values = raw if pd.api.types.is_numeric_dtype(raw) else pd.to_numeric(raw, errors="coerce")
+        values = values.to_numpy(dtype=np.float64)
+        failures[f"{label}_not_numeric"] = np.isnan(values) & raw.notna().to_numpy()
+        with np.errstate(invalid="ignore"):
+            failures[f"{label}_out_of_range"] = (values < lo) | (values > hi)
+
+    for col, vocab in VOCABULARIES.items():
+        if col in df.columns:
+            unknown, top = check_vocabulary(df[col], vocab)
+            (failures if STRICT_VOCAB else warnings)[f"unknown_{col}"] = unknown
+            if top:
+                report["unknown_values"][col] = top
+
+    rules = list(failures)
+    reason_codes = np.zeros(n, dtype=np.uint32)
+    for bit, rule in enumerate(rules):
+        reason_codes |= failures[rule].astype(np.uint32) << bit
+    bad = reason_codes != 0
+
+    # Partition = year-month of the delay, -1 when the date is unusable
+    keys = (dates.dt.year * 100 + dates.dt.month).fillna(-1).to_numpy(dtype=np.int64)
+    partitions, inverse = np.unique(keys, return_inverse=True)
+    sizes = np.bincount(inverse, minlength=len(partitions))
+
+    def per_partition(mask):
+        return np.bincount(inverse, weights=mask, minlength=len(partitions)).astype(np.int64)
+
+    rule_counts = {r: per_partition(m) for r, m in {**failures, **warnings}.items()}
+    null_counts = {c: per_partition(df[c].isna().to_numpy()) for c in NULL_LIMITS if c in df.columns}
+    bad_counts = per_partition(bad)
+
+    report["partitions"] = {}
+    for i, key in enumerate(partitions):
+        name = "unknown" if key < 0 else f"{key // 100}-{key % 100:02d}"
+        null_rates = {c: round(counts[i] / sizes[i], 4) for c, counts in null_counts.items()}
+        report["partitions"][name] = {
+            "rows": int(sizes[i]),
+            "quarantined": int(bad_counts[i]),
+            "rules": {r: int(c[i]) for r, c in rule_counts.items() if c[i]},
+            "null_rates": null_rates,
+            "flags": [f"null_rate:{c}" for c, rate in null_rates.items() if rate > NULL_LIMITS[c]],
+        }
+
+    report.update(
+        rows=n,
+        quarantined=int(bad.sum()),
+        bad_rate=round(float(bad.mean()) if n else 0.0, 6),
+        rules={r: int(c.sum()) for r, c in rule_counts.items()},
+    )
+    return bad, reason_codes, rules, report
+
+
+def reason_labels(codes:np.ndarray, rules:list):
+
+    """Decode reason bitmasks into "rule;rule" strings, once per distinct combination."""
+
+    distinct, inverse = np.unique(codes, return_inverse=True)
+    labels = np.array([";".join(r for bit, r in enumerate(rules) if code >> bit & 1) for code in distinct], dtype=object)
+    return labels[inverse]
+
+
+# ----- Quarantine bad rows (local copy + blob) ----- #
+def write_quarantine(df:pd.DataFrame, bad:np.ndarray, reason_codes:np.ndarray, rules:list, report:dict):
+    os.makedirs(os.path.dirname(QUARANTINE_LOCAL), exist_ok=True)
+    rows = np.flatnonzero(bad)
+    quarantined = df.iloc[rows].copy()
+    quarantined.insert(0, "reason", reason_labels(reason_codes[rows], rules))
+    quarantined.insert(0, "source_row", rows)
+    quarantined.to_csv(QUARANTINE_LOCAL, index=False)
+
+    report = {"run_id": RUN_ID, **report}
+    with open(REPORT_LOCAL, "w") as f:
+        json.dump(report, f, indent=2)
+
+    container = get_container(QUARANTINE_CONTAINER)
+    if len(rows):
+        with open(QUARANTINE_LOCAL, "rb") as f:
+            container.upload_blob(name=f"transit_quarantine_{RUN_ID}.csv", data=f, overwrite=True)
+    container.upload_blob(name=f"validation_report_{RUN_ID}.json", data=json.dumps(report, indent=2), overwrite=True)
+    print(f"Quarantined {len(rows):,} rows to {QUARANTINE_LOCAL} and container {QUARANTINE_CONTAINER}")
+    return [QUARANTINE_LOCAL, REPORT_LOCAL]
+
+
+def print_summary(report:dict):
+    print(f"Validated {report['rows']:,} rows: {report['quarantined']:,} quarantined ({100 * report['bad_rate']:.2f}%)")
+    for rule, count in report["rules"].items():
+        if count:
+            print(f"  {rule:<28} {count:>10,}")
+    for name, part in report["partitions"].items():
+        if part["flags"]:
+            print(f"  partition {name}: {', '.join(part['flags'])}")
+    for col, values in report["unknown_values"].items():
+        print(f"  unknown {col}: {', '.join(list(values)[:5])}")
+
+
+# ----- Read the transform output ----- #
+def read_processed(source:str=PROCESSED_LOCAL):
+
+    """Returns (frame, local path it was read from, None when it came from the blob)."""
+
+    if source and os.path.exists(source):
+        df = pd.read_csv(source)
+        annotate(bytes_read=file_bytes([source]))
+        print(f"Loaded the processed data from {source}, shape = {df.shape}")
+        return df, source
+    blob = get_container(PROC_CONTAINER).download_blob(PROCESSED_NAME)
+    return pd.read_csv(blob), None
+
+
+def source_digest(source:str):
+    return file_digest(source) if source and os.path.exists(source) else None
+
+
+def current_report(source:str):
+
+    """The last validation report if it was computed on the current contents of `source`, else None."""
+
+    try:
+        with open(REPORT_LOCAL) as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return None
+    digest = source_digest(source)
+    if digest is None or report.get("source_sha256") != digest or not os.path.exists(QUARANTINE_LOCAL):
+        return None
+    return report
+
+
+def read_quarantined_rows():
+    # int64 even when only the header was written (no bad rows), so the result can always index
+    return pd.read_csv(QUARANTINE_LOCAL, usecols=["source_row"], dtype={"source_row": "int64"})["source_row"].to_numpy()
+
+
+# ----- Reuse an earlier validate run ----- #
+def quarantined_rows(source:str=PROCESSED_LOCAL):
+
+    """Positions of the quarantined rows of `source`, validating it first unless the stored report matches its hash."""
+
+    if current_report(source) is None:
+        run(source=source)
+    return read_quarantined_rows()
+
+
+def clean(df:pd.DataFrame, source:str=None):
+
+    """
+    For stages that re-read the transform output: drop the rows an earlier
+    run quarantined when the report was computed on the same contents of
+    `source` (the file `df` was read from), otherwise validate afresh.
+    """
+
+    report = current_report(source)
+    if report is None or report.get("rows") != len(df):
+        return run(df, source)
+
+    keep = np.ones(len(df), dtype=bool)
+    keep[read_quarantined_rows()] = False
+    print(f"Dropped {int((~keep).sum()):,} quarantined rows")
+    return df[keep].reset_index(drop=True)
+
+
+# ----- Pipeline stage ----- #
+def run(df:pd.DataFrame=None, source:str=PROCESSED_LOCAL):
+
+    """
+    Validate the transformed data, quarantine failing rows and return the rest.
+    `df` is the in-memory contents of `source` (the transform output); the
+    report stores the file's hash so later stages can reuse the result.
+    """
+
+    with track("validate", "read"):
+        if df is None:
+            df, source = read_processed(source)
+        annotate(rows_out=len(df))
+
+    with track("validate", "checks"):
+        bad, reason_codes, rules, report = validate_frame(df)
+        report["source_sha256"] = source_digest(source)
+        annotate(rows_in=len(df), rows_out=int((~bad).sum()))
+    print_summary(report)
+
+    with track("validate", "quarantine"):
+        paths = write_quarantine(df, bad, reason_codes, rules, report)
+        annotate(rows_in=int(bad.sum()), bytes_written=file_bytes(paths))
+
+    if report["bad_rate"] > MAX_BAD_RATE:
+        raise ValueError(f"{100 * report['bad_rate']:.1f}% of rows failed validation "
+                         f"(limit {100 * MAX_BAD_RATE:.0f}%), see {REPORT_LOCAL}")
+    return df[~bad].reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    print("Starting Validation ....")
+    run()
+    print("Validation Complete ;)")
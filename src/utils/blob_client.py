@@ -1,16 +1,31 @@
 import os
-from azure.storage.blob import BlobServiceClient
+from functools import lru_cache
 from dotenv import load_dotenv
 
 #load variables from .env
 load_dotenv()
 
+# Clients are built on first use and shared by every module in the process,
+# so importing a pipeline module needs neither the Azure SDK nor credentials.
+# TRANSITX_LOCAL_STORAGE=<dir> swaps Azure for a local directory (benchmarks, offline runs).
+@lru_cache(maxsize=1)
 def get_blob_service():
+	local_root = os.getenv("TRANSITX_LOCAL_STORAGE")
+	if local_root:
+		from src.utils.local_storage import LocalBlobService
+		return LocalBlobService(local_root)
+
+	from azure.storage.blob import BlobServiceClient
+
 	conn = os.getenv("AZ_STORAGE_CONNECTION_STRING")
 	if not conn:
 		raise RuntimeError("AZ_STORAGE_CONNECTION_STRING is missing in .env")
 	return BlobServiceClient.from_connection_string(conn)
 
+@lru_cache(maxsize=None)
+def get_container(name:str):
+	return get_blob_service().get_container_client(name)
+
 if __name__ == "__main__":
 	svc = get_blob_service()
 	containers = [c['name'] if isinstance(c, dict) else c.name for c in svc.list_containers()]
@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import hashlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from src.utils.telemetry import track, file_bytes
+
+CACHE_DIR = os.getenv("PIPELINE_CACHE_DIR", "data/.cache/pipeline")
+
+
+# ----- Stage definition ----- #
+@dataclass
+class Stage:
+
+    """
+    One node of the pipeline graph.
+    `func` is called with the results of `deps` as keyword arguments (a skipped
+    dependency passes None, the stage then reads its local cache files).
+    `code` and `inputs` are local files whose contents key the stage cache,
+    `outputs` must all exist for a cached stage to be skipped; a stage with no
+    outputs (the SQL load) is never skipped, as nothing local shows its result
+    is still in place, so it must be safe to re-run. `source`, when set,
+    returns a version stamp for data outside the repo (upstream last-modified
+    times, a TTL bucket) that is hashed into the key as well.
+    """
+
+    name: str
+    func: Callable
+    deps: list = field(default_factory=list)
+    code: list = field(default_factory=list)
+    inputs: list = field(default_factory=list)
+    outputs: list = field(default_factory=list)
+    source: Callable = None
+
+
+# ----- Content hashing ----- #
+def file_digest(path:str):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def stage_fingerprint(stage:Stage):
+    h = hashlib.sha256(stage.name.encode())
+    for path in sorted(stage.code) + sorted(stage.inputs):
+        h.update(path.encode())
+        h.update(file_digest(path).encode() if os.path.exists(path) else b"missing")
+    if stage.source is not None:
+        h.update(json.dumps(stage.source(), sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def manifest_path(stage:Stage):
+    return os.path.join(CACHE_DIR, f"{stage.name}.json")
+
+
+def is_cached(stage:Stage, fingerprint:str):
+    path = manifest_path(stage)
+    if not stage.outputs or not os.path.exists(path):
+        return False
+    with open(path) as f:
+        manifest = json.load(f)
+    return manifest.get("fingerprint") == fingerprint and all(os.path.exists(p) for p in stage.outputs)
+
+
+def write_manifest(stage:Stage, fingerprint:str, seconds:float):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(manifest_path(stage), "w") as f:
+        json.dump({
+            "stage": stage.name,
+            "fingerprint": fingerprint,
+            "outputs": stage.outputs,
+            "seconds": round(seconds, 3),
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+        }, f, indent=2)
+
+
+# ----- Runner ----- #
+def topo_check(stages:list):
+    names = {s.name for s in stages}
+    for s in stages:
+        missing = [d for d in s.deps if d not in names]
+        if missing:
+            raise ValueError(f"Stage {s.name} depends on unknown stage(s): {missing}")
+
+    seen, visiting = set(), set()
+    by_name = {s.name: s for s in stages}
+
+    def visit(name):
+        if name in visiting:
+            raise ValueError(f"Cycle in pipeline graph at stage {name}")
+        if name not in seen:
+            visiting.add(name)
+            for d in by_name[name].deps:
+                visit(d)
+            visiting.discard(name)
+            seen.add(name)
+
+    for s in stages:
+        visit(s.name)
+
+
+def run_dag(stages:list, logger, max_workers:int=4, force:bool=False):
+
+    """
+    Run `stages` in-process, starting every stage whose dependencies are done
+    so independent branches run in parallel threads. A stage whose code and
+    input hashes match its last successful run is skipped unless `force`.
+    Returns {stage_name: {"status", "seconds"}} and raises on the first failure.
+    """
+
+    topo_check(stages)
+    by_name = {s.name: s for s in stages}
+    results, timings = {}, {}
+    remaining = dict(by_name)
+
+    def execute(stage:Stage):
+        fingerprint = stage_fingerprint(stage)
+        if not force and is_cached(stage, fingerprint):
+            logger.info(f"Skipped   : {stage.name} (inputs and code unchanged)")
+            return None, "cached", 0.0
+
+        logger.info(f"Started   : {stage.name}")
+        start = time.perf_counter()
+        with track(stage.name, bytes_read=file_bytes(stage.inputs)) as rec:
+            result = stage.func(**{d: results.get(d) for d in stage.deps})
+            rec["bytes_written"] = file_bytes(stage.outputs)
+            if hasattr(result, "shape"):
+                rec["rows_out"] = len(result)
+        seconds = time.perf_counter() - start
+
+        write_manifest(stage, fingerprint, seconds)
+        logger.info(f"Completed : {stage.name}, Duration: {seconds:.2f}s")
+        return result, "ran", seconds
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        running = {}
+        while remaining or running:
+            ready = [s for s in remaining.values() if all(d in timings for d in s.deps)]
+            for stage in ready:
+                running[pool.submit(execute, stage)] = stage.name
+                del remaining[stage.name]
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    result, status, seconds = future.result()
+                except Exception as e:
+                    logger.error(f"Stage failed : {name}: {e}")
+                    for f in running:
+                        f.cancel()
+                    raise RuntimeError(f"Stage failed: {name}") from e
+                results[name] = result
+                timings[name] = {"status": status, "seconds": round(seconds, 3)}
+
+    return timings
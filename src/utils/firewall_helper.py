@@ -1,27 +1,110 @@
 import os
-import requests
+import json
+import time
+import threading
 import subprocess
+import requests
+
+# The public IP and whether the firewall rule for it exists are cached on disk
+# for FIREWALL_CACHE_TTL seconds, so repeated loads skip both the ifconfig.me
+# lookup and the `az` CLI calls.
+FIREWALL_CACHE = os.getenv("FIREWALL_CACHE", "data/.cache/firewall.json")
+FIREWALL_CACHE_TTL = int(os.getenv("FIREWALL_CACHE_TTL", "3600"))
 
- # ----- Ensure the current public IP is allowed to connect to Azure SQL -----#
-def ensure_firewall_access():
-   
+_lock = threading.Lock()
+
+
+def read_cache():
     try:
-        ip = requests.get("https://ifconfig.me").text.strip()
-        server_name = os.getenv("AZ_SQL_SERVER_NAME")
-        resource_group = os.getenv("AZ_RESOURCE_GROUP")
-        rule_name = f"auto_rule_{ip.replace('.', '_')}"
-
-        print(f"Ensuring firewall access for IP: {ip}")
-
-        subprocess.run([
-            "az", "sql", "server", "firewall-rule", "create",
-            "--name", rule_name,
-            "--resource-group", resource_group,
-            "--server", server_name,
-            "--start-ip-address", ip,
-            "--end-ip-address", ip
-        ], check=False)
-
-        print("Firewall rule ensured for this IP.")
-    except Exception as e:
-        print(f"Could not update firewall automatically: {e}")
\ No newline at end of file
+        with open(FIREWALL_CACHE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_cache(state:dict):
+    os.makedirs(os.path.dirname(FIREWALL_CACHE) or ".", exist_ok=True)
+    tmp = FIREWALL_CACHE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, FIREWALL_CACHE)
+
+
+def fresh(state:dict, key:str, ttl:int=FIREWALL_CACHE_TTL):
+    return key in state and time.time() - state[key] < ttl
+
+
+# ----- Public IP, cached ----- #
+def public_ip(state:dict, force:bool=False):
+    if not force and state.get("ip") and fresh(state, "ip_checked_at"):
+        return state["ip"]
+    ip = requests.get("https://ifconfig.me", timeout=10).text.strip()
+    state.update(ip=ip, ip_checked_at=time.time())
+    return ip
+
+
+# ----- Look before creating: `show` is cheap and leaves the server untouched ----- #
+def rule_exists(rule_name:str, resource_group:str, server_name:str, ip:str):
+    out = subprocess.run([
+        "az", "sql", "server", "firewall-rule", "show",
+        "--name", rule_name,
+        "--resource-group", resource_group,
+        "--server", server_name,
+        "--query", "[startIpAddress, endIpAddress]",
+        "--output", "tsv"
+    ], capture_output=True, text=True, check=False)
+    return out.returncode == 0 and out.stdout.split() == [ip, ip]
+
+
+def create_rule(rule_name:str, resource_group:str, server_name:str, ip:str):
+    out = subprocess.run([
+        "az", "sql", "server", "firewall-rule", "create",
+        "--name", rule_name,
+        "--resource-group", resource_group,
+        "--server", server_name,
+        "--start-ip-address", ip,
+        "--end-ip-address", ip
+    ], capture_output=True, text=True, check=False)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip() or "az sql server firewall-rule create failed")
+
+
+# ----- Ensure the current public IP is allowed to connect to Azure SQL -----#
+def ensure_firewall_access(force:bool=False):
+
+    """
+    Make sure a firewall rule covers this machine's public IP. A cached,
+    unexpired "rule ok" for the same server returns immediately; otherwise the
+    rule is looked up and only created when missing. `force` ignores the cache,
+    e.g. after a connection was refused. Returns the IP, or None on failure.
+    """
+
+    server_name = os.getenv("AZ_SQL_SERVER_NAME")
+    resource_group = os.getenv("AZ_RESOURCE_GROUP")
+    if not (server_name and resource_group):
+        print("AZ_SQL_SERVER_NAME / AZ_RESOURCE_GROUP not set, skipping firewall preflight")
+        return None
+
+    with _lock:
+        state = read_cache()
+        try:
+            ip = public_ip(state, force)
+            rule_name = f"auto_rule_{ip.replace('.', '_')}"
+            target = f"{resource_group}/{server_name}/{rule_name}"
+
+            if not force and state.get("rule") == target and fresh(state, "rule_checked_at"):
+                return ip
+
+            print(f"Ensuring firewall access for IP: {ip}")
+            if rule_exists(rule_name, resource_group, server_name, ip):
+                print("Firewall rule already exists for this IP.")
+            else:
+                create_rule(rule_name, resource_group, server_name, ip)
+                print("Firewall rule created for this IP.")
+
+            state.update(rule=target, rule_checked_at=time.time())
+            write_cache(state)
+            return ip
+        except Exception as e:
+            print(f"Could not update firewall automatically: {e}")
+            return None
@@ -0,0 +1,31 @@
+import importlib
+import threading
+
+
+# ----- Deferred module import ----- #
+class LazyModule:
+
+    """Stand-in for a heavy module that is only imported on first attribute access."""
+
+    def __init__(self, name:str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name:str):
+    return LazyModule(name)
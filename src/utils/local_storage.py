@@ -0,0 +1,82 @@
+import io
+import os
+from types import SimpleNamespace
+
+# Directory-backed stand-in for the parts of the Azure Blob API the pipeline
+# uses (upload_blob, download_blob, list_blobs). Enabled by pointing
+# TRANSITX_LOCAL_STORAGE at a directory; each container is a sub-directory.
+
+
+class LocalBlobDownload(io.BufferedReader):
+
+    """File-like like StorageStreamDownloader: pandas can read it, readall() returns bytes."""
+
+    def __init__(self, path:str):
+        super().__init__(io.FileIO(path, "rb"), buffer_size=1 << 20)
+
+    def readall(self):
+        with self:
+            return self.read()
+
+    def chunks(self, size:int=4 << 20):
+        with self:
+            yield from iter(lambda: self.read(size), b"")
+
+
+class LocalContainer:
+
+    def __init__(self, root:str, name:str):
+        self.container_name = name
+        self.root = os.path.join(root, name)
+        os.makedirs(self.root, exist_ok=True)
+
+    def __str__(self):
+        return f"local:{self.root}"
+
+    def _path(self, name:str):
+        return os.path.join(self.root, *name.split("/"))
+
+    def upload_blob(self, name:str, data, overwrite:bool=False, **kwargs):
+        path = self._path(name)
+        if not overwrite and os.path.exists(path):
+            raise FileExistsError(f"Blob {name} already exists in {self}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".uploading"
+        with open(tmp, "wb") as f:
+            if isinstance(data, str):
+                f.write(data.encode("utf-8"))
+            elif isinstance(data, (bytes, bytearray)):
+                f.write(data)
+            else:
+                for block in iter(lambda: data.read(4 << 20), b""):
+                    f.write(block)
+        os.replace(tmp, path)
+        return SimpleNamespace(name=name)
+
+    def download_blob(self, name:str, **kwargs):
+        path = self._path(name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Blob {name} not found in {self}")
+        return LocalBlobDownload(path)
+
+    def list_blobs(self, name_starts_with:str=None, **kwargs):
+        for dirpath, _, files in os.walk(self.root):
+            for f in sorted(files):
+                full = os.path.join(dirpath, f)
+                name = os.path.relpath(full, self.root).replace(os.sep, "/")
+                if name.endswith(".uploading") or (name_starts_with and not name.startswith(name_starts_with)):
+                    continue
+                yield SimpleNamespace(name=name, size=os.path.getsize(full))
+
+
+class LocalBlobService:
+
+    def __init__(self, root:str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def get_container_client(self, name:str):
+        return LocalContainer(self.root, name)
+
+    def list_containers(self):
+        return [SimpleNamespace(name=d) for d in sorted(os.listdir(self.root)) if os.path.isdir(os.path.join(self.root, d))]
@@ -0,0 +1,130 @@
+import re
+import pickle
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+# Canonical names for the free-text TTC `location` field. feature_eng.py builds
+# the index from the training data and rewrites every spelling to its
+# canonical form before label encoding; the API resolves request locations the
+# same way, so "KENNEDY STN" and "Kennedy Station" get the same code.
+INDEX_PATH = "models/location_index.pkl"
+
+ABBREVIATIONS = {
+    "STN": "STATION", "STA": "STATION", "STATN": "STATION",
+    "AVE": "AVENUE", "AV": "AVENUE",
+    "RD": "ROAD", "DR": "DRIVE", "BLVD": "BOULEVARD", "CRES": "CRESCENT",
+    "PKWY": "PARKWAY", "HWY": "HIGHWAY", "SQ": "SQUARE", "GDNS": "GARDENS",
+    "CTR": "CENTRE", "CENTER": "CENTRE", "PL": "PLACE", "CRT": "COURT", "CT": "COURT",
+    "LN": "LANE", "TERR": "TERRACE", "MT": "MOUNT",
+    "E": "EAST", "W": "WEST", "N": "NORTH", "S": "SOUTH",
+    "&": "AND", "AT": "AND", "@": "AND",
+}
+_TOKEN = re.compile(r"[A-Z0-9]+|&|@")
+
+
+def normalize(text:str):
+
+    """Upper-case, strip punctuation and expand abbreviations. A leading ST is SAINT, elsewhere STREET."""
+
+    tokens = _TOKEN.findall(str(text).upper())
+    out = []
+    for i, tok in enumerate(tokens):
+        if tok == "ST":
+            out.append("SAINT" if i == 0 else "STREET")
+        else:
+            out.append(ABBREVIATIONS.get(tok, tok))
+    return " ".join(out)
+
+
+def trigrams(key:str):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class LocationIndex:
+
+    """
+    Exact lookup on the normalized name, with a trigram (Dice similarity)
+    fallback for misspellings. Results are memoized per input string.
+    Built with `previous` (the persisted index), every name it knew keeps its
+    canonical label, so label-encoded codes stay stable across rebuilds.
+    """
+
+    CANDIDATES = 32
+
+    def __init__(self, names, min_similarity:float=0.6, cache_size:int=65536, previous:"LocationIndex"=None):
+        spellings = defaultdict(Counter)
+        for name, count in Counter(str(n) for n in names).items():
+            spellings[normalize(name)][name] += count
+
+        # Canonical label: fixed once assigned, else the most frequent raw spelling
+        assigned = dict(zip(previous.keys, previous.labels)) if previous is not None else {}
+        self.keys = sorted(k for k in set(spellings) | set(assigned) if k)
+        self.labels = [assigned.get(k) or spellings[k].most_common(1)[0][0] for k in self.keys]
+        self.exact = {k: i for i, k in enumerate(self.keys)}
+        self.key_grams = [frozenset(trigrams(k)) for k in self.keys]
+        postings = defaultdict(list)
+        for i, grams in enumerate(self.key_grams):
+            for gram in grams:
+                postings[gram].append(i)
+        self.postings = {gram: tuple(ids) for gram, ids in postings.items()}
+        # Grams shared by many names ("STA", " AN") only slow down candidate counting
+        self.common = max(8, len(self.keys) // 20)
+        self.min_similarity = min_similarity
+        self.cache_size = cache_size
+        self._init_cache()
+
+    def _init_cache(self):
+        self.resolve = lru_cache(maxsize=self.cache_size)(self._resolve)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("resolve", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_cache()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _resolve(self, text:str):
+        key = normalize(text)
+        i = self.exact.get(key)
+        if i is not None:
+            return self.labels[i]
+        grams = trigrams(key)
+        lists = [self.postings[g] for g in grams if g in self.postings]
+        rare = [ids for ids in lists if len(ids) <= self.common] or lists
+        shared = Counter()
+        for ids in rare:
+            shared.update(ids)
+        if not shared:
+            return None
+        # Exact Dice similarity on the best few candidates
+        best, score = max(((i, 2 * len(grams & self.key_grams[i]) / (len(grams) + len(self.key_grams[i])))
+                           for i, _ in shared.most_common(self.CANDIDATES)), key=lambda t: t[1])
+        return self.labels[best] if score >= self.min_similarity else None
+
+    def canonicalize(self, values, default:str="Unknown"):
+
+        """Map an iterable of raw names to canonical labels, resolving each distinct value once."""
+
+        mapping = {}
+        out = []
+        for v in values:
+            if v not in mapping:
+                mapping[v] = self.resolve(str(v)) or default
+            out.append(mapping[v])
+        return out
+
+
+def save_index(index:LocationIndex, path:str=INDEX_PATH):
+    with open(path, "wb") as f:
+        pickle.dump(index, f)
+
+
+def load_index(path:str=INDEX_PATH):
+    with open(path, "rb") as f:
+        return pickle.load(f)
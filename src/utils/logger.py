@@ -1,32 +1,74 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+import threading
 from datetime import datetime
 
+# All loggers hand records to one in-memory queue; a single listener thread does
+# the file/console I/O, so a slow disk never blocks a pipeline stage.
+_log_queue = queue.SimpleQueue()
+_listener = None
+_listener_lock = threading.Lock()
+_file_handlers = {}
 
-def get_logger(name:str):
-    os.makedirs("logs", exist_ok=True)
-    log_file = f"logs/pipeline_{datetime.now():%Y%m%d}.log"
+TELEMETRY_LOGGER = "transitx.telemetry"
 
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
 
-    if not logger.handlers:
-        
-        fh = logging.FileHandler(log_file)
-        fh.setLevel(logging.INFO)
+def _file_handler(path:str, fmt:logging.Formatter, level=logging.INFO):
+    if path not in _file_handlers:
+        fh = logging.FileHandler(path)
+        fh.setLevel(level)
+        fh.setFormatter(fmt)
+        _file_handlers[path] = fh
+    return _file_handlers[path]
 
-        ch = logging.StreamHandler()
-        ch.setLevel(logging.INFO)
 
-        fmt = logging.Formatter(
+class _RouteHandler(logging.Handler):
+
+    """Listener-side handler: telemetry records go to the JSON-lines file, the rest to the log file + console."""
+
+    def __init__(self):
+        super().__init__()
+        self.text_fmt = logging.Formatter(
             "%(asctime)s | %(levelname)s| %(name)s | %(message)s",
             "%Y-%m-%d %H:%M:%S",
         )
+        self.console = logging.StreamHandler()
+        self.console.setFormatter(self.text_fmt)
+
+    def emit(self, record):
+        day = f"{datetime.now():%Y%m%d}"
+        if record.name == TELEMETRY_LOGGER:
+            _file_handler(f"logs/telemetry_{day}.jsonl", logging.Formatter("%(message)s")).handle(record)
+        else:
+            _file_handler(f"logs/pipeline_{day}.log", self.text_fmt).handle(record)
+            self.console.handle(record)
+
+
+def _ensure_listener():
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            os.makedirs("logs", exist_ok=True)
+            _listener = logging.handlers.QueueListener(_log_queue, _RouteHandler())
+            _listener.start()
+            atexit.register(_listener.stop)
+
+
+def get_logger(name:str):
+    _ensure_listener()
+
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.INFO)
+
+    if not logger.handlers:
+        logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+        logger.propagate = False
+
+    return logger
 
-        fh.setFormatter(fmt)
-        ch.setFormatter(fmt)
 
-        logger.addHandler(fh)
-        logger.addHandler(ch)
-    
-    return logger
\ No newline at end of file
+def get_telemetry_logger():
+    return get_logger(TELEMETRY_LOGGER)
@@ -0,0 +1,82 @@
+import os
+import hashlib
+import numpy as np
+
+# Precomputed predictions for the most common serving queries, built by
+# src/models/build_lookup.py and read by deployment/app.py. Rows are keyed by
+# one int64 packing the encoded grid coordinates, kept sorted for searchsorted.
+CUBE_PATH = os.getenv("LOOKUP_CUBE_PATH", "models/lookup_cube.npz")
+MODEL_FILES = ["models/xgb_regressor.pkl", "models/xgb_classifier.pkl", "models/encoders.pkl"]
+
+# (field, bits) from the low bits up; encoded label ids must fit their width
+KEY_LAYOUT = [("rain_intensity", 3), ("temp_bin", 3), ("is_weekend", 1), ("hour", 5),
+              ("direction", 8), ("location", 20), ("route", 16)]
+
+# Representative values for the grid's non-key features
+TEMP_BIN_VALUES = {"Freezing": -5.0, "Cold": 5.0, "Mild": 15.0, "Warm": 25.0}
+RAIN_BIN_VALUES = {"None": 0.0, "Light": 1.0, "Moderate": 3.5, "Heavy": 7.5}
+DAY_TYPES = {0: "Wednesday", 1: "Saturday"}
+DEFAULT_INCIDENT = "None"
+DEFAULT_MIN_GAP = 10
+
+
+def model_version(paths=MODEL_FILES):
+
+    """Short content hash of the model artifacts; a cube only serves the models it was built from."""
+
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def pack_keys(fields:dict):
+
+    """Pack equally long integer arrays (one per KEY_LAYOUT field) into int64 keys."""
+
+    keys = np.zeros(len(next(iter(fields.values()))), dtype=np.int64)
+    shift = 0
+    for name, bits in KEY_LAYOUT:
+        values = np.asarray(fields[name], dtype=np.int64)
+        if values.size and (values.min() < 0 or values.max() >= 1 << bits):
+            raise ValueError(f"{name} ids do not fit in {bits} bits")
+        keys |= values << shift
+        shift += bits
+    return keys
+
+
+def save_cube(path:str, keys, delay_minutes, delay_prob, version:str, month:int):
+    order = np.argsort(keys, kind="stable")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.savez(path, keys=keys[order], delay_minutes=delay_minutes[order].astype(np.float32),
+             delay_prob=delay_prob[order].astype(np.float32), version=np.array(version),
+             month=np.array(month), min_gap=np.array(DEFAULT_MIN_GAP))
+
+
+class LookupCube:
+
+    """Sorted-key table loaded fully into memory; `get` is a binary search."""
+
+    def __init__(self, path:str=CUBE_PATH):
+        with np.load(path) as data:
+            self.keys = data["keys"]
+            self.delay_minutes = data["delay_minutes"]
+            self.delay_prob = data["delay_prob"]
+            self.version = str(data["version"])
+            self.month = int(data["month"])
+            self.min_gap = int(data["min_gap"])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get(self, fields:dict):
+        try:
+            key = int(pack_keys({k: [v] for k, v in fields.items()})[0])
+        except ValueError:
+            return None
+        i = int(np.searchsorted(self.keys, key))
+        if i < len(self.keys) and self.keys[i] == key:
+            return float(self.delay_minutes[i]), float(self.delay_prob[i])
+        return None
@@ -1,30 +1,150 @@
 import os
+import json
+import pickle
 from dotenv import load_dotenv
-import pandas as pd
-import mlflow
-from azure.storage.blob import BlobServiceClient
+from src.utils.blob_client import get_container
+from src.utils.lazy import lazy_import
+
+pd = lazy_import("pandas")
+mlflow = lazy_import("mlflow")
 
 load_dotenv()
 
+FEATURES_CSV = "data/model_input/transit_features.csv"
+TARGETS = ["min_delay", "is_delayed"]
+
+# -- Memory-mapped float32 feature matrix written by feature_eng.py -- #
+MATRIX_PATH = "data/model_input/transit_features.npy"
+MATRIX_META = "data/model_input/transit_features.json"
+
+def matrix_available():
+    if not (os.path.exists(MATRIX_PATH) and os.path.exists(MATRIX_META)):
+        return False
+    # A CSV rewritten after the matrix means the matrix is stale
+    return not os.path.exists(FEATURES_CSV) or os.path.getmtime(MATRIX_PATH) >= os.path.getmtime(FEATURES_CSV)
+
+def open_feature_matrix(mode:str="c"):
+
+    """
+    Map the matrix instead of reading it. Pages come from the OS page cache,
+    so parallel workers share one copy; mode "c" keeps accidental writes private.
+    """
+
+    import numpy as np
+    with open(MATRIX_META) as f:
+        meta = json.load(f)
+    return np.load(MATRIX_PATH, mmap_mode=mode), meta
+
 # -- Loading The Data -- #
-def load_data():
-    path = "data/model_input/transit_features.csv"
-    if not os.path.exists(path):
+def load_data(compact:bool=False):
+    if matrix_available():
+        matrix, meta = open_feature_matrix()
+        return pd.DataFrame(matrix, columns=meta["columns"], copy=False)
+
+    if not os.path.exists(FEATURES_CSV):
         raise FileNotFoundError("Run feature_eng.py before training")
-    df = pd.read_csv(path)
+    df = pd.read_csv(FEATURES_CSV)
+
+    if compact:
+        df = compact_dtypes(df)
 
     return df
 
+# -- Features and targets; views over the memory map when it exists -- #
+def load_xy(compact:bool=False):
+    if matrix_available():
+        matrix, meta = open_feature_matrix()
+        k = len(meta["features"])
+        features = pd.DataFrame(matrix[:, :k], columns=meta["features"], copy=False)
+        targets = {t: pd.Series(matrix[:, k + i], name=t, copy=False) for i, t in enumerate(meta["targets"])}
+        return features, targets
+
+    df = load_data(compact)
+    return df.drop(columns=TARGETS), {t: df[t] for t in TARGETS}
+
+# -- Holdout split by position, so memory-mapped rows are sliced rather than gathered -- #
+def holdout_start(n:int, test_size:float=0.2):
+    return n - max(1, int(n * test_size))
+
+def split_rows(X, y, test_size:float=0.2):
+
+    """
+    Contiguous split: the last `test_size` share of the rows is held out.
+    Slices of the load_xy frames stay views of the memory map (a shuffled
+    train_test_split gathers both sides into new arrays), and since the
+    matrix is ordered by partition month the holdout is the latest data.
+    The holdout only scores the model: trainers then refit() on every row,
+    so the saved model has still seen the most recent months.
+    """
+
+    cut = holdout_start(len(X), test_size)
+    rows = lambda a, s: a.iloc[s] if hasattr(a, "iloc") else a[s]
+    return rows(X, slice(None, cut)), rows(X, slice(cut, None)), rows(y, slice(None, cut)), rows(y, slice(cut, None))
+
+def refit(model, X, y):
+
+    """A fresh copy of a fitted sklearn XGBoost model (same params, tuned n_estimators) fitted on X, y."""
+
+    params = {**model.get_params(), "early_stopping_rounds": None}
+    return model.__class__(**params).fit(X, y, verbose=False)
+
+# -- Partitioned feature files written by feature_eng.py (part-YYYY-MM.csv) -- #
+PARTITIONS_DIR = "data/model_input/partitions"
+
+def list_partitions(root:str=PARTITIONS_DIR):
+    if not os.path.isdir(root):
+        raise FileNotFoundError("Run feature_eng.py before training (no feature partitions found)")
+    return sorted(f[len("part-"):-len(".csv")] for f in os.listdir(root) if f.startswith("part-") and f.endswith(".csv"))
+
+def partition_path(key:str, root:str=PARTITIONS_DIR):
+    return os.path.join(root, f"part-{key}.csv")
+
+def load_partitions(keys, compact:bool=False, root:str=PARTITIONS_DIR):
+    frames = [pd.read_csv(partition_path(k, root)) for k in keys]
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return compact_dtypes(df) if compact else df
+
+# -- Downcast to the narrowest numeric types (float32, int8/16/32) -- #
+def compact_dtypes(df):
+    for col in df.columns:
+        if pd.api.types.is_float_dtype(df[col]):
+            if df[col].dtype != "float32":
+                df[col] = df[col].astype("float32")
+        elif pd.api.types.is_integer_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
+
 # -- Upload model to Azure Blob -- #
 def upload_to_blob(local_path, blob_name):
-    conn_str = os.getenv("AZ_STORAGE_CONNECTION_STRING")
-    svc = BlobServiceClient.from_connection_string(conn_str)
-    container = svc.get_container_client(os.getenv("MODEL_CONTAINER", "models"))
+    container = get_container(os.getenv("MODEL_CONTAINER", "models"))
 
     with open(local_path, "rb") as f:
         container.upload_blob(name=blob_name, data=f, overwrite=True)
         print(f"Uploaded model -> Azure Blob: models/{blob_name}")
 
+# -- Save a model locally and to Azure Blob -- #
+def save_model(model, file_name:str):
+    os.makedirs("models", exist_ok=True)
+    save_path = f"models/{file_name}"
+    with open(save_path, "wb") as f:
+        pickle.dump(model, f)
+    upload_to_blob(save_path, file_name)
+    return save_path
+
+# -- Trees an early-stopped booster predicts with, matching the sklearn wrapper's predict -- #
+def iteration_range(booster):
+    best = booster.attr("best_iteration")
+    return (0, int(best) + 1) if best is not None else (0, 0)
+
+# -- Wrap a native booster so predict.py and the API keep loading sklearn pickles -- #
+def booster_to_sklearn(booster, estimator_cls, params:dict=None):
+
+    """Wrap a native booster. `params` are the training params, so get_params() returns them rather than defaults."""
+
+    model = estimator_cls(**(params or {}))
+    model.load_model(booster.save_raw("json"))
+    return model
+
 # -- MLFLOW Helper -- #
 def mlflow_starter(experiment_name):
     mlflow.set_experiment(experiment_name)
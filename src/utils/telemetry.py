@@ -0,0 +1,206 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from src.utils.logger import get_telemetry_logger
+
+# One JSON line per stage / sub-step, written through the queued logger to
+# logs/telemetry_YYYYMMDD.jsonl. Compare runs with:
+#   python -m src.utils.telemetry report [--runs OLD NEW] [--threshold 0.2]
+
+RUN_ID = os.getenv("TRANSITX_RUN_ID") or f"{datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}"
+
+_local = threading.local()
+_active = {}
+_active_lock = threading.Lock()
+_sampler = None
+
+
+# ----- Memory sampling ----- #
+def _rss_bytes():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _sample_forever(interval:float=0.05):
+    while True:
+        rss = _rss_bytes()
+        with _active_lock:
+            for rec in _active.values():
+                rec["_peak"] = max(rec["_peak"], rss)
+        time.sleep(interval)
+
+
+def _ensure_sampler():
+    global _sampler
+    if _sampler is None:
+        with _active_lock:
+            if _sampler is None:
+                _sampler = threading.Thread(target=_sample_forever, name="telemetry-rss", daemon=True)
+                _sampler.start()
+
+
+# ----- Recording ----- #
+def file_bytes(paths):
+    return sum(os.path.getsize(p) for p in paths if p and os.path.exists(p))
+
+
+def current():
+
+    """Innermost open record on this thread, or None outside any `track` block."""
+
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else None
+
+
+def annotate(**fields):
+
+    """Add counters (rows_in, rows_out, bytes_read, bytes_written, ...) to the current record."""
+
+    rec = current()
+    if rec is not None:
+        for k, v in fields.items():
+            rec[k] = (rec.get(k) or 0) + v if isinstance(v, (int, float)) and k.startswith(("rows_", "bytes_")) else v
+
+
+@contextmanager
+def track(stage:str, step:str=None, **fields):
+
+    """
+    Time a stage or sub-step and emit one telemetry record for it:
+    wall seconds, CPU seconds of the calling thread, process-wide CPU and peak
+    RSS while it ran, plus any rows/bytes counters set through `annotate` or
+    the yielded dict. Process-wide numbers include whatever else ran at the
+    same time (run_dag runs independent stages in parallel threads, native
+    libraries run their own threads); `overlapped_with` names the records
+    that were open on other threads.
+    """
+
+    _ensure_sampler()
+    rss = _rss_bytes()
+    name = f"{stage}/{step}" if step else stage
+    thread = threading.get_ident()
+    rec = {"rows_in": None, "rows_out": None, "bytes_read": None, "bytes_written": None, **fields,
+           "_peak": rss, "_name": name, "_thread": thread, "_overlap": set()}
+    stack = _local.__dict__.setdefault("stack", [])
+    stack.append(rec)
+    with _active_lock:
+        for other in _active.values():
+            if other["_thread"] != thread:
+                other["_overlap"].add(name)
+                rec["_overlap"].add(other["_name"])
+        _active[id(rec)] = rec
+
+    status = "ok"
+    wall0, cpu0, proc0 = time.perf_counter(), time.thread_time(), time.process_time()
+    try:
+        yield rec
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        wall, cpu, proc = time.perf_counter() - wall0, time.thread_time() - cpu0, time.process_time() - proc0
+        with _active_lock:
+            _active.pop(id(rec), None)
+            overlap = sorted(rec.pop("_overlap"))
+        stack.pop()
+        peak = max(rec.pop("_peak"), _rss_bytes())
+        rec.pop("_name"), rec.pop("_thread")
+        record = {
+            "run_id": RUN_ID,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "stage": stage,
+            "step": step,
+            "status": status,
+            "wall_seconds": round(wall, 4),
+            "cpu_seconds": round(cpu, 4),
+            "process_cpu_seconds": round(proc, 4),
+            "peak_rss_mb": round(peak / 2**20, 1),
+            "rss_scope": "process",
+            "overlapped_with": overlap,
+            **rec,
+        }
+        get_telemetry_logger().info(json.dumps(record, default=str))
+        # Callers holding the yielded dict (e.g. benchmarks) see the final record
+        rec.update(record)
+
+
+# ----- Run comparison report ----- #
+def read_records(pattern:str="logs/telemetry_*.jsonl"):
+    records = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path) as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    return records
+
+
+def compare_runs(records, old_run:str=None, new_run:str=None, threshold:float=0.2, min_seconds:float=0.5):
+
+    """
+    Per (stage, step) wall-time comparison of two runs, defaulting to the last
+    two run ids seen. A row is flagged SLOWER when it took more than `threshold`
+    (relative) and `min_seconds` (absolute) longer than before.
+    """
+
+    run_ids = list(dict.fromkeys(r["run_id"] for r in records))
+    if not (old_run and new_run):
+        if len(run_ids) < 2:
+            raise ValueError("Need at least two runs in the telemetry logs to compare")
+        old_run, new_run = run_ids[-2], run_ids[-1]
+
+    def by_key(run_id):
+        return {(r["stage"], r["step"] or ""): r for r in records if r["run_id"] == run_id}
+
+    old, new = by_key(old_run), by_key(new_run)
+    rows = []
+    for key in sorted(set(old) | set(new)):
+        o, n = old.get(key), new.get(key)
+        before = o["wall_seconds"] if o else None
+        after = n["wall_seconds"] if n else None
+        flag = ""
+        if before is not None and after is not None:
+            if after - before > max(min_seconds, threshold * before):
+                flag = "SLOWER"
+            elif before - after > max(min_seconds, threshold * before):
+                flag = "faster"
+        rows.append({"stage": key[0], "step": key[1], "before": before, "after": after,
+                     "peak_rss_mb": n["peak_rss_mb"] if n else None, "flag": flag})
+    return old_run, new_run, rows
+
+
+def print_report(old_run, new_run, rows):
+    print(f"Comparing {old_run} -> {new_run}")
+    print(f"{'stage':<18}{'step':<22}{'before s':>10}{'after s':>10}{'change':>9}{'peak MB':>10}  flag")
+    for r in rows:
+        change = f"{(r['after'] / r['before'] - 1) * 100:+.0f}%" if r["before"] and r["after"] is not None else "-"
+        before = f"{r['before']:.2f}" if r["before"] is not None else "-"
+        after = f"{r['after']:.2f}" if r["after"] is not None else "-"
+        peak = f"{r['peak_rss_mb']:.0f}" if r["peak_rss_mb"] is not None else "-"
+        print(f"{r['stage']:<18}{r['step']:<22}{before:>10}{after:>10}{change:>9}{peak:>10}  {r['flag']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TransitX pipeline telemetry")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rep = sub.add_parser("report", help="compare two runs and flag stages that got slower")
+    rep.add_argument("--runs", nargs=2, metavar=("OLD", "NEW"), default=(None, None))
+    rep.add_argument("--threshold", type=float, default=0.2, help="relative slowdown to flag (0.2 = 20%%)")
+    rep.add_argument("--min-seconds", type=float, default=0.5, help="ignore changes smaller than this")
+    rep.add_argument("--logs", default="logs/telemetry_*.jsonl")
+    args = parser.parse_args()
+
+    old_run, new_run, rows = compare_runs(read_records(args.logs), *args.runs, args.threshold, args.min_seconds)
+    print_report(old_run, new_run, rows)
+    if any(r["flag"] == "SLOWER" for r in rows):
+        sys.exit(1)
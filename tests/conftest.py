@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+
+# Pipeline modules write logs/, data/ and models/ relative to the working directory
+@pytest.fixture(autouse=True, scope="session")
+def workdir(tmp_path_factory):
+    path = tmp_path_factory.mktemp("workdir")
+    os.makedirs(path / "logs")
+    cwd = os.getcwd()
+    os.chdir(path)
+    yield path
+    os.chdir(cwd)
+
+
+# Blob storage swapped for a directory, as the benchmark suite does
+@pytest.fixture
+def local_storage(tmp_path, monkeypatch):
+    from src.utils.blob_client import get_blob_service, get_container
+    monkeypatch.setenv("TRANSITX_LOCAL_STORAGE", str(tmp_path / "storage"))
+    get_blob_service.cache_clear()
+    get_container.cache_clear()
+    yield tmp_path / "storage"
+    get_blob_service.cache_clear()
+    get_container.cache_clear()
@@ -0,0 +1,206 @@
+import os
+import pickle
+import importlib
+
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+from src.pipelines.feature_eng import extend_encoder
+from src.utils import lookup_cube
+
+VOCAB = {
+    "route": ["32", "54", "505"],
+    "incident": ["Mechanical", "None"],
+    "dayofweek": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"],
+    "location": ["KENNEDY STATION", "UNION STATION"],
+    "direction": ["E", "N", "S", "W"],
+    "temp_bin": ["Cold", "Freezing", "Mild", "Warm"],
+    "rain_intensity": ["Heavy", "Light", "Moderate", "None"],
+}
+FEATURES = ["route", "dayofweek", "location", "incident", "min_gap", "direction", "temperature",
+            "precipitation", "hour", "month", "rush_hour", "is_weekend", "temp_bin", "rain_intensity"]
+RECORD = {"date": "2030-05-13", "time": "09:15", "route": "32", "direction": "E", "location": "KENNEDY STATION"}
+
+
+def write_models(reg_depth:int=2):
+    rng = np.random.default_rng(reg_depth)
+    X = pd.DataFrame(rng.integers(0, 4, size=(120, len(FEATURES))), columns=FEATURES).astype(float)
+    y = rng.integers(0, 20, size=120)
+    os.makedirs("models", exist_ok=True)
+    for name, model, target in (("xgb_regressor.pkl", xgb.XGBRegressor(n_estimators=5, max_depth=reg_depth), y),
+                                ("xgb_classifier.pkl", xgb.XGBClassifier(n_estimators=5, max_depth=2), y > 3)):
+        with open(f"models/{name}", "wb") as f:
+            pickle.dump(model.fit(X, target), f)
+
+
+# deployment.app loads models/ from the working directory at import
+@pytest.fixture(scope="module")
+def api(tmp_path_factory):
+    path = tmp_path_factory.mktemp("api")
+    cwd = os.getcwd()
+    os.chdir(path)
+    os.environ["TRANSITX_FIXED_WEATHER"] = "12.0,0.0"
+    try:
+        os.makedirs("models")
+        with open("models/encoders.pkl", "wb") as f:
+            pickle.dump({col: extend_encoder(None, pd.Series(v)) for col, v in VOCAB.items()}, f)
+        write_models()
+        import deployment.app as app
+        yield importlib.reload(app)
+    finally:
+        os.environ.pop("TRANSITX_FIXED_WEATHER", None)
+        os.chdir(cwd)
+
+
+def build_cube(api, record:dict, minutes:float):
+    df, _ = api.prepare_data(api.TransitInput(**record))
+    row = df.iloc[0]
+    fields = {name: [int(row[name])] for name, _ in lookup_cube.KEY_LAYOUT}
+    keys = lookup_cube.pack_keys(fields)
+    lookup_cube.save_cube(api.CUBE_PATH, keys, np.array([minutes]), np.array([0.9]),
+                          api.ARTIFACTS["version"], int(row["month"]))
+
+
+# ----- Lookup cube ----- #
+def test_cube_written_after_a_miss_is_picked_up(api):
+    if os.path.exists(api.CUBE_PATH):
+        os.remove(api.CUBE_PATH)
+    assert api.get_lookup_cube() is None
+    assert api.predict(api.TransitInput(**RECORD))["prediction_source"] == "model"
+
+    build_cube(api, RECORD, 42.0)
+    response = api.predict(api.TransitInput(**RECORD))
+    assert response["prediction_source"] == "lookup"
+    assert response["predicted_delay_minutes"] == 42
+
+
+def test_stale_cube_is_rechecked_when_rewritten(api):
+    build_cube(api, RECORD, 7.0)
+    lookup_cube.save_cube(api.CUBE_PATH, np.array([1]), np.array([1.0]), np.array([0.1]), "other-models", 5)
+    os.utime(api.CUBE_PATH, (1, 1))
+    assert api.get_lookup_cube() is None
+
+    build_cube(api, RECORD, 7.0)
+    assert api.get_lookup_cube() is not None
+    os.remove(api.CUBE_PATH)
+
+
+def test_predict_uses_the_shared_weather_cache(api, monkeypatch):
+    hours = pd.date_range("2030-05-13", periods=24, freq="h").values
+    calls = []
+    monkeypatch.delenv("TRANSITX_FIXED_WEATHER")
+    monkeypatch.setattr(api, "_hourly_forecast", lambda bucket: calls.append(bucket) or (hours, np.full(24, 25.0), np.zeros(24)))
+    monkeypatch.setattr(api.requests, "get", lambda *a, **k: pytest.fail("per-request weather call"))
+
+    for minute in ("05", "40"):
+        response = api.predict(api.TransitInput(**{**RECORD, "time": f"09:{minute}"}))
+        assert response["Weather_condition"] == "Warm"
+    assert calls
+
+
+# ----- Encoding and reloads ----- #
+def test_unknown_labels_share_one_fixed_code(api):
+    unknown = len(VOCAB["route"])
+    df = pd.DataFrame({"route": ["32", "999", "1000"]})
+    for _ in range(3):
+        assert list(api.encode_cat_input(df, api.ARTIFACTS["encoders"])["route"]) == [0, unknown, unknown]
+    assert list(api.encode_array("route", df["route"])) == [0, unknown, unknown]
+    assert list(api.ARTIFACTS["encoders"]["route"].classes_).count("Unknown") == 1
+
+
+def test_refresh_follows_cube_and_models(api):
+    assert api.refresh_artifacts() is False
+    build_cube(api, RECORD, 9.0)
+    assert api.refresh_artifacts() is True
+    assert api.refresh_artifacts() is False
+
+    write_models(reg_depth=3)
+    assert api.refresh_artifacts() is True
+    assert api.get_lookup_cube() is None  # built for the previous models
+    os.remove(api.CUBE_PATH)
+    assert api.refresh_artifacts() is True
+
+
+def test_route_forecast_defaults_to_the_toronto_hour(api, monkeypatch):
+    from datetime import datetime, timezone
+
+    class FixedClock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            utc = datetime(2030, 5, 13, 3, 30, tzinfo=timezone.utc)
+            return utc.astimezone(tz) if tz else utc.replace(tzinfo=None)
+
+    monkeypatch.setattr(api, "datetime", FixedClock)
+    body = api.RouteForecastInput(route="32", direction="E", locations=["KENNEDY STATION"], hours=2)
+    assert api.forecast_route(body)["hours"] == ["2030-05-12T23:00", "2030-05-13T00:00"]
+
+
+# ----- Streaming endpoints ----- #
+def test_ndjson_stream_is_full_duplex(api):
+    import json
+    import socket
+    import threading
+    import time
+    import uvicorn
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(api.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    def chunk(data:bytes):
+        return f"{len(data):x}\r\n".encode() + data + b"\r\n"
+
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=10) as conn:
+            conn.sendall(b"POST /predict/stream HTTP/1.1\r\nHost: test\r\nContent-Type: application/x-ndjson\r\n"
+                         b"Transfer-Encoding: chunked\r\n\r\n")
+            received = b""
+            # Each result must arrive while the request body is still open
+            for i, rec in enumerate([RECORD, {**RECORD, "route": "abc"}]):
+                conn.sendall(chunk(json.dumps(rec).encode() + b"\n"))
+                while received.count(b'"seq"') <= i:
+                    received += conn.recv(65536)
+            conn.sendall(b"0\r\n\r\n")
+    finally:
+        server.should_exit = True
+        thread.join(10)
+
+    lines = [json.loads(l) for l in received.split(b"\r\n") if l.startswith(b"{")]
+    assert [l["seq"] for l in lines] == [0, 1]
+    assert "predicted_delay_minutes" in lines[0] and "error" in lines[1]
+
+
+def test_ndjson_stream_keeps_order_and_reports_bad_lines(api):
+    import json
+    from fastapi.testclient import TestClient
+
+    body = "\n".join([json.dumps(RECORD), "{not json", json.dumps([RECORD]), json.dumps({**RECORD, "time": "10:00"})])
+    with TestClient(api.app) as client:
+        response = client.post("/predict/stream", content=body, headers={"Content-Type": "application/x-ndjson"})
+    lines = [json.loads(l) for l in response.text.splitlines()]
+    assert [l["seq"] for l in lines] == [0, 1, 2, 3]
+    assert [("error" in l) for l in lines] == [False, True, True, False]
+    assert lines[3]["datetime"] == "2030-05-13 10:00"
+
+
+def test_websocket_scores_objects_and_arrays(api):
+    import json
+    from fastapi.testclient import TestClient
+
+    with TestClient(api.app) as client, client.websocket_connect("/ws/predict") as ws:
+        ws.send_text(json.dumps(RECORD))
+        first = json.loads(ws.receive_text())
+        ws.send_text(json.dumps([{**RECORD, "direction": "north"}, {**RECORD, "route": "x"}]))
+        ws.send_text("{not json")
+        rest = [json.loads(ws.receive_text()) for _ in range(3)]
+    assert first["seq"] == 0 and first["route"] == "32"
+    assert [r["seq"] for r in rest] == [1, 2, 3]
+    assert rest[0]["direction"] == "N"
+    assert "error" in rest[1] and "Invalid JSON" in rest[2]["error"]
@@ -0,0 +1,25 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import generators, run_suite
+
+
+def test_category_weights_are_distributions():
+    for p in (generators.INCIDENT_P, generators.DIRECTION_P, generators.HOUR_P):
+        assert np.isclose(p.sum(), 1.0)
+
+
+def test_generated_rows_feed_the_pipeline(tmp_path):
+    run_suite.generate(str(tmp_path), 300)
+    ttc = pd.concat([pd.read_csv(tmp_path / f"data/raw/ttc_bus_delay_{y}.csv") for y in run_suite.YEARS])
+    assert len(ttc) == 300 and set(ttc["Incident"]) <= set(generators.INCIDENTS)
+
+    generators.make_transformed(str(tmp_path / "transformed.csv"), 200)
+    assert len(pd.read_csv(tmp_path / "transformed.csv")) == 200
+
+    # One stage end to end, in its own interpreter as the suite runs it
+    result = run_suite.spawn("transform", str(tmp_path), argparse.Namespace(rounds=5), "smoke")
+    assert result["status"] == "ok", result.get("error")
+    assert result["rows"] > 0
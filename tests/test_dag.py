@@ -0,0 +1,67 @@
+import logging
+
+import pytest
+
+from src.utils import dag
+
+logger = logging.getLogger("test_dag")
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(dag, "CACHE_DIR", str(tmp_path / "cache"))
+    (tmp_path / "stage.py").write_text("v1")
+    (tmp_path / "in.csv").write_text("a\n1\n")
+    return tmp_path
+
+
+def pipeline(calls:list):
+    def write(name):
+        def func(**deps):
+            calls.append(name)
+            with open(f"{name}.out", "w") as f:
+                f.write(name)
+            return name
+        return func
+
+    return [
+        dag.Stage(name="first", func=write("first"), code=["stage.py"], inputs=["in.csv"], outputs=["first.out"]),
+        dag.Stage(name="second", func=write("second"), deps=["first"], inputs=["first.out"], outputs=["second.out"]),
+    ]
+
+
+# ----- Stage cache ----- #
+def test_unchanged_stages_are_skipped(cache):
+    calls = []
+    assert {t["status"] for t in dag.run_dag(pipeline(calls), logger).values()} == {"ran"}
+    timings = dag.run_dag(pipeline(calls), logger)
+    assert {t["status"] for t in timings.values()} == {"cached"}
+    assert calls == ["first", "second"]
+
+
+@pytest.mark.parametrize("changed", ["in.csv", "stage.py"])
+def test_input_or_code_change_reruns_the_stage(cache, changed):
+    calls = []
+    dag.run_dag(pipeline(calls), logger)
+    (cache / changed).write_text("changed")
+    timings = dag.run_dag(pipeline(calls), logger)
+    assert timings["first"]["status"] == "ran"
+    # first.out was rewritten with the same bytes, so its dependant stays cached
+    assert timings["second"]["status"] == "cached"
+
+
+def test_missing_output_reruns_the_stage(cache):
+    calls = []
+    dag.run_dag(pipeline(calls), logger)
+    (cache / "second.out").unlink()
+    timings = dag.run_dag(pipeline(calls), logger)
+    assert timings["first"]["status"] == "cached" and timings["second"]["status"] == "ran"
+
+
+def test_stage_without_outputs_always_runs(cache):
+    calls = []
+    stages = [dag.Stage(name="load", func=lambda: calls.append("load"), inputs=["in.csv"])]
+    dag.run_dag(stages, logger)
+    assert dag.run_dag(stages, logger)["load"]["status"] == "ran"
+    assert calls == ["load", "load"]
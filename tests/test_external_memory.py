@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.models import external_memory
+from src.models.external_memory import PartitionIter, TARGETS
+from src.utils.model_utils import PARTITIONS_DIR
+
+
+def write_partitions(root, sizes:dict):
+    os.makedirs(root, exist_ok=True)
+    paths, start = [], 0
+    for key, n in sizes.items():
+        rows = np.arange(start, start + n)
+        pd.DataFrame({"hour": rows % 24, "route": rows, "min_delay": rows * 0.5, "is_delayed": rows % 2}) \
+            .to_csv(os.path.join(root, f"part-{key}.csv"), index=False)
+        paths.append(os.path.join(root, f"part-{key}.csv"))
+        start += n
+    return paths
+
+
+def drain(it):
+    batches = []
+    while it.next(lambda data, label: batches.append((data, label))):
+        pass
+    return batches
+
+
+# ----- Batch iterator ----- #
+def test_batches_never_cross_partitions(tmp_path):
+    paths = write_partitions(tmp_path / "parts", {"2024-01": 5, "2024-02": 2, "2024-03": 4})
+    it = PartitionIter(paths, "min_delay", str(tmp_path / "cache"), batch_rows=3)
+
+    batches = drain(it)
+    assert [len(data) for data, _ in batches] == [3, 2, 2, 3, 1]
+    assert all(not set(TARGETS) & set(data.columns) for data, _ in batches)
+    routes = np.concatenate([data["route"].to_numpy() for data, _ in batches])
+    assert list(routes) == list(range(11))
+    assert np.allclose(np.concatenate([label.to_numpy() for _, label in batches]), routes * 0.5)
+
+    # Exhausted until reset, then the same pass again
+    assert drain(it) == []
+    it.reset()
+    assert [len(data) for data, _ in drain(it)] == [3, 2, 2, 3, 1]
+
+
+# ----- Partition split ----- #
+def test_latest_partitions_are_held_out(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", f"sqlite:///{tmp_path / 'mlflow.db'}")
+    monkeypatch.setattr(external_memory, "CACHE_DIR", str(tmp_path / "cache"))
+    write_partitions(PARTITIONS_DIR, {"2024-01": 40, "2024-02": 40, "2024-03": 30, "2024-04": 30})
+
+    evaluated = []
+    monkeypatch.setattr(external_memory, "evaluate_partition",
+                        lambda model, path, kind, target: evaluated.append(os.path.basename(path)) or
+                        {"n": 1, "abs": 0.0, "sq": 0.0, "y": 0.0, "y2": 1.0, "tp": 0, "fp": 0, "fn": 0, "correct": 0})
+
+    model, _ = external_memory.train_external("regressor", holdout=2, rounds=3, batch_rows=16)
+    assert evaluated == ["part-2024-03.csv", "part-2024-04.csv"]
+    assert model.get_params()["max_depth"] == external_memory.REG_PARAMS["max_depth"]
+
+    with pytest.raises(ValueError, match="more than 4"):
+        external_memory.train_external("regressor", holdout=4)
+
+
+def test_saved_model_is_refit_on_every_partition(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", f"sqlite:///{tmp_path / 'mlflow.db'}")
+    monkeypatch.setattr(external_memory, "CACHE_DIR", str(tmp_path / "cache"))
+    write_partitions(PARTITIONS_DIR, {"2024-01": 60, "2024-02": 60, "2024-03": 40})
+    # The held-out month brings long delays on routes the training months never had
+    latest = external_memory.partition_path("2024-03")
+    df = pd.read_csv(latest)
+    df["min_delay"] = 200.0
+    df.to_csv(latest, index=False)
+
+    model, _ = external_memory.train_external("regressor", holdout=1, rounds=30, max_bin=32, batch_rows=25)
+    assert model.predict(df.drop(columns=TARGETS)).mean() > 100
@@ -0,0 +1,69 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from src.models import incremental
+from src.pipelines.feature_eng import extend_encoder, encode
+from src.utils.model_utils import booster_to_sklearn
+
+
+def save(encoders:dict, path):
+    with open(path, "wb") as f:
+        pickle.dump(encoders, f)
+
+
+# ----- Append-only encoders ----- #
+def test_extend_encoder_keeps_existing_codes():
+    first = extend_encoder(None, pd.Series(["b", "a", "c"]))
+    assert list(encode(first, pd.Series(["a", "b", "c"]))) == [0, 1, 2]
+
+    # "aa" sorts before "b" but must not shift it
+    second = extend_encoder(first, pd.Series(["c", "aa", "d", "a"]))
+    assert list(second.classes_) == ["a", "b", "c", "aa", "d"]
+    assert list(encode(second, pd.Series(["a", "b", "c", "aa", "d"]))) == [0, 1, 2, 3, 4]
+    assert list(second.inverse_transform([3, 1])) == ["aa", "b"]
+
+
+def test_encoders_remapped(tmp_path):
+    path = tmp_path / "encoders.pkl"
+    route = extend_encoder(None, pd.Series(["10", "20"]))
+    save({"route": route}, path)
+    trained = incremental.encoder_signature(path)
+
+    save({"route": extend_encoder(route, pd.Series(["30"]))}, path)
+    assert incremental.encoders_remapped(trained, path) == []
+
+    save({"route": extend_encoder(None, pd.Series(["05", "10", "20"]))}, path)
+    assert incremental.encoders_remapped(trained, path) == ["route"]
+
+    save({}, path)
+    assert incremental.encoders_remapped(trained, path) == ["route"]
+
+
+def test_incremental_train_falls_back_on_remap(monkeypatch, tmp_path):
+    monkeypatch.setattr(incremental, "TRAIN_STATE", str(tmp_path / "train_state.json"))
+    monkeypatch.setattr(incremental, "ENCODERS_PATH", str(tmp_path / "encoders.pkl"))
+    monkeypatch.setattr(incremental, "encoders_remapped", lambda trained: ["route"])
+    monkeypatch.setattr(incremental, "full_retrain", lambda kind: f"full {kind}")
+    (tmp_path / "models").mkdir(exist_ok=True)
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "models" / "xgb_regressor.pkl").write_bytes(b"")
+    incremental.write_state("regressor", partitions=["2024-01"], encoders={"route": {"n": 2, "sha": "x"}})
+
+    assert incremental.incremental_train("regressor") == "full regressor"
+
+
+# ----- Wrapped boosters keep their training params ----- #
+def test_booster_to_sklearn_reports_training_params():
+    rng = np.random.default_rng(0)
+    X, y = rng.normal(size=(200, 3)), rng.normal(size=200)
+    params = {"max_depth": 3, "learning_rate": 0.2, "subsample": 0.8}
+    booster = xgb.train({"max_depth": 3, "eta": 0.2, "subsample": 0.8}, xgb.DMatrix(X, label=y), num_boost_round=5)
+
+    model = booster_to_sklearn(booster, xgb.XGBRegressor, params)
+    kept = incremental.training_params(model)
+    assert {k: kept[k] for k in params} == params
+    assert "n_estimators" not in kept
+    assert model.predict(X).shape == (200,)
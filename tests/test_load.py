@@ -0,0 +1,111 @@
+import pandas as pd
+import pytest
+import sqlalchemy as sa
+
+from src.pipelines import load
+
+
+def write_source(path, months):
+    rows = []
+    for month, n in months.items():
+        for i in range(n):
+            rows.append({"date": f"{month}-{i % 28 + 1:02d}", "route": str(7 + i % 5), "location": f"STOP {i}",
+                         "incident": "Mechanical", "min_delay": i % 30, "direction": "N"})
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+
+def table_counts(conn_str, table):
+    engine = load.connect_sql(conn_str, pool_size=1)
+    with engine.connect() as conn:
+        total = conn.execute(sa.text(f"SELECT COUNT(*) FROM {table}")).scalar()
+        by_part = dict(conn.execute(sa.text(f"SELECT {load.PARTITION_COL}, COUNT(*) FROM {table} GROUP BY 1")).all())
+        state = dict(conn.execute(sa.text(f"SELECT partition_key, loaded_at FROM {load.STATE_TABLE}")).all())
+    return total, by_part, state
+
+
+def test_spooled_hash_matches_whole_partition(tmp_path):
+    src = write_source(tmp_path / "src.csv", {"2024-01": 50, "2024-02": 30})
+    parts = load.spool_partitions(load.iter_local_chunks([src], chunksize=7), str(tmp_path))
+
+    whole = load.with_partition(pd.read_csv(src, dtype=load.CSV_DTYPES))
+    for key, part in whole.groupby(load.PARTITION_COL):
+        assert parts[key]["rows"] == len(part)
+        assert parts[key]["hash"] == load.partition_hash(part.reset_index(drop=True))
+
+
+def test_incremental_load_is_idempotent(tmp_path):
+    conn_str = f"sqlite:///{tmp_path / 'load.db'}"
+    src = write_source(tmp_path / "src.csv", {"2024-01": 40, "2024-02": 25, "2024-03": 10})
+
+    first = load.incremental_load_to_sql("delays", local_paths=[src], conn_str=conn_str, chunksize=16)
+    counts_first = table_counts(conn_str, "delays")
+    second = load.incremental_load_to_sql("delays", local_paths=[src], conn_str=conn_str, chunksize=16)
+    counts_second = table_counts(conn_str, "delays")
+
+    assert first["rows"] == 75 and first["changed_partitions"] == ["2024-01", "2024-02", "2024-03"]
+    assert second["rows"] == 0 and second["changed_partitions"] == [] and second["removed_partitions"] == []
+    # Same rows, and the state (loaded_at) shows nothing was rewritten
+    assert counts_first == counts_second
+    assert counts_second[0] == 75
+
+
+def test_incremental_load_mirrors_changes_and_removals(tmp_path):
+    conn_str = f"sqlite:///{tmp_path / 'load.db'}"
+    load.incremental_load_to_sql("delays", local_paths=[write_source(tmp_path / "a.csv", {"2024-01": 40, "2024-02": 25})],
+                                 conn_str=conn_str, chunksize=16)
+    _, _, state_before = table_counts(conn_str, "delays")
+
+    stats = load.incremental_load_to_sql("delays", local_paths=[write_source(tmp_path / "b.csv", {"2024-01": 40, "2024-03": 5})],
+                                         conn_str=conn_str, chunksize=16)
+    total, by_part, state = table_counts(conn_str, "delays")
+
+    assert stats["changed_partitions"] == ["2024-03"]
+    assert stats["removed_partitions"] == ["2024-02"]
+    assert by_part == {"2024-01": 40, "2024-03": 5} and total == 45
+    assert set(state) == {"2024-01", "2024-03"}
+    assert state["2024-01"] == state_before["2024-01"]
+
+
+def test_excluded_rows_are_not_loaded(tmp_path):
+    conn_str = f"sqlite:///{tmp_path / 'load.db'}"
+    src = write_source(tmp_path / "src.csv", {"2024-01": 40})
+    stats = load.incremental_load_to_sql("delays", local_paths=[src], conn_str=conn_str, chunksize=16,
+                                         exclude_rows=[0, 15, 16, 39])
+    engine = load.connect_sql(conn_str, pool_size=1)
+    with engine.connect() as conn:
+        stops = {r[0] for r in conn.execute(sa.text("SELECT location FROM delays"))}
+    assert stats["rows"] == 36
+    assert not stops & {"STOP 0", "STOP 15", "STOP 16", "STOP 39"}
+
+
+def test_frame_and_csv_sources_hash_the_same(tmp_path):
+    conn_str = f"sqlite:///{tmp_path / 'load.db'}"
+    src = write_source(tmp_path / "src.csv", {"2024-01": 30, "2024-02": 20})
+    # As the DAG hands it over: numeric route, dates already parsed
+    frame = pd.read_csv(src)
+    frame["date"] = pd.to_datetime(frame["date"])
+    assert frame["route"].dtype == "int64"
+
+    first = load.incremental_load_to_sql("delays", frame=frame, conn_str=conn_str, chunksize=16)
+    second = load.incremental_load_to_sql("delays", local_paths=[src], conn_str=conn_str, chunksize=16)
+    assert first["changed_partitions"] == ["2024-01", "2024-02"]
+    assert second["changed_partitions"] == [] and second["removed_partitions"] == []
+
+
+def test_staging_table_is_unique_and_dropped_on_failure(tmp_path, monkeypatch):
+    conn_str = f"sqlite:///{tmp_path / 'load.db'}"
+    src = write_source(tmp_path / "src.csv", {"2024-01": 20})
+    staged = []
+
+    def failing_merge(engine, table_name, staging_name, changed, removed):
+        staged.append(staging_name)
+        raise RuntimeError("merge failed")
+
+    monkeypatch.setattr(load, "merge_partitions", failing_merge)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            load.incremental_load_to_sql("delays", local_paths=[src], conn_str=conn_str, chunksize=16)
+
+    assert len(set(staged)) == 2 and all(name.startswith("delays__staging_") for name in staged)
+    assert not set(sa.inspect(load.connect_sql(conn_str, pool_size=1)).get_table_names()) & set(staged)
@@ -0,0 +1,67 @@
+import pickle
+
+import pytest
+
+from src.utils.location_index import LocationIndex, normalize, trigrams
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("Kennedy Stn", "KENNEDY STATION"),
+    ("KENNEDY STATION", "KENNEDY STATION"),
+    ("St Clair Ave W", "SAINT CLAIR AVENUE WEST"),
+    ("Main St & Danforth Rd", "MAIN STREET AND DANFORTH ROAD"),
+    ("Yonge @ Finch", "YONGE AND FINCH"),
+    ("  queen/spadina. ", "QUEEN SPADINA"),
+    ("", ""),
+])
+def test_normalize(raw, expected):
+    assert normalize(raw) == expected
+
+
+def test_trigrams_are_padded():
+    assert trigrams("AB") == {"  A", " AB", "AB "}
+
+
+def test_exact_and_abbreviated_lookups():
+    index = LocationIndex(["KENNEDY STATION"] * 3 + ["Kennedy Stn", "KING AND QUEEN"])
+    assert index.resolve("kennedy stn") == "KENNEDY STATION"
+    assert index.resolve("King & Queen") == "KING AND QUEEN"
+    assert len(index) == 2
+
+
+def test_trigram_fallback_threshold():
+    index = LocationIndex(["DUNDAS WEST STATION", "BATHURST STATION", "KIPLING STATION"])
+    # One dropped letter stays well above the 0.6 Dice threshold
+    assert index.resolve("BATHURT STATION") == "BATHURST STATION"
+    # Shares only the STATION grams: below the threshold, unresolved
+    assert index.resolve("UNION STATION") is None
+    assert index.resolve("NOWHERE 123") is None
+
+    key, query = normalize("BATHURST STATION"), normalize("BATHURT STATION")
+    score = 2 * len(trigrams(key) & trigrams(query)) / (len(trigrams(key)) + len(trigrams(query)))
+    strict = LocationIndex(["BATHURST STATION"], min_similarity=score + 0.01)
+    loose = LocationIndex(["BATHURST STATION"], min_similarity=score)
+    assert strict.resolve("BATHURT STATION") is None
+    assert loose.resolve("BATHURT STATION") == "BATHURST STATION"
+
+
+def test_canonical_labels_are_sticky():
+    first = LocationIndex(["Kennedy Stn"] * 3 + ["KENNEDY STATION"])
+    assert first.resolve("KENNEDY STATION") == "Kennedy Stn"
+
+    # The other spelling is now more frequent, the persisted label still wins
+    second = LocationIndex(["KENNEDY STATION"] * 10 + ["FINCH STATION"], previous=first)
+    assert second.resolve("KENNEDY STATION") == "Kennedy Stn"
+    assert second.resolve("FINCH STATION") == "FINCH STATION"
+
+    # Names missing from the new data are kept
+    third = LocationIndex(["FINCH STATION"], previous=second)
+    assert third.resolve("Kennedy Station") == "Kennedy Stn"
+
+
+def test_pickle_round_trip_rebuilds_cache():
+    index = LocationIndex(["KIPLING STATION"])
+    index.resolve("KIPLING STN")
+    clone = pickle.loads(pickle.dumps(index))
+    assert clone.resolve.cache_info().currsize == 0
+    assert clone.resolve("Kipling Stn") == "KIPLING STATION"
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+from xgboost import XGBRegressor, XGBClassifier
+
+from src.models.build_lookup import build_grid, score_grid
+from src.pipelines.feature_eng import extend_encoder
+from src.utils import lookup_cube
+from src.utils.lookup_cube import KEY_LAYOUT, LookupCube, pack_keys, save_cube
+
+
+def unpack(keys):
+    fields, shift = {}, 0
+    for name, bits in KEY_LAYOUT:
+        fields[name] = (keys >> shift) & ((1 << bits) - 1)
+        shift += bits
+    return fields
+
+
+def test_layout_fits_56_bits():
+    assert sum(bits for _, bits in KEY_LAYOUT) == 56
+    top = pack_keys({name: [(1 << bits) - 1] for name, bits in KEY_LAYOUT})
+    assert int(top[0]) == (1 << 56) - 1
+
+
+def test_pack_unpack_round_trip():
+    rng = np.random.default_rng(0)
+    fields = {name: rng.integers(0, 1 << bits, size=500) for name, bits in KEY_LAYOUT}
+    keys = pack_keys(fields)
+    assert keys.dtype == np.int64 and (keys >= 0).all()
+    for name, values in unpack(keys).items():
+        assert np.array_equal(values, fields[name])
+
+
+def test_each_field_owns_its_bits():
+    shift = 0
+    for name, bits in KEY_LAYOUT:
+        fields = {n: [0] for n, _ in KEY_LAYOUT}
+        fields[name] = [1]
+        assert int(pack_keys(fields)[0]) == 1 << shift
+        shift += bits
+
+
+@pytest.mark.parametrize("value", [-1, 1 << 3])
+def test_out_of_range_ids_are_rejected(value):
+    fields = {name: [0] for name, _ in KEY_LAYOUT}
+    fields["rain_intensity"] = [value]
+    with pytest.raises(ValueError, match="rain_intensity"):
+        pack_keys(fields)
+
+
+def test_cube_lookup(tmp_path):
+    rng = np.random.default_rng(1)
+    fields = {name: rng.integers(0, min(1 << bits, 50), size=200) for name, bits in KEY_LAYOUT}
+    keys = np.unique(pack_keys(fields))
+    minutes = np.arange(len(keys), dtype=np.float64)
+    path = str(tmp_path / "cube.npz")
+    shuffled = rng.permutation(len(keys))
+    save_cube(path, keys[shuffled], minutes[shuffled], minutes[shuffled] / len(keys), "v1", 5)
+
+    cube = LookupCube(path)
+    assert (len(cube), cube.version, cube.month, cube.min_gap) == (len(keys), "v1", 5, lookup_cube.DEFAULT_MIN_GAP)
+    assert (np.diff(cube.keys) > 0).all()
+
+    hit = {name: int(v[0]) for name, v in unpack(keys[7:8]).items()}
+    assert cube.get(hit) == (7.0, pytest.approx(7 / len(keys)))
+    assert cube.get({**hit, "route": (1 << 16) - 1}) is None
+    assert cube.get({**hit, "hour": 1 << 5}) is None
+
+
+# ----- Building the cube ----- #
+def grid_encoders(incidents):
+    vocab = {"temp_bin": list(lookup_cube.TEMP_BIN_VALUES), "rain_intensity": list(lookup_cube.RAIN_BIN_VALUES),
+             "dayofweek": ["Saturday", "Wednesday"], "incident": incidents}
+    return {col: extend_encoder(None, pd.Series(v)) for col, v in vocab.items()}
+
+
+def test_grid_needs_the_default_incident():
+    combos = pd.DataFrame({"route": [1, 2], "direction": [0, 1], "location": [3, 4]})
+
+    assert build_grid(combos, grid_encoders(["Mechanical"]), month=5) is None
+    grid = build_grid(combos, grid_encoders(["Mechanical", "None"]), month=5)
+    assert len(grid) == 2 * 24 * 2 * 4 * 4 and set(grid["incident"]) == {1}
+
+
+def test_cube_scores_match_the_live_models():
+    combos = pd.DataFrame({"route": [1, 2, 3], "direction": [0, 1, 2], "location": [3, 4, 5]})
+    grid = build_grid(combos, grid_encoders(["Mechanical", "None"]), month=5)
+    rng = np.random.default_rng(0)
+    y = grid["hour"] * 0.5 + grid["route"] + rng.normal(scale=2, size=len(grid))
+    fit, val = grid.index % 5 != 0, grid.index % 5 == 0
+    reg = XGBRegressor(n_estimators=300, learning_rate=0.5, early_stopping_rounds=3)
+    reg.fit(grid[fit], y[fit], eval_set=[(grid[val], y[val])], verbose=False)
+    cls = XGBClassifier(n_estimators=300, learning_rate=0.5, early_stopping_rounds=3)
+    cls.fit(grid[fit], y[fit] > 8, eval_set=[(grid[val], y[val] > 8)], verbose=False)
+    assert reg.best_iteration + 1 < reg.get_booster().num_boosted_rounds()
+
+    delay, prob = score_grid(grid, reg, cls, batch_rows=500)
+    assert np.allclose(delay, reg.predict(grid), atol=1e-5)
+    assert np.allclose(prob, cls.predict_proba(grid)[:, 1], atol=1e-6)
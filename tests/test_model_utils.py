@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from src.pipelines.feature_eng import write_feature_matrix
+from src.utils import model_utils
+
+
+def write_matrix(tmp_path, monkeypatch, rows:int=100):
+    path, meta = str(tmp_path / "features.npy"), str(tmp_path / "features.json")
+    monkeypatch.setattr(model_utils, "MATRIX_PATH", path)
+    monkeypatch.setattr(model_utils, "MATRIX_META", meta)
+    monkeypatch.setattr(model_utils, "FEATURES_CSV", str(tmp_path / "missing.csv"))
+    df = pd.DataFrame({"hour": np.arange(rows) % 24, "route": np.arange(rows),
+                       "min_delay": np.arange(rows) * 0.5, "is_delayed": np.arange(rows) % 2})
+    months = pd.Series(np.where(np.arange(rows) < rows // 2, "2024-02", "2024-01"))
+    write_feature_matrix(df, months, path, meta)
+
+
+# The whole mapped file: the outermost np.memmap in the view chain
+def memmap_base(a):
+    mapped = None
+    while a is not None:
+        mapped = a if isinstance(a, np.memmap) else mapped
+        a = getattr(a, "base", None)
+    return mapped
+
+
+# ----- Zero-copy split over the memory map ----- #
+def test_split_rows_slices_the_memory_map(tmp_path, monkeypatch):
+    write_matrix(tmp_path, monkeypatch)
+    features, targets = model_utils.load_xy()
+    matrix = memmap_base(features.to_numpy())
+    assert matrix is not None
+
+    X_train, X_test, y_train, y_test = model_utils.split_rows(features, targets["min_delay"], test_size=0.2)
+    assert (len(X_train), len(X_test), len(y_train), len(y_test)) == (80, 20, 80, 20)
+    for part in (X_train, X_test, y_train, y_test):
+        assert np.shares_memory(part.to_numpy(), matrix)
+
+    # Rows are ordered by partition month, so the holdout is the latest month
+    assert set(X_test["route"]) <= set(range(50))
+
+
+def test_split_rows_keeps_one_holdout_row():
+    X, y = pd.DataFrame({"a": range(3)}), np.arange(3)
+    X_train, X_test, y_train, y_test = model_utils.split_rows(X, y, test_size=0.2)
+    assert list(X_test["a"]) == [2] and list(y_train) == [0, 1]
+
+
+def test_trainer_refits_on_the_holdout_months(monkeypatch, tmp_path):
+    from xgboost import XGBRegressor
+    from src.models import train_regressor
+
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", f"sqlite:///{tmp_path / 'mlflow.db'}")
+    monkeypatch.setattr(train_regressor, "tune_model",
+                        lambda X, y: XGBRegressor(n_estimators=30, max_depth=2).fit(X, y, verbose=False))
+    # Only the latest 20% of rows (the holdout) show route >= 80 and its long delays
+    route = np.arange(100, dtype=float)
+    features = pd.DataFrame({"route": route, "hour": route % 24})
+    targets = {"min_delay": pd.Series(np.where(route >= 80, 60.0, 5.0))}
+
+    model = train_regressor.train_reg_model("min_delay", features, targets)
+    assert model.n_estimators == 30 and model.max_depth == 2
+    assert model.predict(features.iloc[90:]).min() > 30
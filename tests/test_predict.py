@@ -0,0 +1,47 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+from xgboost import XGBRegressor, XGBClassifier
+
+from src.models import predict
+
+
+def early_stopped(tmp_path):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(400, 4)), columns=["hour", "route", "location", "min_gap"])
+    y = X["hour"] * 4 + rng.normal(scale=3, size=400)
+    fit, val = slice(0, 300), slice(300, None)
+    reg = XGBRegressor(n_estimators=300, learning_rate=0.3, early_stopping_rounds=5)
+    reg.fit(X[fit], y[fit], eval_set=[(X[val], y[val])], verbose=False)
+    cls = XGBClassifier(n_estimators=300, learning_rate=0.3, early_stopping_rounds=5)
+    cls.fit(X[fit], y[fit] > 0, eval_set=[(X[val], y[val] > 0)], verbose=False)
+    assert reg.best_iteration + 1 < reg.get_booster().num_boosted_rounds()
+
+    paths = []
+    for name, model in (("reg.pkl", reg), ("cls.pkl", cls)):
+        with open(tmp_path / name, "wb") as f:
+            pickle.dump(model, f)
+        paths.append(str(tmp_path / name))
+    return X, y, reg, cls, paths
+
+
+# ----- Streamed scores match the sklearn models the API uses ----- #
+def test_stream_honours_best_iteration(tmp_path, monkeypatch):
+    X, y, reg, cls, (reg_path, cls_path) = early_stopped(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(predict, "REG_MODEL_PATH", reg_path)
+    monkeypatch.setattr(predict, "CLASS_MODEL_PATH", cls_path)
+    monkeypatch.setattr(predict, "OUTPUT_DIR", str(tmp_path / "out"))
+    X.assign(min_delay=y, is_delayed=(y > 0).astype(int)).to_csv(tmp_path / "features.csv", index=False)
+
+    rows, _ = predict.stream_predictions(str(tmp_path / "features.csv"), workers=1, upload=False)
+    scored = pd.read_parquet(tmp_path / "out" / "transit_predictions")
+
+    assert rows == len(X)
+    assert np.array_equal(scored["pred_delay_minutes"], np.round(reg.predict(X)))
+    assert np.array_equal(scored["pred_is_delayed"], cls.predict(X))
+
+    # Without the iteration range every tree would be used
+    all_trees = reg.get_booster().inplace_predict(X.to_numpy(dtype=np.float32), iteration_range=(0, 0))
+    assert not np.allclose(all_trees, reg.predict(X))
@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+from src.models import train_joint
+from src.utils.model_utils import FEATURES_CSV, holdout_start, load_xy
+
+
+@pytest.fixture
+def features_csv(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", f"sqlite:///{tmp_path / 'mlflow.db'}")
+    rng = np.random.default_rng(0)
+    n = 600
+    route = np.arange(n) % 50
+    df = pd.DataFrame({"route": route, "hour": rng.integers(0, 24, n), "month": np.repeat(np.arange(1, 7), n // 6)})
+    # The latest month (the holdout) brings a new route range with long delays
+    df.loc[df["month"] == 6, "route"] += 100
+    df["min_delay"] = np.where(df["route"] >= 100, 60.0, df["hour"] * 0.5) + rng.normal(0, 1, n)
+    df["is_delayed"] = (df["min_delay"] > 5).astype(int)
+    os.makedirs(os.path.dirname(FEATURES_CSV), exist_ok=True)
+    df.to_csv(FEATURES_CSV, index=False)
+    return df
+
+
+# ----- Saved models learn from every row ----- #
+def test_joint_models_are_refit_on_the_holdout(features_csv):
+    reg_model, cls_model, seconds = train_joint.train_joint(rounds=40, concurrent=False)
+    latest = features_csv[features_csv["month"] == 6].drop(columns=["min_delay", "is_delayed"])
+
+    assert reg_model.predict(latest).mean() > 30
+    assert cls_model.predict(latest).mean() > 0.9
+    assert set(seconds) == {"min_delay", "is_delayed"}
+
+
+# ----- Sharing the load and the bin cuts changes nothing ----- #
+def train_alone(features, y, params:dict, rounds:int, max_bin:int):
+    n_train = holdout_start(len(features), 0.2)
+    n_fit = holdout_start(n_train, 0.2)
+    dtrain = xgb.QuantileDMatrix(features.iloc[:n_fit], label=y[:n_fit], max_bin=max_bin)
+    dval = xgb.QuantileDMatrix(features.iloc[n_fit:n_train], label=y[n_fit:n_train], ref=dtrain, max_bin=max_bin)
+    booster = xgb.train({**params, "max_bin": max_bin}, dtrain, num_boost_round=rounds,
+                        evals=[(dval, "val")], early_stopping_rounds=20, verbose_eval=False)
+    dall = xgb.QuantileDMatrix(features, label=y, ref=dtrain, max_bin=max_bin)
+    return xgb.train({**params, "max_bin": max_bin}, dall, num_boost_round=booster.best_iteration + 1)
+
+
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_joint_models_match_separately_trained_ones(features_csv, concurrent):
+    reg_model, cls_model, _ = train_joint.train_joint(rounds=40, max_bin=32, concurrent=concurrent)
+    features, targets = load_xy(compact=True)
+    dall = xgb.DMatrix(features)
+
+    for model, target, params in ((reg_model, "min_delay", train_joint.REG_PARAMS),
+                                  (cls_model, "is_delayed", train_joint.CLS_PARAMS)):
+        alone = train_alone(features, targets[target].to_numpy(), params, rounds=40, max_bin=32)
+        joint = model.get_booster()
+        assert joint.num_boosted_rounds() == alone.num_boosted_rounds()
+        np.testing.assert_allclose(joint.predict(dall), alone.predict(dall), rtol=1e-5, atol=1e-5)
@@ -0,0 +1,59 @@
+import re
+
+import numpy as np
+import pytest
+import xgboost as xgb
+
+from src.models import tuning
+
+
+@pytest.fixture
+def data(tmp_path, monkeypatch):
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", f"sqlite:///{tmp_path / 'mlflow.db'}")
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, 4))
+    y = X[:, 0] * 3 + X[:, 1] + rng.normal(0, 0.1, 300)
+    return X, y
+
+
+def trials(output:str):
+    found = re.findall(r"\[rung (\d+)\] trial (\d+) rounds=(\d+) score=(\S+)", output)
+    return [(int(r), int(i), int(n), float(s)) for r, i, n, s in found]
+
+
+def tune(X, y, **kwargs):
+    import mlflow
+    # Earlier tests leave another store's experiment active
+    mlflow.set_experiment("tuning")
+    with mlflow.start_run():
+        return tuning.tune_xgb(xgb.XGBRegressor, X, y, "neg_root_mean_squared_error",
+                               param_dist={"max_depth": [1, 2, 3], "learning_rate": [0.01, 0.1, 0.3]},
+                               n_candidates=9, eta=3, min_rounds=2, max_rounds=20, early_stopping_rounds=50, **kwargs)
+
+
+# ----- Successive halving ----- #
+def test_rung_rounds_drop_a_rung_next_to_the_cap():
+    assert tuning.rung_rounds(50, 500, 3) == [50, 150, 500]
+    assert tuning.rung_rounds(2, 20, 3) == [2, 6, 20]
+
+
+def test_best_third_is_promoted_each_rung(data, capsys):
+    model = tune(*data, budget_seconds=None)
+    ran = trials(capsys.readouterr().out)
+
+    by_rung = [[t for t in ran if t[0] == rung] for rung in range(3)]
+    assert [len(r) for r in by_rung] == [9, 3, 1]
+    assert {t[2] for t in by_rung[1]} == {6} and by_rung[2][0][2] == 20
+    for prev, rung in zip(by_rung, by_rung[1:]):
+        best = sorted(prev, key=lambda t: t[3], reverse=True)[:len(rung)]
+        assert {t[1] for t in rung} == {t[1] for t in best}
+    assert model.n_estimators <= 20
+
+
+def test_budget_stops_the_search_after_one_trial(data, capsys):
+    model = tune(*data, budget_seconds=1e-9)
+    out = capsys.readouterr().out
+
+    assert [t[:3] for t in trials(out)] == [(0, 0, 2)]
+    assert "budget" in out
+    assert model.predict(data[0]).shape == (300,)
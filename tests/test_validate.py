@@ -0,0 +1,83 @@
+import pandas as pd
+import pytest
+
+from src.pipelines import validate
+
+
+def transformed(n_good:int=6):
+    good = {"date": "2024-03-04", "route": "32", "time_x": "07:45", "day": "Monday", "location": "KING AND QUEEN",
+            "incident": "Mechanical", "min_delay": 12.0, "min gap": 20.0, "direction": "N",
+            "temperature_2m (°c)": 3.5, "precipitation (mm)": 0.0}
+    rows = [dict(good) for _ in range(n_good)]
+    rows += [
+        {**good, "route": "RAD"},                                  # 6: bad_route
+        {**good, "min gap": -5.0},                                  # 7: min_gap_out_of_range
+        {**good, "date": "not a date", "time_x": "25:99"},          # 8: bad_date + bad_time
+        {**good, "date": None, "min_delay": None},                  # 9: missing_date + missing_min_delay
+        {**good, "temperature_2m (°c)": 80.0, "incident": "Alien"}, # 10: temperature range, unknown incident is only a warning
+        {**good, "date": "2024-04-01"},                             # 11: good, second partition
+    ]
+    return pd.DataFrame(rows)
+
+
+def test_reason_codes():
+    df = transformed()
+    bad, codes, rules, report = validate.validate_frame(df)
+    labels = dict(zip(map(int, (i for i in range(len(df)) if bad[i])), validate.reason_labels(codes[bad], rules)))
+
+    assert list(bad) == [False] * 6 + [True, True, True, True, True, False]
+    assert labels == {
+        6: "bad_route",
+        7: "min_gap_out_of_range",
+        8: "bad_date;bad_time",
+        9: "missing_date;missing_min_delay",
+        10: "temperature_out_of_range",
+    }
+    assert report["quarantined"] == 5 and report["rows"] == 12
+    assert report["rules"]["unknown_incident"] == 1
+    assert report["unknown_values"]["incident"] == {"Alien": 1}
+    assert report["partitions"]["2024-03"]["rows"] == 9
+    assert report["partitions"]["2024-04"]["rows"] == 1
+    assert report["partitions"]["unknown"]["quarantined"] == 2
+
+
+def test_missing_required_column():
+    with pytest.raises(KeyError):
+        validate.validate_frame(transformed().drop(columns=["route"]))
+
+
+def test_max_bad_rate_aborts(local_storage, monkeypatch):
+    monkeypatch.setattr(validate, "MAX_BAD_RATE", 0.3)
+    with pytest.raises(ValueError, match="failed validation"):
+        validate.run(transformed(n_good=2), source=None)
+    # The quarantine is still written so the bad batch can be inspected
+    assert len(pd.read_csv(validate.QUARANTINE_LOCAL)) == 5
+
+
+def test_clean_reuses_only_a_matching_report(local_storage, tmp_path):
+    first, second = tmp_path / "first.csv", tmp_path / "second.csv"
+    transformed().to_csv(first, index=False)
+    validate.run(pd.read_csv(first), source=str(first))
+
+    df = pd.read_csv(first)
+    assert len(validate.clean(df, str(first))) == 7
+
+    # Same length, different rows: the stored quarantine must not be reapplied
+    other = transformed()
+    other.loc[0, "route"] = "RAD"
+    other.loc[6, "route"] = "32"
+    other.to_csv(second, index=False)
+    cleaned = validate.clean(pd.read_csv(second), str(second))
+    assert len(cleaned) == 7
+    assert "RAD" not in set(cleaned["route"].astype(str))
+
+
+def test_clean_reuse_with_nothing_quarantined(local_storage, tmp_path):
+    source = tmp_path / "clean.csv"
+    transformed().iloc[:6].to_csv(source, index=False)
+    validate.run(pd.read_csv(source), source=str(source))
+    assert len(pd.read_csv(validate.QUARANTINE_LOCAL)) == 0
+
+    assert validate.read_quarantined_rows().dtype == "int64"
+    assert len(validate.clean(pd.read_csv(source), str(source))) == 6
+    assert list(validate.quarantined_rows(str(source))) == []